@@ -1,12 +1,28 @@
 # app.py
+import logging
+import os
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Depends, HTTPException, Header
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, PlainTextResponse
 
 from reports.routes import router as reports_router
+from reports import jobs as report_jobs
 from po.routes import router as po_router   # ← this is the missing line
 from fastapi import FastAPI
 from settings.routes import router as settings_router
+from utils import render_pool
+from services import activity_log
+from config import close_clients
+from utils import metrics as request_metrics
+from utils.metrics import RequestMetricsMiddleware, render_metrics
+from utils import profiling
+
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO"),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+)
+
 app = FastAPI()
 
 app.add_middleware(
@@ -15,8 +31,16 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count", profiling.ID_HEADER],
 )
 
+# Request latency by route + per-stage spans (utils/metrics.py)
+app.add_middleware(RequestMetricsMiddleware)
+
+# Opt-in per-request profiling, only with PROFILE_TOKEN set (utils/profiling.py)
+if profiling.enabled():
+    app.add_middleware(profiling.ProfileMiddleware)
+
 app.include_router(reports_router)          # ← NO extra prefix here
 
 # Then, after the reports include:
@@ -24,4 +48,52 @@ app.include_router(po_router)               # ← add this line
 app.include_router(settings_router)
 
 
+def require_metrics_token(authorization: str | None = Header(None)):
+    # Route and stage timings are not for anyone who can reach the API
+    if not request_metrics.authorized(authorization):
+        raise HTTPException(403, "Metrics not enabled or invalid token")
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics(_: None = Depends(require_metrics_token)):
+    """Prometheus text exposition (METRICS_TOKEN as bearer token)."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+def require_profile_token(x_profile_token: str | None = Header(None)):
+    # Header only: a query-string token would end up in access logs and history
+    if not profiling.authorized(x_profile_token):
+        raise HTTPException(403, "Profiling not enabled or invalid token")
+
+
+@app.get("/profiles", include_in_schema=False)
+def list_profiles(_: None = Depends(require_profile_token)):
+    return profiling.list_profiles()
+
+
+@app.get("/profiles/{profile_id}", include_in_schema=False)
+def download_profile(
+    profile_id: str,
+    format: str = "pstats",
+    _: None = Depends(require_profile_token)
+):
+    path = profiling.profile_path(profile_id)
+    if not path:
+        raise HTTPException(404, "Profile not found")
+
+    if format == "text":
+        return PlainTextResponse(profiling.summary(path))
+
+    return FileResponse(path, media_type="application/octet-stream", filename=f"{profile_id}.pstats")
+
+
+@app.on_event("shutdown")
+def stop_report_jobs():
+    report_jobs.shutdown()
+    render_pool.shutdown()
+    activity_log.shutdown()
+
 
+@app.on_event("shutdown")
+def close_supabase_clients():
+    close_clients()
@@ -0,0 +1,818 @@
+# bench/fake_supabase.py
+import contextvars
+import importlib
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from postgrest.exceptions import APIError
+
+# ---------------------------------------------------------
+# In-memory stand-in for the Supabase / PostgREST client.
+#
+# Implements the slice of the query builder the backend uses:
+#   table().select(cols, count="exact") with embeds
+#       (alias:table!fk_hint (...), table!inner (...), nested),
+#   eq / neq / gt / gte / lt / lte / in_ / or_ (incl. filters on embedded
+#       columns such as "usage.used_at"), order / limit / range / single,
+#   insert / update / delete / upsert, and rpc() for the
+#   create_purchase_order / deliver_purchase_order / latest_po_events /
+#   fifo_month_fingerprints functions.
+#
+# Timestamps are stored as canonical UTC ISO strings, so range filters
+# compare as text the way Postgres compares timestamptz. The filtered,
+# ordered result of a select is memoised per query shape until one of the
+# tables it reads is written – paging through a large select costs one
+# scan, not one per page. Missing relationships / functions raise the same
+# APIError codes PostgREST does (PGRST200 / PGRST202), so the fallback
+# paths can be exercised too. Like PostgREST's max-rows, a select returns
+# at most max_rows rows whatever its limit / range asks for (count="exact"
+# still reports the full total), so a fetch that forgets to page comes back
+# truncated here as well.
+# ---------------------------------------------------------
+
+# table -> {fk column: referenced table} (what PostgREST embeds resolve against)
+FOREIGN_KEYS = {
+    "usage_fifo": {"company_id": "companies", "usage_id": "usage"},
+    "usage": {"company_id": "companies", "powder_id": "powders", "supplier_id": "suppliers"},
+    "powders": {"company_id": "companies"},
+    "suppliers": {"company_id": "companies"},
+    "purchase_orders": {"company_id": "companies", "supplier_id": "suppliers"},
+    "purchase_order_items": {"po_id": "purchase_orders", "powder_id": "powders"},
+    "stock_batches": {"company_id": "companies", "powder_id": "powders", "supplier_id": "suppliers"},
+    "activity_log": {"company_id": "companies"},
+    "users": {"company_id": "companies"},
+}
+
+# Upsert conflict target when none is given (primary keys)
+PRIMARY_KEYS = {
+    "fifo_monthly_rollups": ("company_id", "month"),
+}
+
+# Columns filled in on insert when missing
+TIMESTAMP_DEFAULTS = {
+    "purchase_orders": ("created_at", "updated_at"),
+    "usage": ("created_at",),
+    "usage_fifo": ("created_at",),
+    "stock_batches": ("created_at",),
+    "activity_log": ("created_at",),
+    "fifo_monthly_rollups": ("computed_at",),
+}
+
+QUERY_CACHE_SIZE = 64
+
+# Supabase's default PostgREST max-rows
+MAX_ROWS = 1000
+
+_TIMESTAMP = re.compile(r"^\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}")
+_SELECT_ITEM = re.compile(r"^(?:(\w+)\s*:\s*)?(\*|\w+)((?:\s*!\s*\w+)*)\s*(?:\((.*)\))?$", re.S)
+
+# Per-benchmark query counters, see stats()
+_stats = contextvars.ContextVar("fake_supabase_stats", default=None)
+
+
+def timestamp(dt: datetime) -> str:
+    """Canonical stored form of a timestamptz value."""
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc).isoformat(timespec="microseconds")
+
+
+def _normalize(value):
+    if isinstance(value, str) and _TIMESTAMP.match(value):
+        try:
+            return timestamp(datetime.fromisoformat(value.replace("Z", "+00:00")))
+        except ValueError:
+            return value
+    return value
+
+
+def _error(code: str, message: str):
+    return APIError({"code": code, "message": message, "details": None, "hint": None})
+
+
+# ---------------------------------------------------------
+# Select / filter parsing
+# ---------------------------------------------------------
+def _split(text: str):
+    """Split on commas outside parentheses / quotes."""
+    parts, depth, quoted, current = [], 0, False, []
+
+    for ch in text:
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == "(":
+            depth += 1
+        elif not quoted and ch == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and ch == ",":
+            parts.append("".join(current).strip())
+            current = []
+            continue
+        current.append(ch)
+
+    parts.append("".join(current).strip())
+    return [p for p in parts if p]
+
+
+def parse_select(text: str):
+    """
+    Select string -> list of ("column", name, alias) and
+    ("embed", alias, table, fk_hint, inner, children).
+    """
+    items = []
+
+    for part in _split(text):
+        m = _SELECT_ITEM.match(part)
+        if not m:
+            raise _error("PGRST100", f"failed to parse select parameter ({part})")
+
+        alias, name, hints, children = m.groups()
+        hints = [h.strip() for h in hints.split("!") if h.strip()]
+
+        if children is None and not hints:
+            items.append(("column", name, alias or name))
+        else:
+            fk_hint = next((h for h in hints if h != "inner"), None)
+            items.append((
+                "embed", alias or name, name, fk_hint, "inner" in hints,
+                parse_select(children or "*")
+            ))
+
+    return items
+
+
+def _compare(op: str, stored, value) -> bool:
+    if op == "is":
+        return stored is None if value is None else stored == value
+    if stored is None:
+        return False
+    if op == "in":
+        return stored in value
+    if isinstance(stored, (int, float)) and isinstance(value, str):
+        value = float(value)
+
+    if op == "eq":
+        return stored == value
+    if op == "neq":
+        return stored != value
+    if op == "gt":
+        return stored > value
+    if op == "gte":
+        return stored >= value
+    if op == "lt":
+        return stored < value
+    if op == "lte":
+        return stored <= value
+
+    raise _error("PGRST100", f"unsupported operator {op}")
+
+
+def _parse_logic(text: str):
+    """PostgREST or=/and= tree -> predicate(row)."""
+    preds = []
+
+    for part in _split(text):
+        m = re.match(r"^(and|or)\((.*)\)$", part, re.S)
+        if m:
+            inner = _parse_logic(m.group(2))
+            preds.append(inner if m.group(1) == "or" else _all(inner.children))
+            continue
+
+        column, op, raw = part.split(".", 2)
+        raw = raw[1:-1] if raw.startswith('"') and raw.endswith('"') else raw
+        if op == "in":
+            value = tuple(_normalize(v.strip('"')) for v in _split(raw.strip("()")))
+        else:
+            value = _normalize(raw)
+        preds.append(lambda row, c=column, o=op, v=value: _compare(o, row.get(c), v))
+
+    return _any(preds)
+
+
+def _any(preds):
+    def pred(row):
+        return any(p(row) for p in preds)
+    pred.children = preds
+    return pred
+
+
+def _all(preds):
+    def pred(row):
+        return all(p(row) for p in preds)
+    pred.children = preds
+    return pred
+
+
+# ---------------------------------------------------------
+# Results / builders
+# ---------------------------------------------------------
+class Result:
+    """What .execute() returns: .data and .count, like postgrest's APIResponse."""
+
+    __slots__ = ("data", "count")
+
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class Query:
+    def __init__(self, db, table: str):
+        self.db = db
+        self.table = table
+        self.op = "select"
+        self.columns = "*"
+        self.count = None
+        self.payload = None
+        self.on_conflict = None
+        self.filters = []      # (path, op, value)
+        self.logic = []        # or_ strings
+        self.orders = []       # (column, desc)
+        self.offset = 0
+        self.limit_ = None
+        self.single_ = False
+
+    # ---- statements ----
+    def select(self, *columns, count=None, **_):
+        self.columns = ",".join(columns) or "*"
+        self.count = count
+        return self
+
+    def insert(self, rows, **_):
+        self.op, self.payload = "insert", rows
+        return self
+
+    def upsert(self, rows, on_conflict: str = "", **_):
+        self.op, self.payload = "upsert", rows
+        self.on_conflict = tuple(c.strip() for c in on_conflict.split(",") if c.strip()) or None
+        return self
+
+    def update(self, values, **_):
+        self.op, self.payload = "update", values
+        return self
+
+    def delete(self, **_):
+        self.op = "delete"
+        return self
+
+    # ---- filters ----
+    def _filter(self, column, op, value):
+        self.filters.append((column, op, value))
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, "eq", _normalize(value))
+
+    def neq(self, column, value):
+        return self._filter(column, "neq", _normalize(value))
+
+    def gt(self, column, value):
+        return self._filter(column, "gt", _normalize(value))
+
+    def gte(self, column, value):
+        return self._filter(column, "gte", _normalize(value))
+
+    def lt(self, column, value):
+        return self._filter(column, "lt", _normalize(value))
+
+    def lte(self, column, value):
+        return self._filter(column, "lte", _normalize(value))
+
+    def is_(self, column, value):
+        return self._filter(column, "is", None if value in (None, "null") else value)
+
+    def in_(self, column, values):
+        return self._filter(column, "in", frozenset(_normalize(v) for v in values))
+
+    def or_(self, filters: str, **_):
+        self.logic.append(filters)
+        return self
+
+    # ---- modifiers ----
+    def order(self, column, desc=False, **_):
+        self.orders.append((column, desc))
+        return self
+
+    def limit(self, size, **_):
+        self.limit_ = size
+        return self
+
+    def range(self, start, end, **_):
+        self.offset, self.limit_ = start, end - start + 1
+        return self
+
+    def single(self):
+        self.single_ = True
+        return self
+
+    def maybe_single(self):
+        return self.limit(1)
+
+    def execute(self):
+        return self.db._execute(self)
+
+
+class RPC:
+    def __init__(self, db, name: str, params: dict):
+        self.db = db
+        self.name = name
+        self.params = params
+
+    def execute(self):
+        return self.db._execute_rpc(self)
+
+
+# ---------------------------------------------------------
+# Database
+# ---------------------------------------------------------
+class FakeSupabase:
+    """
+    Drop-in for config.supabase. rpcs: names of the SQL functions that
+    "exist" (None = all implemented ones); latency: seconds slept per
+    request, outside the lock, to mimic a network round trip; max_rows:
+    cap on the rows one select returns (None = unlimited).
+    """
+
+    RPCS = ("create_purchase_order", "deliver_purchase_order", "latest_po_events", "fifo_month_fingerprints")
+
+    def __init__(self, rpcs=None, latency: float = 0.0, max_rows: int | None = MAX_ROWS):
+        self.tables = {}
+        self.rpcs = set(self.RPCS if rpcs is None else rpcs)
+        self.latency = latency
+        self.max_rows = max_rows
+
+        self._by_id = {}         # table -> {id: row}
+        self._versions = {}      # table -> write counter
+        self._indexes = {}       # (table, column) -> (version, {value: [rows]})
+        self._results = OrderedDict()
+        self._lock = threading.RLock()
+
+    # ---- client API ----
+    def table(self, name: str) -> Query:
+        return Query(self, name)
+
+    from_ = table
+
+    def rpc(self, name: str, params: dict | None = None) -> RPC:
+        return RPC(self, name, params or {})
+
+    # ---- storage ----
+    def rows(self, table: str) -> list:
+        return self.tables.setdefault(table, [])
+
+    def load(self, table: str, rows):
+        """Bulk-load rows as-is (generator use: no copying or defaults)."""
+        with self._lock:
+            stored = self.rows(table)
+            by_id = self._by_id.setdefault(table, {})
+            for row in rows:
+                stored.append(row)
+                if "id" in row:
+                    by_id[row["id"]] = row
+            self._touch(table)
+
+    def truncate(self, table: str):
+        with self._lock:
+            self.tables[table] = []
+            self._by_id[table] = {}
+            self._touch(table)
+
+    def _touch(self, table: str):
+        self._versions[table] = self._versions.get(table, 0) + 1
+
+    def _index(self, table: str, column: str) -> dict:
+        version = self._versions.get(table, 0)
+        cached = self._indexes.get((table, column))
+        if cached and cached[0] == version:
+            return cached[1]
+
+        index = {}
+        for row in self.rows(table):
+            index.setdefault(row.get(column), []).append(row)
+        self._indexes[(table, column)] = (version, index)
+        return index
+
+    def _get(self, table: str, row_id):
+        return self._by_id.get(table, {}).get(row_id)
+
+    # ---- execution ----
+    def _execute(self, q: Query) -> Result:
+        stats = _stats.get()
+        start = time.perf_counter()
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        try:
+            with self._lock:
+                if q.op == "select":
+                    return self._select(q)
+                return self._write(q)
+        finally:
+            if stats is not None:
+                stats.record(q.table, q.op, time.perf_counter() - start)
+
+    def _resolve(self, parent: str, target: str, fk_hint):
+        """(kind, column) of the parent -> target relationship."""
+        outgoing = [
+            c for c, t in FOREIGN_KEYS.get(parent, {}).items()
+            if t == target and fk_hint in (None, c)
+        ]
+        if len(outgoing) == 1:
+            return "one", outgoing[0]
+
+        incoming = [
+            c for c, t in FOREIGN_KEYS.get(target, {}).items()
+            if t == parent and fk_hint in (None, c)
+        ]
+        if len(incoming) == 1:
+            return "many", incoming[0]
+
+        raise _error(
+            "PGRST200",
+            f"Could not find a relationship between '{parent}' and '{target}' in the schema cache"
+        )
+
+    def _plan(self, table: str, items):
+        """Resolve embeds once per query: [(item, relationship, child plan)]."""
+        plan = []
+        for item in items:
+            if item[0] == "embed":
+                _, alias, target, fk_hint, inner, children = item
+                plan.append((item, self._resolve(table, target, fk_hint), self._plan(target, children)))
+            else:
+                plan.append((item, None, None))
+        return plan
+
+    def _shape(self, table: str, row: dict, plan, embed_filters) -> dict | None:
+        """Project row through the select plan. None = dropped by an !inner embed."""
+        out = {}
+
+        for item, rel, child_plan in plan:
+            if item[0] == "column":
+                _, name, alias = item
+                if name == "*":
+                    out.update(row)
+                else:
+                    out[alias] = row.get(name)
+                continue
+
+            _, alias, target, _, inner, _ = item
+            filters = embed_filters.get(alias, ())
+            kind, column = rel
+
+            if kind == "one":
+                child = self._get(target, row.get(column))
+                value = None
+                if child is not None and all(_compare(o, child.get(c), v) for c, o, v in filters):
+                    value = self._shape(target, child, child_plan, {})
+                if value is None and inner:
+                    return None
+            else:
+                value = []
+                for child in self._index(target, column).get(row.get("id"), ()):
+                    if all(_compare(o, child.get(c), v) for c, o, v in filters):
+                        shaped = self._shape(target, child, child_plan, {})
+                        if shaped is not None:
+                            value.append(shaped)
+                if not value and inner:
+                    return None
+
+            out[alias] = value
+
+        return out
+
+    def _tables_read(self, table: str, plan) -> tuple:
+        names = [table]
+        for item, rel, child_plan in plan:
+            if rel is not None:
+                names.extend(self._tables_read(item[2], child_plan))
+        return tuple(names)
+
+    def _candidates(self, table: str, base_filters):
+        """Rows of table narrowed by the most selective eq / in filter (via index)."""
+        best = None
+        for column, op, value in base_filters:
+            if op == "eq":
+                rows = self._index(table, column).get(value, [])
+            elif op == "in":
+                index = self._index(table, column)
+                rows = [r for v in value for r in index.get(v, ())]
+            else:
+                continue
+            if best is None or len(rows) < len(best):
+                best = rows
+        return self.rows(table) if best is None else best
+
+    def _select(self, q: Query) -> Result:
+        plan = self._plan(q.table, parse_select(q.columns))
+        read = self._tables_read(q.table, plan)
+
+        key = (q.table, q.columns, tuple(map(repr, q.filters)), tuple(q.logic), tuple(q.orders),
+               tuple(self._versions.get(t, 0) for t in read))
+
+        matched = self._results.get(key)
+        if matched is None:
+            matched = self._filtered(q, plan)
+            self._results[key] = matched
+            while len(self._results) > QUERY_CACHE_SIZE:
+                self._results.popitem(last=False)
+        else:
+            self._results.move_to_end(key)
+
+        total = len(matched)
+        limit = q.limit_
+        if self.max_rows is not None:
+            limit = self.max_rows if limit is None else min(limit, self.max_rows)
+        end = None if limit is None else q.offset + limit
+        data = [dict(r) for r in matched[q.offset:end]]
+
+        if q.single_:
+            if len(data) != 1:
+                raise _error("PGRST116", "JSON object requested, multiple (or no) rows returned")
+            data = data[0]
+
+        return Result(data, total if q.count else None)
+
+    def _filtered(self, q: Query, plan) -> list:
+        embeds = {item[1] for item, rel, _ in plan if rel is not None}
+        base, embedded = [], {}
+
+        for path, op, value in q.filters:
+            head, _, rest = path.partition(".")
+            if rest and head in embeds:
+                embedded.setdefault(head, []).append((rest, op, value))
+            else:
+                base.append((path, op, value))
+
+        logic = [_parse_logic(text) for text in q.logic]
+
+        rows = []
+        for row in self._candidates(q.table, base):
+            if not all(_compare(op, row.get(c), v) for c, op, v in base):
+                continue
+            if not all(pred(row) for pred in logic):
+                continue
+            shaped = self._shape(q.table, row, plan, embedded)
+            if shaped is None:
+                continue
+            rows.append((row, shaped))
+
+        for column, desc in reversed(q.orders):
+            rows.sort(
+                key=lambda pair: (1, None) if pair[0].get(column) is None else (0, pair[0][column]),
+                reverse=desc
+            )
+
+        return [shaped for _, shaped in rows]
+
+    def _matching(self, q: Query) -> list:
+        logic = [_parse_logic(text) for text in q.logic]
+        return [
+            row for row in self._candidates(q.table, q.filters)
+            if all(_compare(op, row.get(c), v) for c, op, v in q.filters)
+            and all(pred(row) for pred in logic)
+        ]
+
+    def _write(self, q: Query) -> Result:
+        if q.op == "insert":
+            rows = q.payload if isinstance(q.payload, list) else [q.payload]
+            return Result([dict(r) for r in self.insert(q.table, rows)])
+
+        if q.op == "upsert":
+            rows = q.payload if isinstance(q.payload, list) else [q.payload]
+            return Result([dict(r) for r in self.upsert(q.table, rows, q.on_conflict)])
+
+        matched = self._matching(q)
+
+        if q.op == "update":
+            values = {k: _normalize(v) for k, v in q.payload.items()}
+            for row in matched:
+                row.update(values)
+        else:
+            ids = {id(r) for r in matched}
+            self.tables[q.table] = [r for r in self.rows(q.table) if id(r) not in ids]
+            by_id = self._by_id.get(q.table, {})
+            for row in matched:
+                by_id.pop(row.get("id"), None)
+
+        if matched:
+            self._touch(q.table)
+
+        return Result([dict(r) for r in matched])
+
+    def insert(self, table: str, rows) -> list:
+        now = timestamp(datetime.now(timezone.utc))
+        stored = []
+
+        for row in rows:
+            row = {k: _normalize(v) for k, v in row.items()}
+            row.setdefault("id", str(uuid.uuid4()))
+            for column in TIMESTAMP_DEFAULTS.get(table, ()):
+                if row.get(column) is None:
+                    row[column] = now
+            stored.append(row)
+
+        self.load(table, stored)
+        return stored
+
+    def upsert(self, table: str, rows, on_conflict=None) -> list:
+        keys = on_conflict or PRIMARY_KEYS.get(table, ("id",))
+        existing = {tuple(r.get(k) for k in keys): r for r in self.rows(table)}
+
+        out, new = [], []
+        for row in rows:
+            row = {k: _normalize(v) for k, v in row.items()}
+            current = existing.get(tuple(row.get(k) for k in keys))
+            if current is None:
+                new.append(row)
+            else:
+                current.update(row)
+                out.append(current)
+
+        self._touch(table)
+        return out + self.insert(table, new)
+
+    # ---- rpc (mirrors web/supabase/migrations) ----
+    def _execute_rpc(self, call: RPC) -> Result:
+        stats = _stats.get()
+        start = time.perf_counter()
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        try:
+            if call.name not in self.rpcs:
+                raise _error("PGRST202", f"Could not find the function public.{call.name} in the schema cache")
+            with self._lock:
+                return Result(getattr(self, f"_rpc_{call.name}")(**call.params))
+        finally:
+            if stats is not None:
+                stats.record(call.name, "rpc", time.perf_counter() - start)
+
+    def _rpc_create_purchase_order(self, p_po: dict, p_items: list):
+        po = self.insert("purchase_orders", [{**p_po, "status": p_po.get("status") or "OPEN"}])[0]
+        self.insert("purchase_order_items", [
+            {
+                "po_id": po["id"],
+                "powder_id": i.get("powder_id"),
+                "quantity_kg": i.get("quantity_kg"),
+                "rate_per_kg": i.get("rate_per_kg"),
+                "amount": i.get("amount"),
+            }
+            for i in p_items or []
+        ])
+        return dict(po)
+
+    def _rpc_deliver_purchase_order(self, p_po_id, p_company_id, p_user_id):
+        po = self._get("purchase_orders", p_po_id)
+
+        if po is None or po.get("company_id") != p_company_id or po.get("status") != "OPEN":
+            raise _error("P0001", "Only OPEN POs can be delivered")
+
+        po.update({
+            "status": "COMPLETED",
+            "delivered_at": timestamp(datetime.now(timezone.utc)),
+            "updated_by": p_user_id,
+        })
+        self._touch("purchase_orders")
+
+        items = self._index("purchase_order_items", "po_id").get(p_po_id, [])
+        self.insert("stock_batches", [
+            {
+                "company_id": p_company_id,
+                "powder_id": i["powder_id"],
+                "supplier_id": po.get("supplier_id"),
+                "qty_received": i["quantity_kg"],
+                "qty_remaining": i["quantity_kg"],
+                "rate_per_kg": i["rate_per_kg"],
+                "created_by": p_user_id,
+            }
+            for i in items
+        ])
+
+        return {"status": "delivered", "batches": len(items)}
+
+    def _rpc_latest_po_events(self, p_company_id, p_po_ids, p_limit):
+        by_ref = self._index("activity_log", "ref_id")
+        rows = []
+
+        for po_id in dict.fromkeys(str(i) for i in p_po_ids or []):
+            events = sorted(
+                (e for e in by_ref.get(po_id, [])
+                 if e.get("company_id") == p_company_id and e.get("ref_type") == "PURCHASE_ORDER"),
+                key=lambda e: e["created_at"], reverse=True
+            )
+            rows.extend(
+                {k: e.get(k) for k in ("ref_id", "event_type", "created_at", "meta")}
+                for e in events[:max(p_limit, 1)]
+            )
+
+        return rows
+
+    def _rpc_fifo_month_fingerprints(self, p_company_id, p_from, p_to):
+        start, end = _normalize(p_from), _normalize(p_to)
+
+        # Memoised like selects: Postgres answers this from indexes, a
+        # Python scan of every FIFO row per call would dominate the timings
+        key = ("fifo_month_fingerprints", p_company_id, start, end,
+               self._versions.get("usage", 0), self._versions.get("usage_fifo", 0))
+        cached = self._results.get(key)
+        if cached is None:
+            cached = self._results[key] = self._month_fingerprints(p_company_id, start, end)
+            while len(self._results) > QUERY_CACHE_SIZE:
+                self._results.popitem(last=False)
+        else:
+            self._results.move_to_end(key)
+
+        return [dict(r) for r in cached]
+
+    def _month_fingerprints(self, p_company_id, start, end):
+        usage = self._index("usage", "id")
+        months = {}
+
+        for f in self._index("usage_fifo", "company_id").get(p_company_id, []):
+            u = (usage.get(f.get("usage_id")) or [None])[0]
+            if u is None or not start <= u["used_at"] <= end:
+                continue
+            count, latest = months.get(u["used_at"][:7], (0, None))
+            months[u["used_at"][:7]] = (count + 1, max(latest or f["created_at"], f["created_at"]))
+
+        return [
+            {"month": month, "source_count": count, "source_latest": latest}
+            for month, (count, latest) in months.items()
+        ]
+
+
+# ---------------------------------------------------------
+# Wiring
+# ---------------------------------------------------------
+class QueryStats:
+    """Requests and time spent in the fake, by (table or function, op)."""
+
+    def __init__(self):
+        self.requests = 0
+        self.seconds = 0.0
+        self.by_table = {}
+        self._lock = threading.Lock()
+
+    def record(self, table: str, op: str, seconds: float):
+        with self._lock:
+            self.requests += 1
+            self.seconds += seconds
+            key = f"{op} {table}"
+            self.by_table[key] = self.by_table.get(key, 0) + 1
+
+
+@contextmanager
+def stats():
+    """Count the fake's requests made under this block (incl. gather() threads)."""
+    counter = QueryStats()
+    token = _stats.set(counter)
+    try:
+        yield counter
+    finally:
+        _stats.reset(token)
+
+
+# Modules that bind `from config import supabase` (or service_supabase) at import time
+PATCHED_MODULES = (
+    "config",
+    "services.batching",
+    "services.fifo_data",
+    "services.fifo_cache",
+    "services.rollups",
+    "services.activity_log",
+    "reports.monthly",
+    "po.purchase_order",
+    "po.po_pdf",
+    "po.po_history",
+    "settings.routes",
+)
+
+CLIENT_ATTRIBUTES = ("supabase", "service_supabase")
+
+
+@contextmanager
+def installed(db: FakeSupabase):
+    """Point every module's `supabase` / `service_supabase` at db for the duration of the block."""
+    modules = [importlib.import_module(name) for name in PATCHED_MODULES]
+    patched = [
+        (module, attr, getattr(module, attr))
+        for module in modules
+        for attr in CLIENT_ATTRIBUTES
+        if hasattr(module, attr)
+    ]
+
+    for module, attr, _ in patched:
+        setattr(module, attr, db)
+    try:
+        yield db
+    finally:
+        for module, attr, original in patched:
+            setattr(module, attr, original)
@@ -0,0 +1,313 @@
+# bench/run.py
+import argparse
+import io
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from contextlib import nullcontext, redirect_stdout
+from datetime import datetime, timedelta, timezone
+
+# The real client is built at import time; it is never used for requests
+os.environ.setdefault("SUPABASE_URL", "http://supabase.bench.invalid")
+os.environ.setdefault("SUPABASE_KEY", "bench")
+os.environ.setdefault("PDF_RENDER_PROCESSES", "0")
+
+from bench import tenants
+from bench.fake_supabase import FakeSupabase, installed, stats
+
+# ---------------------------------------------------------
+# Benchmark suite:  python -m bench.run [--sizes 1k,100k] [--check]
+#
+# Each size gets a fresh in-memory database (bench/fake_supabase.py) with
+# one synthetic tenant (bench/tenants.py), patched in for every module
+# that talks to Supabase. Every case is run --repeat times; reported are
+# the median / min wall time and, per run, the number of requests made to
+# the database and the time spent inside the fake (summed over concurrent
+# requests). Request counts do not depend on the machine – a jump there is
+# a new round trip (N+1) even when the timings are noisy.
+#
+# "cold" cases start without the FIFO frame cache and rollup store,
+# "warm" ones right after a run that filled them. *_fallback cases run
+# with the SQL functions missing (PGRST202 path). Every request sleeps
+# --latency-ms (default DEFAULT_LATENCY_MS) like a network round trip, so
+# requests that stop overlapping show up in the timings, not only in
+# the request counts.
+#
+# Results are compared against bench/baseline.json (--save rewrites the
+# sizes that were run). Timings are only comparable on the same machine.
+# ---------------------------------------------------------
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+DEFAULT_LATENCY_MS = 20.0
+
+# A case is slower when median > baseline * (1 + tolerance) and by more than this
+NOISE_FLOOR_S = 0.010
+
+
+class Bench:
+    def __init__(self, db: FakeSupabase, tenant: dict, seed: int):
+        self.db = db
+        self.tenant = tenant
+        self.rng = random.Random(seed)
+        self.company_id = tenant["company_id"]
+
+        now = datetime.now(timezone.utc)
+        last_month = now.replace(day=1) - timedelta(days=1)
+        self.month = (last_month.year, last_month.month)
+        self.fy = now.year if now.month >= 4 else now.year - 1
+        self.window = (
+            datetime(now.year - 1, now.month, 1),
+            datetime(now.year, now.month, now.day, 23, 59, 59)
+        )
+
+    def reset_caches(self):
+        from services import fifo_cache
+        fifo_cache.invalidate()
+        self.db.truncate("fifo_monthly_rollups")
+
+
+# ---------------------------------------------------------
+# Cases: name -> (setup(bench) -> arg, run(bench, arg))
+# ---------------------------------------------------------
+def _fifo_data(b, _):
+    from services.fifo_data import get_fifo_data
+    return get_fifo_data(b.company_id, *b.window)
+
+
+def _monthly(b, _):
+    from reports.monthly import generate_monthly_pdf
+    return generate_monthly_pdf(b.company_id, *b.month)
+
+
+def _annual(b, _):
+    from reports.annual import generate_annual_pdf
+    return generate_annual_pdf(b.company_id, b.fy)
+
+
+def _po_pdf(b, po_id):
+    from po.po_pdf import generate_po_pdf
+    return generate_po_pdf(po_id)
+
+
+def _create_po(b, payload):
+    from po.purchase_order import create_po
+    return create_po(b.company_id, b.tenant["user_id"], payload)
+
+
+def _deliver_po(b, po_id):
+    from po.purchase_order import deliver_po
+    return deliver_po(b.company_id, po_id, b.tenant["user_id"])
+
+
+def _cold(b):
+    b.reset_caches()
+
+
+def _warm(b):
+    # Whatever the previous run left in the caches
+    return None
+
+
+def _without_rpcs(setup):
+    def wrapped(b):
+        b.db.rpcs = set()
+        return setup(b)
+    return wrapped
+
+
+CASES = {
+    "fifo_data_cold": (_cold, _fifo_data),
+    "fifo_data_warm": (_warm, _fifo_data),
+    "monthly_pdf_cold": (_cold, _monthly),
+    "monthly_pdf_warm": (_warm, _monthly),
+    "annual_pdf_cold": (_cold, _annual),
+    "annual_pdf_warm": (_warm, _annual),
+    "po_pdf": (lambda b: b.rng.choice(b.tenant["po_ids"]), _po_pdf),
+    "create_po": (lambda b: tenants.po_payload(b.tenant, b.rng), _create_po),
+    "create_po_fallback": (_without_rpcs(lambda b: tenants.po_payload(b.tenant, b.rng)), _create_po),
+    "deliver_po": (lambda b: tenants.open_po(b.db, b.tenant, b.rng), _deliver_po),
+    "deliver_po_fallback": (_without_rpcs(lambda b: tenants.open_po(b.db, b.tenant, b.rng)), _deliver_po),
+}
+
+
+def run_case(b: Bench, name: str, repeat: int, quiet: bool = True) -> dict:
+    setup, run = CASES[name]
+    times, requests, db_seconds = [], [], []
+
+    # warm-up run (imports, fonts, first-touch of the fake's indexes)
+    _once(b, setup, run, quiet)
+
+    for _ in range(repeat):
+        seconds, counter = _once(b, setup, run, quiet)
+        times.append(seconds)
+        requests.append(counter.requests)
+        db_seconds.append(counter.seconds)
+
+    return {
+        "runs": repeat,
+        "median_s": round(statistics.median(times), 6),
+        "min_s": round(min(times), 6),
+        "mean_s": round(statistics.fmean(times), 6),
+        "requests": round(statistics.fmean(requests), 2),
+        "db_s": round(statistics.fmean(db_seconds), 6),
+    }
+
+
+def _once(b: Bench, setup, run, quiet: bool):
+    rpcs = set(b.db.rpcs)
+    try:
+        arg = setup(b)
+        with redirect_stdout(io.StringIO()) if quiet else nullcontext(), stats() as counter:
+            start = time.perf_counter()
+            run(b, arg)
+            seconds = time.perf_counter() - start
+    finally:
+        b.db.rpcs = rpcs
+
+    return seconds, counter
+
+
+def run_size(size: str, cases, repeat: int, latency: float, seed: int, quiet: bool) -> dict:
+    db = FakeSupabase()
+    start = time.perf_counter()
+    tenant = tenants.populate(db, size, seed=seed)
+    print(f"[BENCH] {size}: {tenant['fifo_rows']} FIFO rows, {len(tenant['po_ids'])} POs "
+          f"generated in {time.perf_counter() - start:.1f}s")
+
+    b = Bench(db, tenant, seed)
+    results = {}
+
+    with installed(db):
+        db.latency = latency
+        try:
+            for name in cases:
+                results[name] = run_case(b, name, repeat, quiet)
+                print(_line(size, name, results[name]))
+        finally:
+            from services import activity_log, fifo_cache
+            activity_log.shutdown()
+            fifo_cache.invalidate()
+
+    return results
+
+
+# ---------------------------------------------------------
+# Baseline
+# ---------------------------------------------------------
+def _line(size: str, name: str, r: dict, base: dict | None = None) -> str:
+    line = (f"  {size:>5} {name:<22} median {r['median_s'] * 1000:9.1f} ms"
+            f"  min {r['min_s'] * 1000:9.1f} ms  requests {r['requests']:7.1f}"
+            f"  db {r['db_s'] * 1000:8.1f} ms")
+    if base:
+        delta = (r["median_s"] - base["median_s"]) / base["median_s"] * 100 if base["median_s"] else 0.0
+        line += f"  vs baseline {delta:+6.1f}%"
+        if r["requests"] != base["requests"]:
+            line += f" (requests {base['requests']:g} -> {r['requests']:g})"
+    return line
+
+
+def load_baseline(path: str) -> dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"meta": {}, "results": {}}
+
+
+def save_baseline(path: str, baseline: dict, results: dict, latency: float):
+    baseline.setdefault("results", {}).update(results)
+    baseline["meta"] = {
+        "saved_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()}, {os.cpu_count()} cpu",
+        "latency_ms": latency * 1000,
+    }
+
+    with open(path, "w") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def compare(results: dict, baseline: dict, tolerance: float, timings: bool = True) -> list:
+    """Lines describing every regression against the baseline (request counts only without timings)."""
+    regressions = []
+
+    for size, cases in results.items():
+        for name, r in cases.items():
+            base = baseline.get("results", {}).get(size, {}).get(name)
+            if not base:
+                continue
+
+            print(_line(size, name, r, base))
+
+            slower = r["median_s"] - base["median_s"]
+            if timings and slower > NOISE_FLOOR_S and r["median_s"] > base["median_s"] * (1 + tolerance):
+                regressions.append(f"{size} {name}: median {base['median_s']:.4f}s -> {r['median_s']:.4f}s")
+            # fractional means vary with probe timing; a whole extra request does not
+            if r["requests"] > base["requests"] + 0.5:
+                regressions.append(f"{size} {name}: requests {base['requests']:g} -> {r['requests']:g}")
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark reports and PO paths against an in-memory Supabase")
+    parser.add_argument("--sizes", default="1k,100k",
+                        help=f"tenant sizes in FIFO rows: {', '.join(tenants.SIZES)} or a number (default 1k,100k)")
+    parser.add_argument("--only", help="comma-separated case names (default: all)")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per case (default 5)")
+    parser.add_argument("--latency-ms", type=float, default=DEFAULT_LATENCY_MS,
+                        help=f"simulated round trip per request (default {DEFAULT_LATENCY_MS:g})")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", default=BASELINE, help="baseline JSON (default bench/baseline.json)")
+    parser.add_argument("--save", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--check", action="store_true", help="exit 1 on a regression against the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed median slowdown (default 0.25)")
+    parser.add_argument("--verbose", action="store_true", help="show the backend's own output")
+    parser.add_argument("--list", action="store_true", help="list the cases and exit")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print("\n".join(CASES))
+        return 0
+
+    cases = [c.strip() for c in args.only.split(",")] if args.only else list(CASES)
+    unknown = [c for c in cases if c not in CASES]
+    if unknown:
+        parser.error(f"unknown case(s): {', '.join(unknown)}")
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.ERROR)
+
+    results = {}
+    for size in (s.strip() for s in args.sizes.split(",") if s.strip()):
+        results[size] = run_size(size, cases, args.repeat, args.latency_ms / 1000, args.seed, not args.verbose)
+
+    baseline = load_baseline(args.baseline)
+
+    meta = baseline.get("meta", {})
+    same_latency = meta.get("latency_ms", 0.0) == args.latency_ms
+
+    if baseline.get("results"):
+        print(f"[BENCH] Against {args.baseline} ({meta.get('machine', 'unknown machine')})")
+        if not same_latency:
+            print(f"[BENCH] Baseline was recorded at --latency-ms {meta.get('latency_ms', 0.0):g}, "
+                  f"comparing request counts only")
+    regressions = compare(results, baseline, args.tolerance, timings=same_latency)
+
+    for line in regressions:
+        print(f"[BENCH] REGRESSION {line}")
+
+    if args.save:
+        save_baseline(args.baseline, baseline, results, args.latency_ms / 1000)
+        print(f"[BENCH] Baseline written to {args.baseline}")
+
+    return 1 if args.check and regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
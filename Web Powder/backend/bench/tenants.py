@@ -0,0 +1,219 @@
+# bench/tenants.py
+import random
+from datetime import datetime, timedelta, timezone
+
+from bench.fake_supabase import FakeSupabase, timestamp
+
+# ---------------------------------------------------------
+# Synthetic tenants for the benchmark suite.
+#
+# One company with suppliers, powders, usage and the usage_fifo rows FIFO
+# consumption produced for it (1-3 per usage, like a usage that drains
+# several stock batches), spread over the last MONTHS months up to now, so
+# reports see closed months (rollup store) and the open month alike. Also
+# POs with items in every status. Deterministic for a given seed.
+# ---------------------------------------------------------
+SIZES = {
+    "1k": 1_000,
+    "10k": 10_000,
+    "100k": 100_000,
+    "1m": 1_000_000,
+}
+
+MONTHS = 26
+SUPPLIERS = 12
+POWDERS = 40
+
+
+def fifo_rows(size: str) -> int:
+    try:
+        return SIZES[size.lower()]
+    except KeyError:
+        return int(size)
+
+
+def populate(db: FakeSupabase, size: str = "1k", company_id: str = "bench-company", seed: int = 0) -> dict:
+    """
+    Load one tenant of `size` usage_fifo rows into db. Returns the ids the
+    benchmarks need: company_id, user_id, supplier / powder ids, po_ids.
+    """
+    rng = random.Random(seed)
+    n_fifo = fifo_rows(size)
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    first = now - timedelta(days=MONTHS * 30.5)
+    span_seconds = int((now - first).total_seconds())
+    user_id = f"{company_id}-owner"
+
+    db.load("companies", [{
+        "id": company_id,
+        "company_name": "Bench Powder Coatings Pvt Ltd",
+        "director": "A. Director",
+        "address": "Plot 12, Industrial Estate",
+        "city": "Pune",
+        "state": "Maharashtra",
+        "pincode": "411001",
+        "phone": "+91 20 0000 0000",
+        "email": "accounts@example.com",
+        "gstin": "27AAAAA0000A1Z5",
+        "signature_url": None,
+    }])
+
+    db.load("users", [{
+        "id": user_id, "company_id": company_id, "role": "owner",
+        "full_name": "Bench Owner", "username": "owner",
+    }])
+
+    suppliers = [
+        {
+            "id": f"{company_id}-sup-{i}",
+            "company_id": company_id,
+            "supplier_name": f"Supplier {i:02d}",
+            "address": f"{i} Supply Road",
+            "city": "Mumbai",
+            "state": "Maharashtra",
+            "pincode": "400001",
+            "phone": f"+91 22 0000 {i:04d}",
+            "email": f"sales{i}@supplier.example",
+            "gstin": f"27BBBBB{i:04d}B1Z5",
+        }
+        for i in range(SUPPLIERS)
+    ]
+    db.load("suppliers", suppliers)
+
+    powders = [
+        {"id": f"{company_id}-pow-{i}", "company_id": company_id, "powder_name": f"RAL {9000 + i} Matt"}
+        for i in range(POWDERS)
+    ]
+    db.load("powders", powders)
+
+    # ---- usage + usage_fifo ----
+    usage, fifo = [], []
+    n = 0
+
+    while len(fifo) < n_fifo:
+        used_at = first + timedelta(seconds=rng.randrange(span_seconds))
+        usage_id = f"{company_id}-use-{n}"
+        n += 1
+
+        usage.append({
+            "id": usage_id,
+            "company_id": company_id,
+            "powder_id": rng.choice(powders)["id"],
+            "supplier_id": rng.choice(suppliers)["id"],
+            "used_at": timestamp(used_at),
+            "created_at": timestamp(used_at),
+        })
+
+        for part in range(min(rng.choice((1, 1, 2, 3)), n_fifo - len(fifo))):
+            fifo.append({
+                "id": f"{usage_id}-{part}",
+                "company_id": company_id,
+                "usage_id": usage_id,
+                "qty_used": round(rng.uniform(0.5, 25.0), 3),
+                "rate_per_kg": round(rng.uniform(180.0, 420.0), 2),
+                "created_at": timestamp(used_at + timedelta(seconds=part)),
+            })
+
+    db.load("usage", usage)
+    db.load("usage_fifo", fifo)
+
+    # ---- purchase orders ----
+    n_pos = min(max(50, n_fifo // 100), 5_000)
+    pos, items = [], []
+
+    for i in range(n_pos):
+        created = first + timedelta(seconds=rng.randrange(span_seconds))
+        supplier = rng.choice(suppliers)
+        po_id = f"{company_id}-po-{i}"
+        lines = [
+            {
+                "id": f"{po_id}-item-{j}",
+                "po_id": po_id,
+                "powder_id": rng.choice(powders)["id"],
+                "quantity_kg": float(rng.choice((25, 50, 100, 200, 500))),
+                "rate_per_kg": round(rng.uniform(180.0, 420.0), 2),
+            }
+            for j in range(rng.randint(1, 6))
+        ]
+        for line in lines:
+            line["amount"] = round(line["quantity_kg"] * line["rate_per_kg"], 2)
+        items.extend(lines)
+
+        pos.append({
+            "id": po_id,
+            "company_id": company_id,
+            "supplier_id": supplier["id"],
+            "supplier_name": supplier["supplier_name"],
+            "po_number": f"PO-{i + 1:05d}",
+            "po_date": created.date().isoformat(),
+            "total_amount": round(sum(line["amount"] for line in lines), 2),
+            "status": rng.choices(("OPEN", "COMPLETED", "CANCELLED"), (3, 6, 1))[0],
+            "created_by": user_id,
+            "updated_by": user_id,
+            "created_at": timestamp(created),
+            "updated_at": timestamp(created),
+            "delivered_at": None,
+        })
+
+    db.load("purchase_orders", pos)
+    db.load("purchase_order_items", items)
+
+    return {
+        "company_id": company_id,
+        "user_id": user_id,
+        "supplier_ids": [s["id"] for s in suppliers],
+        "powder_ids": [p["id"] for p in powders],
+        "po_ids": [p["id"] for p in pos],
+        "fifo_rows": len(fifo),
+        "usage_rows": len(usage),
+    }
+
+
+def open_po(db: FakeSupabase, tenant: dict, rng: random.Random, items: int = 4) -> str:
+    """Insert one OPEN PO (for deliver_po runs) and return its id."""
+    supplier_id = rng.choice(tenant["supplier_ids"])
+    po = db.insert("purchase_orders", [{
+        "company_id": tenant["company_id"],
+        "supplier_id": supplier_id,
+        "supplier_name": supplier_id,
+        "po_number": f"PO-B{rng.randrange(10 ** 6):06d}",
+        "po_date": datetime.now(timezone.utc).date().isoformat(),
+        "total_amount": 0,
+        "status": "OPEN",
+        "created_by": tenant["user_id"],
+    }])[0]
+
+    db.insert("purchase_order_items", [
+        {
+            "po_id": po["id"],
+            "powder_id": rng.choice(tenant["powder_ids"]),
+            "quantity_kg": 100.0,
+            "rate_per_kg": 250.0,
+            "amount": 25_000.0,
+        }
+        for _ in range(items)
+    ])
+
+    return po["id"]
+
+
+def po_payload(tenant: dict, rng: random.Random, items: int = 4) -> dict:
+    """A create_po payload, as the frontend sends it."""
+    supplier_id = rng.choice(tenant["supplier_ids"])
+    lines = [
+        {
+            "powder_id": rng.choice(tenant["powder_ids"]),
+            "quantity_kg": float(rng.choice((25, 50, 100))),
+            "rate_per_kg": round(rng.uniform(180.0, 420.0), 2),
+        }
+        for _ in range(items)
+    ]
+
+    return {
+        "supplier_id": supplier_id,
+        "supplier_name": supplier_id,
+        "po_number": f"PO-N{rng.randrange(10 ** 6):06d}",
+        "po_date": datetime.now(timezone.utc).date().isoformat(),
+        "total_amount": round(sum(i["quantity_kg"] * i["rate_per_kg"] for i in lines), 2),
+        "items": lines,
+    }
@@ -1,12 +1,148 @@
 # backend/config.py
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+from functools import lru_cache
 from supabase import create_client, Client
+from supabase.lib.client_options import SyncClientOptions
+import httpx
 import os
 
 # Load from environment variables (Render → Environment)
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")     # usually the anon/public key
 
+# Optional service-role key, for backend-only tables that anon /
+# authenticated cannot reach (e.g. fifo_monthly_rollups)
+SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
+
 if not SUPABASE_URL or not SUPABASE_KEY:
     raise ValueError("Missing Supabase URL or Key in environment variables")
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
\ No newline at end of file
+# ---------------------------------------------------------
+# HTTP layer shared by every Supabase client
+#
+# All sync clients sit on one httpx transport, i.e. one keep-alive
+# connection pool (HTTP/2 by default); clients only differ in timeout.
+# Fan-out goes through gather() below: the routes are sync, so threads
+# on this pool rather than an async client and an event loop.
+# ---------------------------------------------------------
+HTTP_MAX_CONNECTIONS = int(os.getenv("SUPABASE_HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("SUPABASE_HTTP_MAX_KEEPALIVE", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("SUPABASE_HTTP_KEEPALIVE_EXPIRY", "60"))
+HTTP2 = os.getenv("SUPABASE_HTTP2", "1") == "1"
+HTTP_TIMEOUT = float(os.getenv("SUPABASE_HTTP_TIMEOUT", "30"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("SUPABASE_HTTP_CONNECT_TIMEOUT", "5"))
+
+# Threads shared by every gather() in the process (and the per-call default)
+GATHER_MAX_WORKERS = int(os.getenv("SUPABASE_GATHER_MAX_WORKERS", "8"))
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+    )
+
+
+def _timeout(seconds: float | None) -> httpx.Timeout:
+    return httpx.Timeout(seconds or HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+
+
+_transport = httpx.HTTPTransport(http2=HTTP2, limits=_limits())
+
+
+def _create(key: str, timeout: float | None) -> Client:
+    http = httpx.Client(
+        transport=_transport,
+        timeout=_timeout(timeout),
+        follow_redirects=True
+    )
+
+    return create_client(
+        SUPABASE_URL,
+        key,
+        options=SyncClientOptions(
+            httpx_client=http,
+            postgrest_client_timeout=_timeout(timeout)
+        )
+    )
+
+
+@lru_cache(maxsize=None)
+def get_client(timeout: float | None = None) -> Client:
+    """
+    Sync client on the shared pool. timeout (seconds) overrides the default
+    per-request timeout for calls made through this client, e.g.
+    get_client(120).table(...) for a known slow export query.
+    """
+    return _create(SUPABASE_KEY, timeout)
+
+
+@lru_cache(maxsize=None)
+def get_service_client() -> Client | None:
+    """Service-role client on the shared pool, None without SUPABASE_SERVICE_KEY."""
+    return _create(SUPABASE_SERVICE_KEY, None) if SUPABASE_SERVICE_KEY else None
+
+
+# One pool for every gather() in the process, so concurrent requests share
+# GATHER_MAX_WORKERS threads instead of each starting their own
+_gather_pool = ThreadPoolExecutor(
+    max_workers=GATHER_MAX_WORKERS,
+    thread_name_prefix="supabase-gather"
+)
+
+
+def _drain(jobs: deque, results: list, errors: dict):
+    while True:
+        try:
+            i, context, call = jobs.popleft()
+        except IndexError:
+            return
+        try:
+            results[i] = context.run(call)
+        except BaseException as e:
+            errors[i] = e
+
+
+def gather(*calls, max_workers: int = GATHER_MAX_WORKERS):
+    """
+    Run independent blocking calls (typically query .execute()s) at the
+    same time and return their results in order. The first exception is
+    re-raised after every call has finished. Each call runs in a copy of
+    the caller's context (request metrics, profiling).
+
+    The calling thread works through the calls itself, with up to
+    max_workers - 1 helpers from the shared pool taking calls from the
+    same queue. Helpers that have not started by the time the queue is
+    empty are cancelled rather than waited for, so a gather() made from a
+    pool thread (nested gathers) never waits on a busy pool.
+    """
+    jobs = deque((i, contextvars.copy_context(), call) for i, call in enumerate(calls))
+    results, errors = [None] * len(calls), {}
+
+    helpers = [
+        _gather_pool.submit(_drain, jobs, results, errors)
+        for _ in range(min(max_workers, len(calls)) - 1)
+    ]
+    _drain(jobs, results, errors)
+
+    # Started helpers are finishing their last call; the rest found nothing to do
+    for helper in helpers:
+        if not helper.cancel():
+            helper.result()
+
+    if errors:
+        raise errors[min(errors)]
+
+    return results
+
+
+def close_clients():
+    """Release pooled connections (app shutdown)."""
+    _transport.close()
+
+
+supabase: Client = get_client()
+service_supabase: Client | None = get_service_client()
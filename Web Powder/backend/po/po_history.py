@@ -1,24 +1,33 @@
-from config import supabase
-from datetime import datetime
+import logging
+from collections import defaultdict
+from functools import partial
+from postgrest.exceptions import APIError
+from config import supabase, gather
+from services import activity_log
+from services.batching import chunked, select_pages, IN_CHUNK_SIZE, IN_MAX_WORKERS, PAGE_SIZE
+
+logger = logging.getLogger(__name__)
 
 
 # -------------------------------------------------
 # LOG PO EVENT
+# Queued and bulk-written in the background (services/activity_log.py)
 # -------------------------------------------------
 def log_po_event(
     company_id: str,
     po_id: str,
     action: str,
-    meta: dict | None = None
+    meta: dict | None = None,
+    user_id: str | None = None
 ):
-    supabase.table("activity_log").insert({
-        "company_id": company_id,
-        "event_type": action,
-        "ref_type": "PURCHASE_ORDER",
-        "ref_id": po_id,
-        "meta": meta or {},
-        "created_at": datetime.utcnow()
-    }).execute()
+    activity_log.log_event(
+        company_id,
+        action,
+        "PURCHASE_ORDER",
+        po_id,
+        meta,
+        user_id=user_id
+    )
 
 
 # -------------------------------------------------
@@ -31,3 +40,86 @@ def get_po_history(company_id: str, po_id: str):
         .eq("ref_id", po_id) \
         .order("created_at") \
         .execute().data
+
+
+# -------------------------------------------------
+# GET PO HISTORIES (many POs, one query per id chunk)
+# -------------------------------------------------
+HISTORY_COLUMNS = "ref_id, event_type, created_at, meta"
+
+
+def _latest_events(company_id: str, po_ids: list, limit_per_po: int):
+    """
+    Each PO's latest limit_per_po events via the latest_po_events RPC,
+    chunked so no response can pass PostgREST's max-rows (limit_per_po must
+    not exceed PAGE_SIZE). None when the function does not exist.
+    """
+    def run(chunk):
+        return supabase.rpc("latest_po_events", {
+            "p_company_id": company_id,
+            "p_po_ids": chunk,
+            "p_limit": limit_per_po
+        }).execute().data or []
+
+    chunks = chunked(po_ids, max(1, min(IN_CHUNK_SIZE, PAGE_SIZE // limit_per_po)))
+
+    try:
+        results = gather(*(partial(run, c) for c in chunks), max_workers=IN_MAX_WORKERS)
+    except APIError as e:
+        if e.code != "PGRST202":
+            raise
+        logger.warning("latest_po_events RPC not found, fetching every event")
+        return None
+
+    return [row for rows in results for row in rows]
+
+
+def _all_events(company_id: str, po_ids: list):
+    """Every event of the POs: id chunks, each paged (many events per PO)."""
+    def run(chunk):
+        return select_pages(
+            lambda: supabase.table("activity_log")
+                .select(HISTORY_COLUMNS + ", id", count="exact")
+                .eq("company_id", company_id)
+                .eq("ref_type", "PURCHASE_ORDER")
+                .in_("ref_id", chunk)
+                .order("created_at", desc=True)
+                .order("id")
+        )
+
+    results = gather(*(partial(run, c) for c in chunked(po_ids)), max_workers=IN_MAX_WORKERS)
+
+    return [
+        {k: row[k] for k in ("ref_id", "event_type", "created_at", "meta")}
+        for rows in results for row in rows
+    ]
+
+
+def get_po_histories(company_id: str, po_ids, limit_per_po: int | None = None):
+    """
+    po_id -> events (oldest first) for every requested PO, [] when it has
+    none. limit_per_po keeps only each PO's latest N events (1 for
+    "latest event" badges) and only those leave the database.
+    """
+    po_ids = list(dict.fromkeys(i for i in po_ids if i))
+
+    if not po_ids:
+        return {}
+
+    # Above PAGE_SIZE a single PO's events could pass max-rows in one RPC
+    # response; the paged path is exact for any limit
+    rows = _latest_events(company_id, po_ids, limit_per_po) \
+        if limit_per_po and limit_per_po <= PAGE_SIZE else None
+    if rows is None:
+        rows = _all_events(company_id, po_ids)
+
+    # Newest first across chunks, so the first N per PO are its latest
+    rows.sort(key=lambda r: r["created_at"], reverse=True)
+
+    grouped = defaultdict(list)
+    for row in rows:
+        events = grouped[row.pop("ref_id")]
+        if limit_per_po is None or len(events) < limit_per_po:
+            events.append(row)
+
+    return {po_id: grouped[po_id][::-1] for po_id in po_ids}
@@ -1,101 +1,295 @@
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, Image
 from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_CENTER
 from reportlab.lib import colors
 from reportlab.lib.units import mm
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfbase.pdfmetrics import registerFontFamily
 
 from config import supabase
+from postgrest.exceptions import APIError
 from datetime import datetime
+from collections import defaultdict
+import logging
 import os
-import tempfile
-import requests
 from io import BytesIO
 
-
-# ---------------- FONT SETUP ----------------
-from utils.fonts import get_font_path
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfbase.pdfmetrics import registerFontFamily
-
-def register_fonts():
-    pdfmetrics.registerFont(
-        TTFont("DejaVuSans", get_font_path("DejaVuSans.ttf"))
-    )
-    pdfmetrics.registerFont(
-        TTFont("DejaVuSans-Bold", get_font_path("DejaVuSans-Bold.ttf"))
-    )
-    registerFontFamily(
-        family="DejaVuSans",
-        normal="DejaVuSans",
-        bold="DejaVuSans-Bold"
+from services.batching import select_in, select_pages
+from utils import pdf_cache
+from utils.signature_cache import get_signature
+from utils.metrics import span, timed
+
+
+# ---------------- FONT + STYLE SETUP ----------------
+# Registered / built once per process (utils/pdf_resources.py)
+from utils.pdf_resources import register_fonts, po_styles
+from utils import render_pool
+
+logger = logging.getLogger(__name__)
+
+
+COMPANY_COLUMNS = "company_name, address, city, state, pincode, phone, email, gstin, signature_url"
+
+PO_COLUMNS = f"""
+    id,
+    po_number,
+    po_date,
+    supplier_name,
+    supplier_id,
+    total_amount,
+    status,
+    updated_at,
+    companies ({COMPANY_COLUMNS})
+"""
+
+SUPPLIER_COLUMNS = "id, supplier_name, address, city, state, pincode, phone, email, gstin"
+
+ITEM_COLUMNS = """
+    po_id,
+    quantity_kg,
+    rate_per_kg,
+    amount,
+    powder:powders!powder_id (powder_name)
+"""
+
+# PO + company + supplier + items in one round trip
+PO_JOINED_COLUMNS = PO_COLUMNS.rstrip() + f""",
+    supplier:suppliers!supplier_id ({SUPPLIER_COLUMNS}),
+    items:purchase_order_items ({ITEM_COLUMNS})
+"""
+
+# Upper bound on POs per batch export
+BATCH_MAX = int(os.getenv("PO_PDF_BATCH_MAX", "1000"))
+
+
+def _fingerprint(po: dict, supplier: dict | None):
+    # The PDF prints the live supplier and company rows (address, GSTIN,
+    # signature ...), so edits there must change the fingerprint as much
+    # as edits to the PO – the frontend writes them without telling us
+    return (
+        po.get("updated_at"), po.get("status"), po.get("total_amount"),
+        tuple(sorted((supplier or {}).items())),
+        tuple(sorted((po.get("companies") or {}).items()))
     )
 
 
-def generate_po_pdf(po_id: str) -> str:
-    register_fonts()  # from your utils/fonts.py
-
-    # ---- PO + COMPANY ----
-    po = supabase.table("purchase_orders") \
-        .select("""
-            id,
-            po_number,
-            po_date,
-            supplier_name,
-            supplier_id,
-            total_amount,
-            companies (
-                company_name,
-                address,
-                city,
-                state,
-                pincode,
-                phone,
-                email,
-                gstin,
-                signature_url
-            )
-        """) \
-        .eq("id", po_id) \
-        .single() \
-        .execute().data
+@timed("fetch")
+def po_fingerprint(po_id: str):
+    """
+    Data fingerprint of a PO for the PDF cache (utils/pdf_cache.py).
+    None when it cannot be taken – the PDF is then rendered uncached.
+    """
+    try:
+        po = supabase.table("purchase_orders") \
+            .select(
+                f"updated_at, status, total_amount, companies ({COMPANY_COLUMNS}), "
+                f"supplier:suppliers!supplier_id ({SUPPLIER_COLUMNS})"
+            ) \
+            .eq("id", po_id) \
+            .limit(1) \
+            .execute().data
+    except APIError as e:
+        logger.warning("No PDF fingerprint for PO %s (%s)", po_id, e.code)
+        return None
 
     if not po:
-        raise ValueError("PO not found")
+        return None
+
+    return _fingerprint(po[0], po[0].get("supplier"))
+
+
+def _attach_separately(pos: list):
+    """
+    Fallback when suppliers / items cannot be embedded: two bulk queries
+    for all POs, attached under the same keys the joined select uses.
+    """
+    suppliers = {
+        s["id"]: s
+        for s in select_in("suppliers", SUPPLIER_COLUMNS, "id", [p.get("supplier_id") for p in pos])
+    }
+
+    items = defaultdict(list)
+    for item in select_in("purchase_order_items", ITEM_COLUMNS, "po_id", [p["id"] for p in pos]):
+        items[item["po_id"]].append(item)
+
+    for po in pos:
+        po["supplier"] = suppliers.get(po.get("supplier_id"))
+        po["items"] = items[po["id"]]
+
+    return pos
 
+
+def _context(po: dict) -> dict:
     company = po.get("companies") or {}
 
-    # ---- SUPPLIER ----
-    supplier = None
-    if po.get("supplier_id"):
-        supplier = supabase.table("suppliers") \
-            .select("supplier_name, address, city, state, pincode, phone, email, gstin") \
-            .eq("id", po["supplier_id"]) \
-            .single() \
+    return {
+        "po": {k: v for k, v in po.items() if k not in ("supplier", "items")},
+        "company": company,
+        "supplier": po.get("supplier"),
+        "items": po.get("items") or [],
+        # cached + pre-scaled, no fetch on warm paths (utils/signature_cache.py)
+        "signature": get_signature(company.get("signature_url")),
+    }
+
+
+def build_po_context(po_id: str) -> dict:
+    """Data stage: PO, company, supplier, items and signature bytes as plain values."""
+
+    # ---- PO + COMPANY + SUPPLIER + ITEMS (one query) ----
+    with span("fetch"):
+        pos = _load_po(po_id)
+
+    if not pos:
+        raise ValueError("PO not found")
+
+    return _context(pos[0])
+
+
+def _load_po(po_id: str):
+    try:
+        pos = supabase.table("purchase_orders") \
+            .select(PO_JOINED_COLUMNS) \
+            .eq("id", po_id) \
+            .limit(1) \
+            .execute().data
+    except APIError as e:
+        logger.warning("Joined PO load failed (%s), loading separately", e.code)
+        pos = supabase.table("purchase_orders") \
+            .select(PO_COLUMNS) \
+            .eq("id", po_id) \
+            .limit(1) \
             .execute().data
+        _attach_separately(pos or [])
+
+    return pos
+
+
+def generate_po_pdf(po_id: str) -> bytes:
+    context = build_po_context(po_id)
+    return render_pool.render(render_po_pdf, context)
+
+
+# ---------------- BATCH EXPORT ----------------
+def _select_pos(company_id: str, columns: str, po_ids, date_from, date_to) -> list:
+    if po_ids is not None:
+        return select_in(
+            "purchase_orders", columns, "id", po_ids,
+            apply=lambda q: q.eq("company_id", company_id)
+        )
+
+    return select_pages(lambda: _date_query(company_id, columns, date_from, date_to).order("id"))
+
+
+def _date_query(company_id: str, columns: str, date_from, date_to):
+    query = supabase.table("purchase_orders") \
+        .select(columns, count="exact") \
+        .eq("company_id", company_id)
+    if date_from:
+        query = query.gte("po_date", date_from)
+    if date_to:
+        query = query.lte("po_date", date_to)
+    return query
+
+
+def _check_batch_size(company_id: str, po_ids, date_from, date_to):
+    """Reject an oversized export before any PO is loaded with its embeds."""
+    if po_ids is not None:
+        selected = len(set(po_ids))
+    else:
+        selected = _date_query(company_id, "id", date_from, date_to).limit(1).execute().count or 0
+
+    if selected > BATCH_MAX:
+        raise ValueError(f"{selected} POs selected, at most {BATCH_MAX} per export")
+
+
+def build_po_contexts(company_id: str, po_ids=None, date_from=None, date_to=None) -> list:
+    """
+    Contexts for many POs of one company: the joined select (paged or
+    chunked), or POs + suppliers + items as three bulk queries when the
+    embeds are unavailable. Selects by po_ids, or else by po_date range
+    (either end may be open).
+    """
+    with span("fetch"):
+        _check_batch_size(company_id, po_ids, date_from, date_to)
+        pos = _load_pos(company_id, po_ids, date_from, date_to)
+
+    # POs may have been added since the count
+    if len(pos) > BATCH_MAX:
+        raise ValueError(f"{len(pos)} POs selected, at most {BATCH_MAX} per export")
+
+    pos.sort(key=lambda p: (p.get("po_date") or "", p.get("po_number") or ""))
+
+    return [_context(po) for po in pos]
+
+
+def _load_pos(company_id: str, po_ids, date_from, date_to) -> list:
+    try:
+        pos = _select_pos(company_id, PO_JOINED_COLUMNS, po_ids, date_from, date_to)
+    except APIError as e:
+        logger.warning("Joined PO batch load failed (%s), loading separately", e.code)
+        pos = _attach_separately(_select_pos(company_id, PO_COLUMNS, po_ids, date_from, date_to))
 
-    # ---- ITEMS ----
-    items = supabase.table("purchase_order_items") \
-        .select("""
-            quantity_kg,
-            rate_per_kg,
-            amount,
-            powder:powders!powder_id (powder_name)
-        """) \
-        .eq("po_id", po_id) \
-        .execute().data or []
-
-    # ---- TEMP FILE ----
-    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-    pdf_path = tmp.name
-    tmp.close()
+    return pos
+
+
+def generate_po_pdfs(company_id: str, contexts):
+    """
+    Yield (context, PDF bytes) in order. PDFs already in the PDF cache are
+    read from disk (one at a time, as they are yielded); the rest are
+    rendered in parallel on the render pool and stored; cache eviction
+    runs once, after the batch.
+    """
+    use_cache = pdf_cache.enabled()
+    keys = {ctx["po"]["id"]: _fingerprint(ctx["po"], ctx["supplier"]) for ctx in contexts}
+
+    hits = {
+        po_id for po_id, fingerprint in keys.items()
+        if use_cache and pdf_cache.contains("po", company_id, po_id, fingerprint)
+    }
+    rendered = render_pool.render_many(
+        render_po_pdf, (ctx for ctx in contexts if ctx["po"]["id"] not in hits)
+    )
+
+    try:
+        for ctx in contexts:
+            po_id = ctx["po"]["id"]
+
+            if po_id in hits:
+                pdf = pdf_cache.get("po", company_id, po_id, keys[po_id])
+                if pdf is not None:
+                    yield ctx, pdf
+                    continue
+                # evicted meanwhile
+                with span("render"):
+                    pdf = render_po_pdf(ctx)
+            else:
+                with span("render"):
+                    pdf = next(rendered)
+
+            if use_cache:
+                try:
+                    pdf_cache.put("po", company_id, po_id, keys[po_id], pdf, evict=False)
+                except OSError as e:
+                    logger.warning("Could not store po PDF: %s", e)
+
+            yield ctx, pdf
+    finally:
+        # one size check for the whole batch, also when the download is cut short
+        if use_cache:
+            pdf_cache.trim()
+
+
+def render_po_pdf(ctx: dict) -> bytes:
+    """Render stage: context -> PDF bytes, no I/O (runs in a render worker when enabled)."""
+    register_fonts()
+
+    po = ctx["po"]
+    company = ctx["company"]
+    supplier = ctx["supplier"]
+    items = ctx["items"]
+
+    # ---- IN-MEMORY OUTPUT ----
+    buffer = BytesIO()
 
     doc = SimpleDocTemplate(
-        pdf_path,
+        buffer,
         pagesize=A4,
         leftMargin=30*mm,
         rightMargin=30*mm,
@@ -103,43 +297,7 @@ def generate_po_pdf(po_id: str) -> str:
         bottomMargin=25*mm
     )
 
-    styles = getSampleStyleSheet()
-
-    # Override default styles with DejaVuSans
-    for style_name in styles.byName:
-        styles[style_name].fontName = "DejaVuSans"
-
-    # Custom styles
-    styles.add(ParagraphStyle(
-        name='POHeader',
-        fontName='DejaVuSans-Bold',
-        fontSize=16,
-        alignment=TA_CENTER,
-        spaceAfter=6
-    ))
-
-    styles.add(ParagraphStyle(
-        name='POSubHeader',
-        fontName='DejaVuSans-Bold',
-        fontSize=12,
-        alignment=TA_CENTER,
-        spaceAfter=18,
-        textColor=colors.darkblue
-    ))
-
-    styles.add(ParagraphStyle(
-        name='LabelBold',
-        fontName='DejaVuSans-Bold',
-        fontSize=10,
-        spaceAfter=4
-    ))
-
-    styles.add(ParagraphStyle(
-        name='NormalSmall',
-        fontName='DejaVuSans',
-        fontSize=9,
-        leading=12
-    ))
+    styles = po_styles()
 
     story = []
 
@@ -250,13 +408,11 @@ def generate_po_pdf(po_id: str) -> str:
     sig_block = Paragraph("___________________________<br/>Authorized Signatory", styles['NormalSmall'])
     story.append(sig_block)
 
-    if company.get("signature_url"):
+    if ctx["signature"]:
         try:
-            r = requests.get(company["signature_url"], timeout=5)
-            if r.status_code == 200:
-                story.append(Image(BytesIO(r.content), width=40*mm, height=15*mm))
+            story.append(Image(BytesIO(ctx["signature"]), width=40*mm, height=15*mm))
         except Exception as e:
-            print(f"Could not load signature: {e}")
+            logger.warning("Could not load signature: %s", e)
 
     # ================= FOOTER =================
     def on_page(canvas, doc):
@@ -269,4 +425,4 @@ def generate_po_pdf(po_id: str) -> str:
 
     doc.build(story, onFirstPage=on_page, onLaterPages=on_page)
 
-    return pdf_path
\ No newline at end of file
+    return buffer.getvalue()
\ No newline at end of file
@@ -1,14 +1,26 @@
+import base64
+import json
+import logging
+import uuid
 from config import supabase
 from datetime import datetime
 from fastapi import HTTPException
+from postgrest.exceptions import APIError
+from po.po_history import log_po_event
+
+logger = logging.getLogger(__name__)
 
 
 # -------------------------------
 # CREATE PO
 # -------------------------------
 def create_po(company_id: str, user_id: str, payload: dict):
-
-    po = supabase.table("purchase_orders").insert({
+    """
+    Header + items in one round trip via the create_purchase_order RPC
+    (single transaction). Without the RPC: header insert + one bulk item
+    insert, removing the header again if the items fail.
+    """
+    header = {
         "company_id": company_id,
         "supplier_id": payload["supplier_id"],
         "supplier_name": payload["supplier_name"],
@@ -17,16 +29,50 @@ def create_po(company_id: str, user_id: str, payload: dict):
         "total_amount": payload["total_amount"],
         "status": "OPEN",
         "created_by": user_id
-    }).execute().data[0]
+    }
 
-    for item in payload["items"]:
-        supabase.table("purchase_order_items").insert({
-            "po_id": po["id"],
+    items = [
+        {
             "powder_id": item["powder_id"],
             "quantity_kg": item["quantity_kg"],
             "rate_per_kg": item["rate_per_kg"],
             "amount": item["quantity_kg"] * item["rate_per_kg"]
-        }).execute()
+        }
+        for item in payload["items"]
+    ]
+
+    try:
+        po = supabase.rpc("create_purchase_order", {
+            "p_po": header,
+            "p_items": items
+        }).execute().data
+    except APIError as e:
+        if e.code != "PGRST202":
+            raise
+        logger.warning("create_purchase_order RPC not found, using bulk insert")
+        po = _create_po_fallback(header, items)
+
+    log_po_event(company_id, po["id"], "CREATE", {
+        "po_number": po.get("po_number"),
+        "total_amount": po.get("total_amount"),
+        "items": len(items)
+    }, user_id=user_id)
+
+    return po
+
+
+def _create_po_fallback(header: dict, items: list):
+    po = supabase.table("purchase_orders").insert(header).execute().data[0]
+
+    if items:
+        try:
+            supabase.table("purchase_order_items").insert([
+                {"po_id": po["id"], **item} for item in items
+            ]).execute()
+        except Exception:
+            # A bulk insert is all-or-nothing; don't leave an empty PO behind
+            supabase.table("purchase_orders").delete().eq("id", po["id"]).execute()
+            raise
 
     return po
 
@@ -49,60 +95,169 @@ def cancel_po(company_id: str, po_id: str, user_id: str):
         "updated_by": user_id
     }).eq("id", po_id).execute()
 
+    log_po_event(company_id, po_id, "CANCEL", user_id=user_id)
+
     return {"status": "cancelled"}
 
 
 # -------------------------------
 # DELIVER PO → ADD TO STOCK
 # -------------------------------
-from datetime import datetime
-from config import supabase
-
 def deliver_po(company_id: str, po_id: str, user_id: str):
+    """
+    OPEN -> COMPLETED plus one stock batch per item, in one round trip via
+    the deliver_purchase_order RPC (single transaction; a concurrent second
+    delivery fails the OPEN check and posts nothing).
+    """
 
     if not company_id or not user_id:
         raise ValueError("company_id and user_id required")
 
-    po = supabase.table("purchase_orders") \
-        .select("supplier_id, status") \
-        .eq("id", po_id) \
-        .single() \
-        .execute().data
+    try:
+        result = supabase.rpc("deliver_purchase_order", {
+            "p_po_id": po_id,
+            "p_company_id": company_id,
+            "p_user_id": user_id
+        }).execute().data
+    except APIError as e:
+        if e.code == "P0001":
+            raise ValueError(e.message)
+        if e.code != "PGRST202":
+            raise
+        logger.warning("deliver_purchase_order RPC not found, using conditional update")
+        result = _deliver_po_fallback(company_id, po_id, user_id)
 
-    if po["status"] != "OPEN":
-        raise ValueError("Only OPEN POs can be delivered")
+    log_po_event(company_id, po_id, "DELIVER", {"batches": result.get("batches")}, user_id=user_id)
 
+    return result
+
+
+def _deliver_po_fallback(company_id: str, po_id: str, user_id: str):
+    """
+    Without the RPC: claim the PO with a conditional status update (only
+    one caller can move it off OPEN), then post all stock batches in one
+    bulk insert; the status is put back if that insert fails.
+    """
     items = supabase.table("purchase_order_items") \
         .select("powder_id, quantity_kg, rate_per_kg") \
         .eq("po_id", po_id) \
-        .execute().data
-
-    for item in items:
-        supabase.table("stock_batches").insert({
-            "company_id": company_id,
-            "powder_id": item["powder_id"],
-            "supplier_id": po["supplier_id"],
-            "qty_received": item["quantity_kg"],
-            "qty_remaining": item["quantity_kg"],
-            "rate_per_kg": item["rate_per_kg"],
-            "created_by": user_id
-        }).execute()
+        .execute().data or []
 
-    supabase.table("purchase_orders").update({
+    claimed = supabase.table("purchase_orders").update({
         "status": "COMPLETED",
         "delivered_at": datetime.utcnow().isoformat(),
         "updated_by": user_id
-    }).eq("id", po_id).execute()
+    }) \
+        .eq("id", po_id) \
+        .eq("company_id", company_id) \
+        .eq("status", "OPEN") \
+        .execute().data
+
+    if not claimed:
+        raise ValueError("Only OPEN POs can be delivered")
+
+    po = claimed[0]
+
+    if items:
+        try:
+            supabase.table("stock_batches").insert([
+                {
+                    "company_id": company_id,
+                    "powder_id": item["powder_id"],
+                    "supplier_id": po["supplier_id"],
+                    "qty_received": item["quantity_kg"],
+                    "qty_remaining": item["quantity_kg"],
+                    "rate_per_kg": item["rate_per_kg"],
+                    "created_by": user_id
+                }
+                for item in items
+            ]).execute()
+        except Exception:
+            supabase.table("purchase_orders").update({
+                "status": "OPEN",
+                "delivered_at": None,
+                "updated_by": user_id
+            }).eq("id", po_id).eq("status", "COMPLETED").execute()
+            raise
 
-    return {"status": "delivered"}
+    return {"status": "delivered", "batches": len(items)}
 
 
 # -------------------------------
 # LIST POs
 # -------------------------------
-def list_pos(company_id: str):
-    return supabase.table("purchase_orders") \
-        .select("*") \
-        .eq("company_id", company_id) \
+LIST_COLUMNS = "id, po_number, po_date, supplier_id, supplier_name, total_amount, status, created_at"
+
+LIST_DEFAULT_LIMIT = 50
+LIST_MAX_LIMIT = 200
+
+
+def encode_cursor(row: dict) -> str:
+    raw = json.dumps([row["created_at"], row["id"]]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """
+    (created_at, id) of a cursor. Both are checked to be a timestamp and a
+    UUID – they end up inside a PostgREST filter string.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, po_id = json.loads(raw)
+        datetime.fromisoformat(created_at.replace("Z", "+00:00"))
+        return created_at, str(uuid.UUID(po_id))
+    except (ValueError, TypeError, AttributeError):
+        raise HTTPException(400, "Invalid cursor")
+
+
+def list_pos(
+    company_id: str,
+    limit: int = LIST_DEFAULT_LIMIT,
+    cursor: str | None = None,
+    status: str | None = None,
+    supplier_id: str | None = None,
+    date_from: str | None = None,
+    date_to: str | None = None,
+    with_count: bool = True
+):
+    """
+    One page of POs, newest first, keyset-paginated on (created_at, id).
+    Returns (rows, next_cursor, total). next_cursor is None on the last
+    page; total (rows matching the filters) is only counted for the first
+    page and when with_count is set, else None.
+    """
+    limit = max(1, min(limit, LIST_MAX_LIMIT))
+    count = "exact" if with_count and not cursor else None
+
+    query = supabase.table("purchase_orders") \
+        .select(LIST_COLUMNS, count=count) \
+        .eq("company_id", company_id)
+
+    if status:
+        query = query.eq("status", status)
+    if supplier_id:
+        query = query.eq("supplier_id", supplier_id)
+    if date_from:
+        query = query.gte("po_date", date_from)
+    if date_to:
+        query = query.lte("po_date", date_to)
+
+    if cursor:
+        created_at, po_id = decode_cursor(cursor)
+        query = query.or_(
+            f'created_at.lt."{created_at}",'
+            f'and(created_at.eq."{created_at}",id.lt."{po_id}")'
+        )
+
+    # One extra row tells whether there is a next page
+    result = query \
         .order("created_at", desc=True) \
-        .execute().data
+        .order("id", desc=True) \
+        .limit(limit + 1) \
+        .execute()
+
+    rows = result.data or []
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+
+    return rows[:limit], next_cursor, result.count if count else None
@@ -1,7 +1,19 @@
-from fastapi import APIRouter, Request, HTTPException
-from fastapi.responses import FileResponse
-from po.purchase_order import create_po, cancel_po, deliver_po, list_pos
-from po.po_pdf import generate_po_pdf
+import logging
+import re
+from datetime import date
+from fastapi import APIRouter, Request, Response, HTTPException, Query
+from po.purchase_order import (
+    create_po, cancel_po, deliver_po, list_pos,
+    LIST_DEFAULT_LIMIT, LIST_MAX_LIMIT
+)
+from po.po_history import get_po_histories
+from postgrest.exceptions import APIError
+from services.batching import IncompleteFetchError, PAGE_SIZE
+from po.po_pdf import generate_po_pdf, po_fingerprint, build_po_contexts, generate_po_pdfs
+from utils import pdf_cache, profiling
+from utils.profiling import profiled
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/po", tags=["Purchase Orders"])
 
@@ -36,33 +48,157 @@ def deliver_po_api(request: Request, po_id: str, payload: dict):
     if not company_id or not user_id:
         raise HTTPException(400, "Missing company_id or user_id")
 
-    return deliver_po(company_id, po_id, user_id)
+    try:
+        return deliver_po(company_id, po_id, user_id)
+    except ValueError as e:
+        # e.g. already delivered (double click) – nothing was posted
+        raise HTTPException(400, str(e))
 
 
 @router.get("/list")
-def list_po_api(request: Request):
+def list_po_api(
+    request: Request,
+    response: Response,
+    limit: int = Query(LIST_DEFAULT_LIMIT, ge=1, le=LIST_MAX_LIMIT),
+    cursor: str | None = None,
+    status: str | None = None,
+    supplier_id: str | None = None,
+    date_from: str | None = None,
+    date_to: str | None = None,
+    count: bool = True
+):
+    """
+    Page of POs (newest first). The body stays a plain array; the cursor
+    for the next page comes back in X-Next-Cursor (absent on the last
+    page) and, for the first page with count=true, the total in
+    X-Total-Count.
+    """
     company_id = request.headers.get("X-Company-Id")
     if not company_id:
         raise HTTPException(400, "X-Company-Id header missing")
-    return list_pos(company_id)
+
+    rows, next_cursor, total = list_pos(
+        company_id, limit, cursor, status, supplier_id, date_from, date_to, count
+    )
+
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    if total is not None:
+        response.headers["X-Total-Count"] = str(total)
+
+    return rows
+
+
+@router.get("/history")
+def po_history_api(
+    request: Request,
+    po_ids: str,
+    limit_per_po: int | None = Query(None, ge=1, le=PAGE_SIZE)
+):
+    """
+    Histories of many POs in one go: ?po_ids=id1,id2,...[&limit_per_po=1]
+    → {po_id: [events, oldest first]}.
+    """
+    company_id = request.headers.get("X-Company-Id")
+    if not company_id:
+        raise HTTPException(400, "X-Company-Id header missing")
+
+    ids = [i for i in po_ids.split(",") if i.strip()]
+    if len(ids) > LIST_MAX_LIMIT:
+        raise HTTPException(400, f"At most {LIST_MAX_LIMIT} po_ids per request")
+
+    try:
+        return get_po_histories(company_id, [i.strip() for i in ids], limit_per_po)
+    except IncompleteFetchError as e:
+        # rows changed / were capped while paging – retrying usually works
+        logger.warning("PO history fetch incomplete: %s", e)
+        raise HTTPException(503, "PO history changed while it was read, please retry")
+    except APIError as e:
+        logger.exception("PO history fetch failed")
+        raise HTTPException(502, f"Could not load PO history ({e.code})")
 
 
 @router.get("/pdf/{po_id}")
+@profiled
 def download_po_pdf(request: Request, po_id: str):
     company_id = request.headers.get("X-Company-Id")
     if not company_id:
         raise HTTPException(400, "X-Company-Id header missing")
 
-    print(f"[PDF] Generating PDF for PO {po_id} | Company: {company_id}")
+    logger.debug("Generating PDF for PO %s | Company: %s", po_id, company_id)
 
     try:
-        file_path = generate_po_pdf(po_id)
-        print(f"[PDF] Success - file generated: {file_path}")
-        return FileResponse(
-            file_path,
-            media_type="application/pdf",
-            filename=f"PO-{po_id[:8]}.pdf"
+        pdf = pdf_cache.cached(
+            "po", company_id, po_id,
+            po_fingerprint(po_id),
+            lambda: generate_po_pdf(po_id)
         )
+        return pdf_cache.pdf_response(pdf, f"PO-{po_id[:8]}.pdf")
     except Exception as e:
-        print(f"[PDF ERROR] Failed for PO {po_id}: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Failed to generate PDF: {str(e)}")
\ No newline at end of file
+        logger.exception("PDF generation failed for PO %s", po_id)
+        raise HTTPException(status_code=500, detail=f"Failed to generate PDF: {str(e)}")
+
+
+def _parse_date(value, field: str) -> date | None:
+    if value in (None, ""):
+        return None
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise HTTPException(400, f"{field} must be a YYYY-MM-DD date")
+
+
+@router.post("/pdf/batch")
+@profiled
+def download_po_pdf_batch(request: Request, payload: dict):
+    """
+    ZIP of PO PDFs. Payload: {"po_ids": [...]} or
+    {"date_from": "YYYY-MM-DD", "date_to": "YYYY-MM-DD"} (po_date, inclusive).
+    """
+    company_id = request.headers.get("X-Company-Id")
+    if not company_id:
+        raise HTTPException(400, "X-Company-Id header missing")
+
+    po_ids = payload.get("po_ids")
+    date_from = _parse_date(payload.get("date_from"), "date_from")
+    date_to = _parse_date(payload.get("date_to"), "date_to")
+
+    if po_ids is None and not (date_from or date_to):
+        raise HTTPException(400, "po_ids or date_from / date_to required")
+    if po_ids is not None and not (
+        isinstance(po_ids, list) and all(isinstance(i, str) and i.strip() for i in po_ids)
+    ):
+        raise HTTPException(400, "po_ids must be a list of PO ids")
+
+    try:
+        contexts = build_po_contexts(
+            company_id, po_ids,
+            date_from and date_from.isoformat(),
+            date_to and date_to.isoformat()
+        )
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+    if not contexts:
+        raise HTTPException(404, "No purchase orders found")
+
+    logger.info("Batch export of %d POs | Company: %s", len(contexts), company_id)
+
+    def entries():
+        names = set()
+        for ctx, pdf in generate_po_pdfs(company_id, contexts):
+            po = ctx["po"]
+            name = "PO-" + (re.sub(r"[^A-Za-z0-9._-]", "_", po.get("po_number") or "") or po["id"][:8])
+            if name in names:
+                name += "-" + po["id"][:8]
+            names.add(name)
+            yield f"{name}.pdf", pdf
+
+    # built from parsed dates only – it ends up in Content-Disposition
+    label = f"{date_from or ''}_{date_to or ''}" if po_ids is None else f"{len(contexts)}"
+
+    # The ZIP is normally rendered while it streams, after this returns;
+    # render it here when profiling so the profile covers it
+    items = list(entries()) if profiling.active() else entries()
+
+    return pdf_cache.zip_response(items, f"Purchase_Orders_{label.strip('_')}.zip")
@@ -1,46 +1,28 @@
 
-from datetime import datetime, timedelta
-from collections import defaultdict
-import os
-import tempfile
+from datetime import datetime
+from io import BytesIO
 
 from reportlab.lib.pagesizes import A4
 from reportlab.platypus import (
     SimpleDocTemplate, Paragraph, Spacer,
-    Table, TableStyle, Image, PageBreak
+    Table, TableStyle, PageBreak
 )
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib import colors
 from reportlab.lib.units import inch
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
 
-# In reports/annual.py
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-from fastapi.responses import FileResponse
-
-
-
-from services.fifo_data import get_fifo_data
-from config import supabase
+from reports.charts import trend_chart
+from reports.monthly import load_company
+from services import rollups
+from config import gather
 from dateutil.relativedelta import relativedelta
 
 
 # ---------------------------------------------------------
-# FONT (Annual ONLY – backend/assets/fonts)
+# Fonts + styles: registered / built once per process
+# (utils/pdf_resources.py)
 # ---------------------------------------------------------
-# At top of file
-from utils.fonts import get_font_path   # adjust import path if needed
-
-def register_fonts():
-    pdfmetrics.registerFont(
-        TTFont("DejaVuSans", get_font_path("DejaVuSans.ttf"))
-    )
-    pdfmetrics.registerFont(
-        TTFont("DejaVuSans-Bold", get_font_path("DejaVuSans-Bold.ttf"))
-    )
+from utils.pdf_resources import register_fonts, annual_styles
+from utils import render_pool
 
 
 # ---------------------------------------------------------
@@ -65,26 +47,95 @@ def fmt_pct(v):
     return "N/A" if v is None else f"{v:+.1f}%"
 
 
-def metrics(data):
-    qty = sum(d["qty"] for d in data)
-    cost = sum(d["cost"] for d in data)
-    cpk = cost / qty if qty else 0
-    return qty, cost, cpk
+# ---------------------------------------------------------
+# DATA STAGE (web process)
+# Plain values only – this dict crosses into the render worker
+# (utils/render_pool.py).
+# ---------------------------------------------------------
+def build_annual_context(company_id: str, fy_start_year: int) -> dict:
+    # ────────────────────────────────────────────────
+    # Single data load: previous FY + current FY (24 months)
+    # as monthly rollups – closed months come from the rollup store,
+    # the rest from one FIFO fetch (services/rollups.py).
+    # ────────────────────────────────────────────────
+    start = datetime(fy_start_year, 4, 1)
+    end   = datetime(fy_start_year + 1, 3, 31, 23, 59, 59)
+
+    prev_start = start.replace(year=start.year - 1)
+
+    curr_keys = [rollups.month_key(start + relativedelta(months=i)) for i in range(12)]
+    prev_keys = [rollups.month_key(prev_start + relativedelta(months=i)) for i in range(12)]
+
+    # Company row is loaded alongside the rollups
+    company, months = gather(
+        lambda: load_company(company_id),
+        lambda: rollups.get_month_rollups(company_id, prev_keys + curr_keys)
+    )
+
+    curr_data = rollups.combine(months[k] for k in curr_keys)
+    prev_data = rollups.combine(months[k] for k in prev_keys)
+
+    context = {
+        "fy_start_year": fy_start_year,
+        "has_data": curr_data["rows"] > 0,
+    }
+
+    if not context["has_data"]:
+        return context
+
+    _, curr_cost, _ = rollups.metrics(curr_data)
+
+    # Supplier concentration
+    supplier_cost = rollups.supplier_cost(curr_data)
+
+    top_supplier = max(supplier_cost, key=supplier_cost.get, default="—")
+    top_supplier_pct = (
+        supplier_cost[top_supplier] / curr_cost * 100 if curr_cost else 0
+    )
+
+    # Cost trend (Appendix A)
+    labels = []
+    trend = []
+
+    for key in curr_keys:
+        _, _, cpk = rollups.metrics(months[key])
+
+        labels.append(datetime.strptime(key, "%Y-%m").strftime("%b %y"))
+        trend.append(cpk)
+
+    context.update({
+        "company_name": company.get("company_name", "Company"),
+        "director_name": company.get("director", "Director"),
+        "fy_label": f"Financial Year {start.year}-{str(end.year)[-2:]}",
+        "curr": rollups.metrics(curr_data),
+        "prev": rollups.metrics(prev_data),
+        "top_supplier_pct": top_supplier_pct,
+        "labels": labels,
+        "trend": trend,
+    })
+
+    return context
 
 
 # ---------------------------------------------------------
 # MAIN – ANNUAL PDF
 # ---------------------------------------------------------
-def generate_annual_pdf(company_id: str, fy_start_year: int) -> str:
+def generate_annual_pdf(company_id: str, fy_start_year: int) -> bytes:
+    context = build_annual_context(company_id, fy_start_year)
+    return render_pool.render(render_annual_pdf, context)
+
+
+# ---------------------------------------------------------
+# RENDER STAGE (pure: context -> PDF bytes)
+# ---------------------------------------------------------
+def render_annual_pdf(ctx: dict) -> bytes:
     register_fonts()
 
-    # Create temp file early (for both cases)
-    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-    pdf_path = tmp.name
-    tmp.close()  # close immediately — we don't need the handle
+    # Render into memory – no temp files
+    buffer = BytesIO()
 
     doc = SimpleDocTemplate(
-        pdf_path,
+        buffer,
         pagesize=A4,
         leftMargin=60,
         rightMargin=60,
@@ -92,65 +143,13 @@ def generate_annual_pdf(company_id: str, fy_start_year: int) -> str:
         bottomMargin=60
     )
 
-    styles = getSampleStyleSheet()
-
-    # Force DejaVu everywhere (good practice)
-    for s in styles.byName.values():
-        s.fontName = "DejaVuSans"
-
-    styles.add(ParagraphStyle(
-        name="ReportTitle",
-        fontName="DejaVuSans-Bold",
-        fontSize=18,
-        alignment=1,
-        spaceAfter=10
-    ))
-
-    styles.add(ParagraphStyle(
-        name="SectionHeader",
-        fontName="DejaVuSans-Bold",
-        fontSize=13,
-        spaceBefore=14,
-        spaceAfter=6
-    ))
-
-    styles.add(ParagraphStyle(
-        name="ReportBody",
-        fontName="DejaVuSans",
-        fontSize=10.5,
-        leading=14,
-        spaceAfter=5
-    ))
-
-    styles.add(ParagraphStyle(
-        name="NoDataMessage",
-        fontName="DejaVuSans",
-        fontSize=12,
-        leading=16,
-        alignment=1,
-        spaceAfter=12
-    ))
+    styles = annual_styles()
 
     story = []
 
-    # ────────────────────────────────────────────────
-    # Early check: is there any data for this FY?
-    # ────────────────────────────────────────────────
-    start = datetime(fy_start_year, 4, 1)
-    end   = datetime(fy_start_year + 1, 3, 31, 23, 59, 59)
-
-    # Fast count query — no need to fetch full rows
-    count_result = supabase.table("usage") \
-    .select("id", count="exact") \
-    .eq("company_id", company_id) \
-    .gte("used_at", start.isoformat()) \
-    .lt("used_at", end.isoformat()) \
-    .execute()
-
-
-    has_data = count_result.count > 0 if hasattr(count_result, 'count') else False
+    fy_start_year = ctx["fy_start_year"]
 
-    if not has_data:
+    if not ctx["has_data"]:
         # ──── Build simple "No Data" PDF ────
         story.append(Paragraph("Annual Powder Consumption & Cost Audit Report", styles["ReportTitle"]))
         story.append(Spacer(1, 0.6*inch))
@@ -189,46 +188,25 @@ def generate_annual_pdf(company_id: str, fy_start_year: int) -> str:
             )
 
         doc.build(story, onFirstPage=empty_footer, onLaterPages=empty_footer)
-        return pdf_path
+        return buffer.getvalue()
 
     # ────────────────────────────────────────────────
     # There IS data → proceed with full report
     # ────────────────────────────────────────────────
 
-    prev_start = start.replace(year=start.year - 1)
-    prev_end   = end.replace(year=end.year - 1)
-
-    curr_data = get_fifo_data(company_id, start, end)
-    prev_data = get_fifo_data(company_id, prev_start, prev_end)
-
-    curr_qty, curr_cost, curr_cpk = metrics(curr_data)
-    prev_qty, prev_cost, prev_cpk = metrics(prev_data)
+    curr_qty, curr_cost, curr_cpk = ctx["curr"]
+    prev_qty, prev_cost, prev_cpk = ctx["prev"]
 
     yoy_qty  = pct(curr_qty, prev_qty)
     yoy_cost = pct(curr_cost, prev_cost)
     yoy_cpk  = pct(curr_cpk, prev_cpk)
 
-    # Supplier concentration
-    supplier_cost = defaultdict(float)
-    for d in curr_data:
-        supplier_cost[d["supplier"]] += d["cost"]
-
-    top_supplier = max(supplier_cost, key=supplier_cost.get, default="—")
-    top_supplier_pct = (
-        supplier_cost[top_supplier] / curr_cost * 100 if curr_cost else 0
-    )
-
-    # Company info
-    company = supabase.table("companies") \
-        .select("company_name, director") \
-        .eq("id", company_id) \
-        .single() \
-        .execute()
+    top_supplier_pct = ctx["top_supplier_pct"]
 
-    company_name  = company.data.get("company_name", "Company")
-    director_name = company.data.get("director", "Director")
+    company_name  = ctx["company_name"]
+    director_name = ctx["director_name"]
 
-    fy_label = f"Financial Year {start.year}-{str(end.year)[-2:]}"
+    fy_label = ctx["fy_label"]
 
     # ──── Cover Page ────
     story.append(Paragraph(company_name, styles["ReportTitle"]))
@@ -281,30 +259,7 @@ def generate_annual_pdf(company_id: str, fy_start_year: int) -> str:
     story.append(PageBreak())
     story.append(Paragraph("Appendix A – Average Cost Trend (Last 12 Months)", styles["SectionHeader"]))
 
-    months = []
-    trend = []
-
-    for i in range(12):
-        m_start = datetime(fy_start_year, 4, 1) + relativedelta(months=i)
-        m_end = m_start + relativedelta(months=1) - timedelta(seconds=1)
-
-        data = get_fifo_data(company_id, m_start, m_end)
-        _, _, cpk = metrics(data)
-
-        months.append(m_start.strftime("%b %y"))
-        trend.append(cpk)
-
-    fig, ax = plt.subplots(figsize=(5.2, 3.1))
-    ax.plot(months, trend, marker="o")
-    ax.set_ylabel("₹ / kg")
-    ax.grid(True, alpha=0.3)
-    plt.xticks(rotation=45, ha="right", fontsize=9)
-
-    chart_path = tempfile.mktemp(".png")
-    fig.savefig(chart_path, dpi=150, bbox_inches="tight")
-    plt.close(fig)
-
-    story.append(Image(chart_path, width=5*inch, height=3*inch))
+    story.append(trend_chart(ctx["labels"], ctx["trend"]))
 
     # ──── Signature ────
     story.append(PageBreak())
@@ -328,5 +283,5 @@ def generate_annual_pdf(company_id: str, fy_start_year: int) -> str:
     # Build full PDF
     doc.build(story, onFirstPage=footer, onLaterPages=footer)
 
-    return pdf_path
+    return buffer.getvalue()
 
@@ -0,0 +1,120 @@
+# reports/charts.py
+import os
+from functools import lru_cache
+from io import BytesIO
+
+from reportlab.graphics import renderPDF
+from reportlab.graphics.charts.linecharts import HorizontalLineChart
+from reportlab.graphics.shapes import Drawing, String
+from reportlab.graphics.widgets.markers import makeMarker
+from reportlab.lib import colors
+from reportlab.lib.units import inch
+from reportlab.platypus import Flowable, Image
+
+from utils.metrics import timed
+
+# ---------------------------------------------------------
+# Charts for the PDF reports.
+#
+# Default: native ReportLab vector drawing, no raster round-trip.
+# ANNUAL_CHART_BACKEND=matplotlib restores the old PNG chart; matplotlib is
+# only imported when that backend is chosen. Rendered charts are cached by
+# their data series.
+# ---------------------------------------------------------
+CHART_BACKEND = os.getenv("ANNUAL_CHART_BACKEND", "vector")
+
+CHART_WIDTH = 5 * inch
+CHART_HEIGHT = 3 * inch
+
+
+class _SharedDrawing(Flowable):
+    """
+    Per-document flowable over a cached, already expanded Drawing.
+    The Drawing itself is only read while rendering, so one cached copy
+    can be shared by concurrent report builds.
+    """
+
+    def __init__(self, drawing):
+        super().__init__()
+        self.drawing = drawing
+
+    def wrap(self, availWidth, availHeight):
+        return self.drawing.width, self.drawing.height
+
+    def draw(self):
+        renderPDF.draw(self.drawing, self.canv, 0, 0)
+
+
+@lru_cache(maxsize=128)
+def _vector_trend(labels: tuple, values: tuple, y_label: str):
+    drawing = Drawing(CHART_WIDTH, CHART_HEIGHT)
+
+    chart = HorizontalLineChart()
+    chart.x = 45
+    chart.y = 45
+    chart.width = CHART_WIDTH - 60
+    chart.height = CHART_HEIGHT - 70
+    chart.data = [values]
+    chart.joinedLines = 1
+
+    chart.lines[0].strokeColor = colors.HexColor("#1f77b4")
+    chart.lines[0].strokeWidth = 1.5
+    chart.lines[0].symbol = makeMarker("Circle")
+    chart.lines[0].symbol.fillColor = colors.HexColor("#1f77b4")
+    chart.lines[0].symbol.size = 5
+
+    chart.categoryAxis.categoryNames = list(labels)
+    chart.categoryAxis.labels.fontName = "DejaVuSans"
+    chart.categoryAxis.labels.fontSize = 8
+    chart.categoryAxis.labels.angle = 45
+    chart.categoryAxis.labels.boxAnchor = "ne"
+    chart.categoryAxis.labels.dx = 4
+    chart.categoryAxis.labels.dy = -2
+
+    chart.valueAxis.valueMin = 0
+    chart.valueAxis.labels.fontName = "DejaVuSans"
+    chart.valueAxis.labels.fontSize = 8
+    chart.valueAxis.visibleGrid = 1
+    chart.valueAxis.gridStrokeColor = colors.Color(0, 0, 0, alpha=0.15)
+
+    drawing.add(chart)
+    drawing.add(String(
+        chart.x, CHART_HEIGHT - 14, y_label,
+        fontName="DejaVuSans", fontSize=9
+    ))
+
+    # Resolve the chart widget into plain shapes once, so cached hits
+    # skip the layout work entirely.
+    return drawing.expandUserNodes()
+
+
+@lru_cache(maxsize=128)
+def _matplotlib_trend(labels: tuple, values: tuple, y_label: str) -> bytes:
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(5.2, 3.1))
+    ax.plot(labels, values, marker="o")
+    ax.set_ylabel(y_label)
+    ax.grid(True, alpha=0.3)
+    plt.xticks(rotation=45, ha="right", fontsize=9)
+
+    png = BytesIO()
+    fig.savefig(png, format="png", dpi=150, bbox_inches="tight")
+    plt.close(fig)
+
+    return png.getvalue()
+
+
+@timed("chart")
+def trend_chart(labels, values, y_label: str = "₹ / kg"):
+    """Line chart flowable for a labelled series (e.g. 12 months of ₹/kg)."""
+    labels = tuple(labels)
+    values = tuple(round(float(v), 6) for v in values)
+
+    if CHART_BACKEND == "matplotlib":
+        png = _matplotlib_trend(labels, values, y_label)
+        return Image(BytesIO(png), width=CHART_WIDTH, height=CHART_HEIGHT)
+
+    return _SharedDrawing(_vector_trend(labels, values, y_label))
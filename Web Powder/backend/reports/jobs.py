@@ -0,0 +1,136 @@
+# reports/jobs.py
+import contextvars
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------
+# Background report jobs.
+#
+# Heavy reports run on a small, bounded executor instead of holding a
+# request worker for the whole fetch + render. Jobs and their finished
+# PDFs live in process memory and expire JOB_TTL seconds after finishing,
+# or earlier – oldest finished first – once more than MAX_DONE finished
+# jobs or MAX_DONE_BYTES of PDFs are held. Each company may have at most
+# MAX_PENDING_PER_COMPANY jobs queued or running, so one tenant cannot fill
+# the whole MAX_PENDING queue.
+# ---------------------------------------------------------
+JOB_WORKERS = int(os.getenv("REPORT_JOB_WORKERS", "2"))
+MAX_PENDING = int(os.getenv("REPORT_JOB_MAX_PENDING", "20"))
+MAX_PENDING_PER_COMPANY = int(os.getenv("REPORT_JOB_MAX_PENDING_PER_COMPANY", "5"))
+JOB_TTL = int(os.getenv("REPORT_JOB_TTL", "1800"))
+MAX_DONE = int(os.getenv("REPORT_JOB_MAX_DONE", "100"))
+MAX_DONE_BYTES = int(os.getenv("REPORT_JOB_MAX_DONE_BYTES", str(128 * 1024 * 1024)))
+
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="report-job")
+_jobs = {}
+_lock = threading.Lock()
+
+
+def _expire():
+    """Drop finished jobs past JOB_TTL, then the oldest ones over the caps. Caller holds _lock."""
+    now = time.time()
+    for job_id in [j for j, job in _jobs.items()
+                   if job["finished_at"] and now - job["finished_at"] > JOB_TTL]:
+        del _jobs[job_id]
+
+    finished = sorted(
+        (job for job in _jobs.values() if job["finished_at"]),
+        key=lambda job: job["finished_at"]
+    )
+    count = len(finished)
+    size = sum(len(job["result"] or b"") for job in finished)
+
+    for job in finished:
+        if count <= MAX_DONE and size <= MAX_DONE_BYTES:
+            break
+        del _jobs[job["id"]]
+        count -= 1
+        size -= len(job["result"] or b"")
+
+
+def _client_error(e: Exception) -> str:
+    """What the job status shows: only deliberate messages, never driver / SQL detail."""
+    if isinstance(e, HTTPException):
+        return str(e.detail)
+    if isinstance(e, ValueError):
+        return str(e)
+    return "Report generation failed"
+
+
+def _run(job_id: str, build):
+    with _lock:
+        _jobs[job_id]["status"] = "running"
+
+    try:
+        result = build()
+        update = {"status": "done", "result": result}
+    except Exception as e:
+        logger.exception("Report job %s failed", job_id)
+        update = {"status": "failed", "error": _client_error(e)}
+
+    with _lock:
+        _jobs[job_id].update(update, finished_at=time.time())
+        _expire()
+
+
+def submit(company_id: str, kind: str, filename: str, build) -> dict:
+    """Queue build() -> PDF bytes. 429 when the queue, or the company's share of it, is full."""
+    with _lock:
+        _expire()
+
+        pending = [j for j in _jobs.values() if j["status"] in ("queued", "running")]
+        if len(pending) >= MAX_PENDING or \
+                sum(1 for j in pending if j["company_id"] == company_id) >= MAX_PENDING_PER_COMPANY:
+            raise HTTPException(429, "Too many reports in progress, try again shortly")
+
+        job_id = uuid.uuid4().hex
+        _jobs[job_id] = {
+            "id": job_id,
+            "company_id": company_id,
+            "kind": kind,
+            "filename": filename,
+            "status": "queued",
+            "error": None,
+            "result": None,
+            "created_at": time.time(),
+            "finished_at": None,
+        }
+
+    # Keep the request's context (metrics route) for the job's spans
+    _executor.submit(contextvars.copy_context().run, _run, job_id, build)
+    return status(company_id, job_id)
+
+
+def get(company_id: str, job_id: str) -> dict:
+    with _lock:
+        _expire()
+        job = _jobs.get(job_id)
+
+    # Jobs of other companies are indistinguishable from missing ones
+    if not job or job["company_id"] != company_id:
+        raise HTTPException(404, "Report job not found")
+
+    return job
+
+
+def status(company_id: str, job_id: str) -> dict:
+    job = get(company_id, job_id)
+
+    return {
+        "job_id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "error": job["error"],
+        "download_url": f"/reports/jobs/{job['id']}/download" if job["status"] == "done" else None,
+    }
+
+
+def shutdown():
+    _executor.shutdown(wait=False, cancel_futures=True)
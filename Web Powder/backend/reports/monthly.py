@@ -1,37 +1,24 @@
-
 from datetime import datetime, timedelta
-from collections import defaultdict
-import os
-import tempfile
+from io import BytesIO
 
 from reportlab.lib.pagesizes import A4
 from reportlab.platypus import (
-    SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
+    SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
 )
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib import colors
 from reportlab.lib.units import inch
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from fastapi.responses import FileResponse
-from services.fifo_data import get_fifo_data
-from config import supabase
+from services import rollups
+from config import supabase, gather
 
 
 # ---------------------------------------------------------
-# Font registration (MONTHLY ONLY)
-# backend/assets/fonts
+# Fonts + styles: registered / built once per process
+# (utils/pdf_resources.py)
 # ---------------------------------------------------------
-# At top of file
-from utils.fonts import get_font_path   # adjust import path if needed
+from utils.pdf_resources import register_fonts, monthly_styles
+from utils import render_pool
+from utils.metrics import timed
 
-def register_fonts():
-    pdfmetrics.registerFont(
-        TTFont("DejaVuSans", get_font_path("DejaVuSans.ttf"))
-    )
-    pdfmetrics.registerFont(
-        TTFont("DejaVuSans-Bold", get_font_path("DejaVuSans-Bold.ttf"))
-    )
 
 # ---------------------------------------------------------
 # Safe % logic (OPTION 1 – Audit safe)
@@ -48,84 +35,85 @@ def fmt_pct(val):
     return f"{val:+.1f}%"
 
 
-def metrics(data):
-    qty = sum(d["qty"] for d in data) if data else 0
-    cost = sum(d["cost"] for d in data) if data else 0
-    cpk = cost / qty if qty else 0
-    return qty, cost, cpk
-
-
-# ---------------------------------------------------------
-# MAIN PDF GENERATOR
-# ---------------------------------------------------------
-from datetime import datetime, timedelta
-from collections import defaultdict
-import os
+@timed("fetch")
+def load_company(company_id: str) -> dict:
+    company = supabase.table("companies") \
+        .select("company_name, director") \
+        .eq("id", company_id) \
+        .single() \
+        .execute()
 
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import (
-    SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
-)
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib import colors
-from reportlab.lib.units import inch
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from fastapi.responses import FileResponse
-from services.fifo_data import get_fifo_data
-from config import supabase
+    return company.data or {}
 
 
 # ---------------------------------------------------------
-# Font registration (MONTHLY ONLY)
-# backend/assets/fonts
+# DATA STAGE (web process)
+# Everything the layout needs, as plain values – this dict is
+# what crosses into the render worker (utils/render_pool.py).
 # ---------------------------------------------------------
-from utils.fonts import get_font_path
+def build_monthly_context(company_id: str, year: int, month: int) -> dict:
+    # ────────────────────────────────────────────────
+    # One combined load: current month, previous month (MoM),
+    # same month last year (YoY) and the company row, all in parallel.
+    # Closed months come from the rollup store (services/rollups.py).
+    # ────────────────────────────────────────────────
+    curr_start = datetime(year, month, 1)
+    prev_start = (curr_start - timedelta(days=1)).replace(day=1)
+    yoy_start = curr_start.replace(year=curr_start.year - 1)
 
-def register_fonts():
-    pdfmetrics.registerFont(
-        TTFont("DejaVuSans", get_font_path("DejaVuSans.ttf"))
-    )
-    pdfmetrics.registerFont(
-        TTFont("DejaVuSans-Bold", get_font_path("DejaVuSans-Bold.ttf"))
+    curr_key = rollups.month_key(curr_start)
+    prev_key = rollups.month_key(prev_start)
+    yoy_key = rollups.month_key(yoy_start)
+
+    company, months = gather(
+        lambda: load_company(company_id),
+        lambda: rollups.get_month_rollups(company_id, [curr_key, prev_key, yoy_key])
     )
 
+    curr_data = months[curr_key]
 
-# ---------------------------------------------------------
-# Safe % logic
-# ---------------------------------------------------------
-def pct(current, previous):
-    if previous is None or previous <= 0:
-        return None
-    return ((current - previous) / previous) * 100
+    # Supplier concentration
+    supplier_cost = rollups.supplier_cost(curr_data)
+    _, curr_cost, _ = rollups.metrics(curr_data)
 
+    top_supplier = max(supplier_cost, key=supplier_cost.get, default="—")
+    top_supplier_pct = (
+        supplier_cost[top_supplier] / curr_cost * 100
+        if curr_cost > 0 else 0
+    )
 
-def fmt_pct(val):
-    if val is None:
-        return "N/A"
-    return f"{val:+.1f}%"
+    return {
+        "company_name": company.get("company_name", "Company"),
+        "director_name": company.get("director", "Director"),
+        "month_str": curr_start.strftime("%B %Y"),
+        "has_data": curr_data["rows"] > 0,
+        "curr": rollups.metrics(curr_data),
+        "prev": rollups.metrics(months[prev_key]),
+        "yoy": rollups.metrics(months[yoy_key]),
+        "top_supplier": top_supplier,
+        "top_supplier_pct": top_supplier_pct,
+    }
 
 
-def metrics(data):
-    qty = sum(d["qty"] for d in data) if data else 0
-    cost = sum(d["cost"] for d in data) if data else 0
-    cpk = cost / qty if qty else 0
-    return qty, cost, cpk
+# ---------------------------------------------------------
+# MAIN PDF GENERATOR
+# ---------------------------------------------------------
+def generate_monthly_pdf(company_id: str, year: int, month: int) -> bytes:
+    context = build_monthly_context(company_id, year, month)
+    return render_pool.render(render_monthly_pdf, context)
 
 
 # ---------------------------------------------------------
-# MAIN PDF GENERATOR
+# RENDER STAGE (pure: context -> PDF bytes)
 # ---------------------------------------------------------
-def generate_monthly_pdf(company_id: str, year: int, month: int) -> str:
+def render_monthly_pdf(ctx: dict) -> bytes:
     register_fonts()
 
-    # Create temp file early
-    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-    pdf_path = tmp.name
-    tmp.close()
+    # Render into memory – no temp files
+    buffer = BytesIO()
 
     doc = SimpleDocTemplate(
-        pdf_path,
+        buffer,
         pagesize=A4,
         leftMargin=55,
         rightMargin=55,
@@ -133,81 +121,16 @@ def generate_monthly_pdf(company_id: str, year: int, month: int) -> str:
         bottomMargin=70
     )
 
-    styles = getSampleStyleSheet()
-
-    # Force DejaVuSans everywhere
-    for s in styles.byName.values():
-        s.fontName = "DejaVuSans"
-
-    styles["BodyText"].fontName = "DejaVuSans"
-
-    styles.add(ParagraphStyle(
-        name="CoverTitle",
-        fontName="DejaVuSans-Bold",
-        fontSize=22,
-        alignment=1,
-        spaceAfter=12,
-        textColor=colors.darkblue
-    ))
-
-    styles.add(ParagraphStyle(
-        name="CoverSub",
-        fontName="DejaVuSans",
-        fontSize=13,
-        alignment=1,
-        spaceAfter=22
-    ))
-
-    styles.add(ParagraphStyle(
-        name="SectionHeader",
-        fontName="DejaVuSans-Bold",
-        fontSize=15,
-        spaceBefore=18,
-        spaceAfter=12,
-        textColor=colors.darkblue
-    ))
-
-    styles.add(ParagraphStyle(
-        name="Insight",
-        fontName="DejaVuSans",
-        fontSize=11,
-        leading=15,
-        spaceAfter=8
-    ))
-
-    styles.add(ParagraphStyle(
-        name="NoDataMessage",
-        fontName="DejaVuSans",
-        fontSize=12,
-        leading=16,
-        alignment=1,
-        spaceAfter=12
-    ))
+    styles = monthly_styles()
 
     story = []
 
-    # ────────────────────────────────────────────────
-    # Early check: is there any data for this month?
-    # ────────────────────────────────────────────────
-    curr_start = datetime(year, month, 1)
-    next_month = (curr_start + timedelta(days=32)).replace(day=1)
-    curr_end = next_month - timedelta(seconds=1)
-
-    # Fast count query
-    count_result = supabase.table("usage") \
-    .select("id", count="exact") \
-    .eq("company_id", company_id) \
-    .gte("used_at", curr_start.isoformat()) \
-    .lt("used_at", curr_end.isoformat()) \
-    .execute()
-
-
-    has_data = count_result.count > 0 if hasattr(count_result, 'count') else False
+    company_name = ctx["company_name"]
+    director_name = ctx["director_name"]
+    month_str = ctx["month_str"]
 
-    if not has_data:
+    if not ctx["has_data"]:
         # ──── Build simple "No Data" PDF ────
-        month_str = curr_start.strftime("%B %Y")
-
         story.append(Paragraph(company_name or "Company", styles["CoverTitle"]))
         story.append(Paragraph("Monthly Powder Usage & Cost Review", styles["CoverTitle"]))
         story.append(Paragraph(f"{month_str} • Confidential • FIFO Based", styles["CoverSub"]))
@@ -241,48 +164,18 @@ def generate_monthly_pdf(company_id: str, year: int, month: int) -> str:
             )
 
         doc.build(story, onFirstPage=empty_footer, onLaterPages=empty_footer)
-        return pdf_path
+        return buffer.getvalue()
 
     # ────────────────────────────────────────────────
     # There IS data → continue with full report
     # ────────────────────────────────────────────────
 
-    prev_end = curr_start - timedelta(seconds=1)
-    prev_start = prev_end.replace(day=1)
-
-    yoy_start = curr_start.replace(year=curr_start.year - 1)
-    yoy_end = curr_end.replace(year=curr_end.year - 1)
-
-    curr_data = get_fifo_data(company_id, curr_start, curr_end)
-    prev_data = get_fifo_data(company_id, prev_start, prev_end)
-    yoy_data  = get_fifo_data(company_id, yoy_start, yoy_end)
-
-    curr_qty, curr_cost, curr_cpk = metrics(curr_data)
-    prev_qty, prev_cost, prev_cpk = metrics(prev_data)
-    yoy_qty,  yoy_cost,  yoy_cpk  = metrics(yoy_data)
-
-    # Supplier concentration
-    supplier_cost = defaultdict(float)
-    for d in curr_data:
-        supplier_cost[d["supplier"]] += d["cost"]
-
-    top_supplier = max(supplier_cost, key=supplier_cost.get, default="—")
-    top_supplier_pct = (
-        supplier_cost[top_supplier] / curr_cost * 100
-        if curr_cost > 0 else 0
-    )
-
-    # Company info
-    company = supabase.table("companies") \
-        .select("company_name, director") \
-        .eq("id", company_id) \
-        .single() \
-        .execute()
-
-    company_name = company.data.get("company_name", "Company")
-    director_name = company.data.get("director", "Director")
+    curr_qty, curr_cost, curr_cpk = ctx["curr"]
+    prev_qty, prev_cost, prev_cpk = ctx["prev"]
+    yoy_qty,  yoy_cost,  yoy_cpk  = ctx["yoy"]
 
-    month_str = curr_start.strftime("%B %Y")
+    top_supplier = ctx["top_supplier"]
+    top_supplier_pct = ctx["top_supplier_pct"]
 
     # ──── Header ────
     story.append(Spacer(1, 0.15*inch))
@@ -354,5 +247,5 @@ def generate_monthly_pdf(company_id: str, year: int, month: int) -> str:
 
     doc.build(story, onFirstPage=footer, onLaterPages=footer)
 
-    return pdf_path
+    return buffer.getvalue()
 
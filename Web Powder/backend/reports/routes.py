@@ -1,40 +1,139 @@
 # reports/routes.py
 
-from fastapi import APIRouter, Depends
-from fastapi.responses import FileResponse
+import logging
+from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException
+from postgrest.exceptions import APIError
+from config import gather
 from session import get_company_id
 
 # These now use the full package path
-from reports.monthly import generate_monthly_pdf
+from reports.monthly import generate_monthly_pdf, load_company
 from reports.annual  import generate_annual_pdf
+from reports import jobs
+from services.fifo_data import fifo_fingerprint
+from utils import pdf_cache
+from utils.profiling import profiled
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/reports", tags=["Reports"])
 
 
+def report_fingerprint(company_id: str, start: datetime, end: datetime):
+    """
+    Data fingerprint for the PDF cache; None (= don't cache) if it can't be
+    taken. Includes the company row the cover prints, which the frontend
+    edits directly.
+    """
+    try:
+        fifo, company = gather(
+            lambda: fifo_fingerprint(company_id, start, end),
+            lambda: load_company(company_id)
+        )
+        return fifo, tuple(sorted(company.items()))
+    except APIError as e:
+        logger.warning("No report fingerprint for %s (%s), rendering uncached", company_id, e.code)
+        return None
+
+
+def monthly_pdf(company_id: str, year: int, month: int):
+    # Report reads current month, previous month and same month last year
+    curr_start = datetime(year, month, 1)
+    curr_end = (curr_start + timedelta(days=32)).replace(day=1) - timedelta(seconds=1)
+    yoy_start = curr_start.replace(year=year - 1)
+
+    return pdf_cache.cached(
+        "monthly", company_id, f"{year}-{month:02d}",
+        report_fingerprint(company_id, yoy_start, curr_end),
+        lambda: generate_monthly_pdf(company_id, year, month)
+    )
+
+
+def annual_pdf(company_id: str, year: int):
+    # Report reads the requested FY and the one before it
+    return pdf_cache.cached(
+        "annual", company_id, f"FY{year}",
+        report_fingerprint(
+            company_id,
+            datetime(year - 1, 4, 1),
+            datetime(year + 1, 3, 31, 23, 59, 59)
+        ),
+        lambda: generate_annual_pdf(company_id, year)
+    )
+
+
 @router.get("/monthly")
+@profiled
 def monthly_report(
     year: int,
     month: int,
     company_id: str = Depends(get_company_id)
 ):
-    pdf_path = generate_monthly_pdf(company_id, year, month)
-
-    return FileResponse(
-        path=pdf_path,
-        media_type="application/pdf",
-        filename=f"Monthly_Report_{year}_{month}.pdf"
-    )
+    pdf = monthly_pdf(company_id, year, month)
+    return pdf_cache.pdf_response(pdf, f"Monthly_Report_{year}_{month}.pdf")
 
 
 @router.get("/annual")
+@profiled
 def annual_report(
     year: int,
     company_id: str = Depends(get_company_id)
 ):
-    pdf_path = generate_annual_pdf(company_id, year)
+    pdf = annual_pdf(company_id, year)
+    return pdf_cache.pdf_response(pdf, f"Annual_Audit_Report_{year}.pdf")
 
-    return FileResponse(
-        path=pdf_path,
-        media_type="application/pdf",
-        filename=f"Annual_Audit_Report_{year}.pdf"
-    )
+
+# =================================================
+# ASYNC REPORT JOBS
+# POST /reports/jobs → poll /reports/jobs/{id} → GET .../download
+# =================================================
+@router.post("/jobs", status_code=202)
+def submit_report_job(
+    payload: dict,
+    company_id: str = Depends(get_company_id)
+):
+    kind = payload.get("kind")
+
+    try:
+        year = int(payload["year"])
+        month = int(payload["month"]) if kind == "monthly" else None
+    except (KeyError, TypeError, ValueError):
+        raise HTTPException(400, "year (and month for monthly) required")
+
+    if kind == "monthly":
+        if not 1 <= month <= 12:
+            raise HTTPException(400, "month must be 1-12")
+        return jobs.submit(
+            company_id, kind, f"Monthly_Report_{year}_{month}.pdf",
+            lambda: monthly_pdf(company_id, year, month)
+        )
+
+    if kind == "annual":
+        return jobs.submit(
+            company_id, kind, f"Annual_Audit_Report_{year}.pdf",
+            lambda: annual_pdf(company_id, year)
+        )
+
+    raise HTTPException(400, "kind must be 'monthly' or 'annual'")
+
+
+@router.get("/jobs/{job_id}")
+def report_job_status(
+    job_id: str,
+    company_id: str = Depends(get_company_id)
+):
+    return jobs.status(company_id, job_id)
+
+
+@router.get("/jobs/{job_id}/download")
+def download_report_job(
+    job_id: str,
+    company_id: str = Depends(get_company_id)
+):
+    job = jobs.get(company_id, job_id)
+
+    if job["status"] != "done":
+        raise HTTPException(409, f"Report is {job['status']}")
+
+    return pdf_cache.pdf_response(job["result"], job["filename"])
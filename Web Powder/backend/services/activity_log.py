@@ -0,0 +1,196 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+import httpx
+from postgrest.exceptions import APIError
+from config import supabase
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------------------------------------
+# Buffered activity_log writer.
+#
+# log_event() only enqueues the row and returns; a background thread
+# drains the queue and writes it with one bulk insert per BATCH_SIZE rows
+# or every FLUSH_INTERVAL seconds, whichever comes first. The queue is
+# bounded: when it is full, callers block for up to PUT_TIMEOUT seconds
+# (backpressure) before the event is dropped with a warning. An insert
+# that failed in transit or on the server side (5xx, connection / resource
+# errors) is retried RETRIES times before its rows are dropped; one the
+# database rejected (constraint, RLS ...) is dropped at once – it would
+# only fail again while the queue fills up.
+# shutdown() (app shutdown) drains and writes whatever is still queued.
+# ---------------------------------------------------------
+BATCH_SIZE = int(os.getenv("ACTIVITY_LOG_BATCH_SIZE", "100"))
+FLUSH_INTERVAL = float(os.getenv("ACTIVITY_LOG_FLUSH_INTERVAL", "2.0"))
+MAX_QUEUE = int(os.getenv("ACTIVITY_LOG_MAX_QUEUE", "10000"))
+PUT_TIMEOUT = float(os.getenv("ACTIVITY_LOG_PUT_TIMEOUT", "1.0"))
+RETRIES = int(os.getenv("ACTIVITY_LOG_RETRIES", "3"))
+
+_queue = queue.Queue(maxsize=MAX_QUEUE)
+_stop = object()
+
+_worker = None
+_worker_lock = threading.Lock()
+_write_lock = threading.Lock()
+
+
+def _jsonable(value):
+    """Datetimes -> ISO strings (and anything else json can't take -> str)."""
+    def default(v):
+        return v.isoformat() if hasattr(v, "isoformat") else str(v)
+
+    return json.loads(json.dumps(value, default=default))
+
+
+def _ensure_worker():
+    global _worker
+
+    if _worker is not None and _worker.is_alive():
+        return
+
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, name="activity-log", daemon=True)
+            _worker.start()
+
+
+def log_event(
+    company_id: str,
+    event_type: str,
+    ref_type: str,
+    ref_id: str | None = None,
+    meta: dict | None = None,
+    user_id: str | None = None
+) -> bool:
+    """Queue one activity_log row. False if it had to be dropped (queue full)."""
+    row = _jsonable({
+        "company_id": company_id,
+        "user_id": user_id,
+        "event_type": event_type,
+        "ref_type": ref_type,
+        "ref_id": ref_id,
+        "meta": meta or {},
+        "created_at": datetime.now(timezone.utc),
+    })
+
+    _ensure_worker()
+
+    try:
+        _queue.put(row, timeout=PUT_TIMEOUT)
+        return True
+    except queue.Full:
+        logger.warning("Activity log queue full, dropped %s %s %s", event_type, ref_type, ref_id)
+        return False
+
+
+# SQLSTATE classes PostgREST answers with a 5xx: connection, transaction
+# rollback, insufficient resources, operator intervention, system errors
+RETRY_SQLSTATES = ("08", "40", "53", "57", "58", "XX")
+
+
+def _retryable(e: Exception) -> bool:
+    if isinstance(e, httpx.TransportError):
+        return True
+    if not isinstance(e, APIError):
+        return False
+
+    # Non-JSON error bodies (gateway errors) carry the HTTP status as code
+    if isinstance(e.code, int):
+        return e.code >= 500
+
+    code = str(e.code or "")
+    return code in ("PGRST000", "PGRST001", "PGRST002", "PGRST003") or code.startswith(RETRY_SQLSTATES)
+
+
+def _write(rows):
+    with _write_lock:
+        for attempt in range(1, RETRIES + 1):
+            try:
+                supabase.table("activity_log").insert(rows).execute()
+                return
+            except Exception as e:
+                if not _retryable(e):
+                    logger.error("Activity log insert of %d rows rejected, dropping: %s", len(rows), e)
+                    return
+                logger.warning("Activity log insert of %d rows failed (%d/%d): %s", len(rows), attempt, RETRIES, e)
+                if attempt < RETRIES:
+                    time.sleep(min(2 ** attempt, 10))
+
+        logger.error("Activity log dropped %d rows", len(rows))
+
+
+def _drain(batch, limit):
+    while len(batch) < limit:
+        try:
+            row = _queue.get_nowait()
+        except queue.Empty:
+            return False
+        if row is _stop:
+            return True
+        batch.append(row)
+    return False
+
+
+def _run():
+    batch = []
+    deadline = None
+
+    while True:
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+
+        try:
+            row = _queue.get(timeout=timeout)
+        except queue.Empty:
+            row = None
+
+        stopping = row is _stop
+        if row is not None and not stopping:
+            batch.append(row)
+            if deadline is None:
+                deadline = time.monotonic() + FLUSH_INTERVAL
+            stopping = _drain(batch, BATCH_SIZE)
+
+        due = deadline is not None and time.monotonic() >= deadline
+        if batch and (stopping or due or len(batch) >= BATCH_SIZE):
+            _write(batch)
+            batch = []
+            deadline = None
+
+        if stopping:
+            return
+
+
+def flush():
+    """Write everything queued so far, on the calling thread."""
+    batch = []
+    while True:
+        stopped = _drain(batch, BATCH_SIZE)
+        if batch:
+            _write(batch)
+            batch = []
+        if stopped:
+            _queue.put_nowait(_stop)
+            return
+        if _queue.empty():
+            return
+
+
+def shutdown(timeout: float = 10.0):
+    """Stop the writer after it has written every queued event."""
+    global _worker
+
+    with _worker_lock:
+        worker, _worker = _worker, None
+
+    if worker is not None and worker.is_alive():
+        _queue.put(_stop)
+        worker.join(timeout)
+
+    # Anything the worker could not get to (or queued with no worker)
+    flush()
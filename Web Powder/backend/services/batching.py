@@ -0,0 +1,102 @@
+import os
+from functools import partial
+from config import supabase, gather
+
+
+# Keeps each request URL well under PostgREST / proxy limits (uuid ids are
+# ~37 chars encoded) and each response under the default max-rows cap.
+IN_CHUNK_SIZE = int(os.getenv("SUPABASE_IN_CHUNK_SIZE", "150"))
+IN_MAX_WORKERS = int(os.getenv("SUPABASE_IN_MAX_WORKERS", "4"))
+
+# Must not exceed the project's PostgREST max-rows (1000 on Supabase).
+PAGE_SIZE = int(os.getenv("SUPABASE_PAGE_SIZE", "1000"))
+
+
+class IncompleteFetchError(RuntimeError):
+    """A chunk returned fewer rows than the database reported for it."""
+
+
+def chunked(values, size: int = IN_CHUNK_SIZE):
+    values = list(values)
+    return [values[i:i + size] for i in range(0, len(values), size)]
+
+
+def select_in(
+    table: str,
+    columns: str,
+    column: str,
+    ids,
+    apply=None,
+    chunk_size: int = IN_CHUNK_SIZE
+):
+    """
+    Batched `.in_(column, ids)` select.
+
+    ids are de-duplicated and split into chunks of chunk_size; the chunks run
+    concurrently on at most IN_MAX_WORKERS threads and their rows are merged
+    in chunk order. `apply` receives each chunk's query builder so callers
+    can add extra filters (eq / gte / order ...).
+
+    Every chunk asks for an exact count, and a chunk that comes back with
+    fewer rows than counted (row cap, truncated response) raises
+    IncompleteFetchError instead of silently dropping rows.
+    """
+    ids = list(dict.fromkeys(i for i in ids if i is not None))
+
+    if not ids:
+        return []
+
+    def run(chunk):
+        query = supabase.table(table) \
+            .select(columns, count="exact") \
+            .in_(column, chunk)
+
+        if apply:
+            query = apply(query)
+
+        result = query.execute()
+        rows = result.data or []
+
+        if result.count is not None and len(rows) < result.count:
+            raise IncompleteFetchError(
+                f"{table}.{column} chunk returned {len(rows)} of "
+                f"{result.count} rows ({len(chunk)} ids)"
+            )
+
+        return rows
+
+    chunks = chunked(ids, chunk_size)
+
+    if len(chunks) == 1:
+        return run(chunks[0])
+
+    results = gather(*(partial(run, c) for c in chunks), max_workers=IN_MAX_WORKERS)
+
+    return [row for rows in results for row in rows]
+
+
+def select_pages(build, page_size: int = PAGE_SIZE):
+    """
+    Fetch every row of a (possibly large) filtered select.
+
+    `build` must return a fresh, stably ordered query whose select() asked
+    for count="exact". The first page reports the total; the remaining
+    pages are fetched concurrently with `.range()` and the merged result is
+    checked against that total.
+    """
+    first = build().range(0, page_size - 1).execute()
+    rows = list(first.data or [])
+    total = first.count if first.count is not None else len(rows)
+
+    offsets = list(range(len(rows), total, page_size)) if rows else []
+
+    def run(offset):
+        return build().range(offset, offset + page_size - 1).execute().data or []
+
+    for page in gather(*(partial(run, o) for o in offsets), max_workers=IN_MAX_WORKERS):
+        rows.extend(page)
+
+    if len(rows) < total:
+        raise IncompleteFetchError(f"paged select returned {len(rows)} of {total} rows")
+
+    return rows
@@ -0,0 +1,191 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from postgrest.exceptions import APIError
+from config import supabase
+from services.fifo_frame import FifoFrame, to_epoch
+from utils.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------------------------------------
+# Process-local cache of parsed FIFO frames, per company.
+#
+# Every lookup first probes the company's high-water mark:
+# (row count, max WATERMARK_COLUMN) of usage_fifo. While it has not moved,
+# cached windows are served as-is. When it moves, only rows created after
+# the stored mark are fetched and appended to the cached windows; if the
+# row count does not add up (rows deleted) the company is dropped and
+# reloaded. Companies are evicted LRU-first once MAX_BYTES is exceeded.
+# When the mark cannot be taken (PostgREST error, no WATERMARK_COLUMN),
+# the window is loaded uncached.
+#
+# A company's windows are only read or changed under its own lock.
+# ---------------------------------------------------------
+MAX_BYTES = int(os.getenv("FIFO_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+WATERMARK_COLUMN = os.getenv("FIFO_CACHE_WATERMARK_COLUMN", "created_at")
+PROBE_TTL = float(os.getenv("FIFO_CACHE_PROBE_TTL", "1.0"))
+
+
+class _Company:
+    __slots__ = ("lock", "mark", "probed_at", "windows")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.mark = None
+        self.probed_at = 0.0
+        self.windows = OrderedDict()   # (start_ts, end_ts) -> FifoFrame
+
+    @property
+    def nbytes(self):
+        # snapshot: another thread may be changing windows under self.lock
+        return sum(f.nbytes for f in tuple(self.windows.values()))
+
+
+_companies = OrderedDict()
+_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    return MAX_BYTES > 0
+
+
+@timed("fetch")
+def high_water_mark(company_id: str):
+    """(row count, latest WATERMARK_COLUMN value) of the company's usage_fifo rows."""
+    result = supabase.table("usage_fifo") \
+        .select(WATERMARK_COLUMN, count="exact") \
+        .eq("company_id", company_id) \
+        .order(WATERMARK_COLUMN, desc=True) \
+        .limit(1) \
+        .execute()
+
+    latest = result.data[0][WATERMARK_COLUMN] if result.data else None
+    return (result.count or 0, latest)
+
+
+def _entry(company_id: str) -> _Company:
+    with _lock:
+        entry = _companies.get(company_id)
+        if entry is None:
+            entry = _companies[company_id] = _Company()
+        _companies.move_to_end(company_id)
+        return entry
+
+
+def _refresh(company_id: str, entry: _Company, load):
+    """Bring entry up to the current mark. Caller holds entry.lock."""
+    now = time.monotonic()
+    if entry.mark is not None and now - entry.probed_at < PROBE_TTL:
+        return
+
+    mark = high_water_mark(company_id)
+    entry.probed_at = now
+
+    if mark == entry.mark:
+        return
+
+    if entry.mark is None or entry.mark[1] is None or not entry.windows:
+        entry.windows.clear()
+        entry.mark = mark
+        return
+
+    old_count, old_latest = entry.mark
+    _, new_latest = mark
+
+    delta = load(
+        company_id,
+        fifo_filter=lambda q: q.gt(WATERMARK_COLUMN, old_latest).lte(WATERMARK_COLUMN, new_latest)
+    )
+
+    if old_count + len(delta) != mark[0]:
+        logger.warning("FIFO rows changed under company %s, dropping cache", company_id)
+        entry.windows.clear()
+    else:
+        for key, frame in entry.windows.items():
+            start_ts, end_ts = key
+            mask = (delta.ts >= start_ts) & (delta.ts <= end_ts)
+            if mask.any():
+                entry.windows[key] = FifoFrame.concat([frame, delta.take(mask)])
+
+    entry.mark = mark
+
+
+def _evict(keep: str):
+    with _lock:
+        total = sum(e.nbytes for e in _companies.values())
+
+        for company_id in list(_companies):
+            if total <= MAX_BYTES:
+                return
+            if company_id == keep:
+                continue
+            total -= _companies.pop(company_id).nbytes
+
+        entry = _companies.get(keep)
+
+    if entry is None:
+        return
+
+    # Still over: trim the company's own least recently used windows
+    with entry.lock:
+        while total > MAX_BYTES and entry.windows:
+            _, frame = entry.windows.popitem(last=False)
+            total -= frame.nbytes
+
+
+def get_frame(company_id: str, start_dt, end_dt, load, probed_after: float | None = None) -> FifoFrame:
+    """
+    FifoFrame for [start_dt, end_dt], from cache when possible.
+    load(company_id, start_dt=None, end_dt=None, fifo_filter=None) does the
+    real fetch (services.fifo_data.load_fifo_frame). probed_after (a
+    time.monotonic() value) re-probes the mark within PROBE_TTL unless it
+    was taken after that moment – for results that outlive the request.
+    """
+    entry = _entry(company_id)
+    start_ts, end_ts = to_epoch(start_dt), to_epoch(end_dt)
+
+    with entry.lock:
+        if probed_after is not None and entry.probed_at < probed_after:
+            entry.probed_at = 0.0
+        try:
+            _refresh(company_id, entry, load)
+        except APIError as e:
+            logger.warning("FIFO cache mark for %s failed (%s), loading uncached", company_id, e.code)
+            entry.probed_at = 0.0
+            mark = None
+        else:
+            mark = entry.mark
+
+            for (ws, we), frame in entry.windows.items():
+                if ws <= start_ts and end_ts <= we:
+                    entry.windows.move_to_end((ws, we))
+                    return frame if (ws, we) == (start_ts, end_ts) else frame.between(start_dt, end_dt)
+
+    if mark is None or mark[1] is None:
+        return load(company_id, start_dt, end_dt)
+
+    # Fetch outside the lock (other windows of this company can load in
+    # parallel), capped at the mark so the next delta cannot double-count.
+    frame = load(
+        company_id, start_dt, end_dt,
+        fifo_filter=lambda q: q.lte(WATERMARK_COLUMN, mark[1])
+    )
+
+    with entry.lock:
+        if entry.mark == mark:
+            entry.windows[(start_ts, end_ts)] = frame
+
+    _evict(keep=company_id)
+    return frame
+
+
+def invalidate(company_id: str | None = None):
+    with _lock:
+        if company_id is None:
+            _companies.clear()
+        else:
+            _companies.pop(company_id, None)
@@ -1,67 +1,125 @@
+import logging
 from datetime import datetime
-from config import supabase
-
-
-def get_fifo_data(company_id: str, start_dt: datetime, end_dt: datetime):
+from functools import partial
+from postgrest.exceptions import APIError
+from config import supabase, gather
+from services.batching import select_in, select_pages
+from services.fifo_frame import FifoFrame
+from services import fifo_cache
+from utils.metrics import span, timed
+
+logger = logging.getLogger(__name__)
+
+
+# usage_fifo → usage is embedded as an INNER join so PostgREST applies the
+# used_at window on the database side (PGRST108 only hits filters on
+# embeds that are missing from the select list).
+FIFO_JOINED_SELECT = """
+    qty_used,
+    rate_per_kg,
+    usage_id,
+    usage!inner (
+        used_at,
+        powders!powder_id (powder_name),
+        suppliers!supplier_id (supplier_name)
+    )
+"""
+
+
+def _window(query, column: str, start_dt, end_dt):
+    if start_dt is not None:
+        query = query.gte(column, start_dt.isoformat())
+    if end_dt is not None:
+        query = query.lte(column, end_dt.isoformat())
+    return query
+
+
+def _fetch_joined(company_id: str, start_dt, end_dt, fifo_filter=None):
     """
-    Safe two-step fetch – avoids all join errors (PGRST108).
-    Returns list of dicts: qty, cost, powder, supplier, month, date
+    usage_fifo inner-joined to usage, filtered on used_at – one round trip
+    per PostgREST page (see services/batching.select_pages).
+    Returns list of (fifo_row, usage_row) pairs.
     """
-    # Step 1: Get raw FIFO rows (NO joins, NO usage filter here)
-    fifo_result = supabase.table("usage_fifo") \
-        .select("qty_used, rate_per_kg, usage_id") \
-        .eq("company_id", company_id) \
-        .execute()
+    def build():
+        query = supabase.table("usage_fifo") \
+            .select(FIFO_JOINED_SELECT, count="exact") \
+            .eq("company_id", company_id)
+        query = _window(query, "usage.used_at", start_dt, end_dt)
+        if fifo_filter:
+            query = fifo_filter(query)
+        return query.order("id")
 
-    fifo_rows = fifo_result.data or []
+    return [(r, r.get("usage") or {}) for r in select_pages(build)]
 
-    if not fifo_rows:
-        print(f"[FIFO DEBUG] No usage_fifo rows for company {company_id}")
+
+def _fetch_two_step(company_id: str, start_dt, end_dt, fifo_filter=None):
+    """
+    Fallback when the usage_fifo → usage relationship cannot be embedded.
+    Both steps are still bounded by the date window: usage rows in range
+    first (paged, so a window past max-rows is never truncated), then only
+    the FIFO rows that point at them.
+    """
+    def build():
+        query = supabase.table("usage") \
+            .select("""
+                id,
+                used_at,
+                powders!powder_id (powder_name),
+                suppliers!supplier_id (supplier_name)
+            """, count="exact") \
+            .eq("company_id", company_id)
+        return _window(query, "used_at", start_dt, end_dt).order("id")
+
+    usage_map = {u["id"]: u for u in select_pages(build)}
+
+    if not usage_map:
         return []
 
-    print(f"[FIFO DEBUG] Fetched {len(fifo_rows)} usage_fifo rows")
+    def apply(query):
+        query = query.eq("company_id", company_id)
+        return fifo_filter(query) if fifo_filter else query
 
-    # Step 2: Get matching usage rows + joins + date filter
-    usage_ids = [r["usage_id"] for r in fifo_rows if r.get("usage_id")]
+    fifo_rows = select_in(
+        "usage_fifo",
+        "qty_used, rate_per_kg, usage_id",
+        "usage_id",
+        usage_map,
+        apply=apply
+    )
 
-    if not usage_ids:
-        print("[FIFO DEBUG] No valid usage_ids")
-        return []
+    return [
+        (r, usage_map[r["usage_id"]])
+        for r in fifo_rows
+        if r.get("usage_id") in usage_map
+    ]
 
-    usage_result = supabase.table("usage") \
-        .select("""
-            id,
-            used_at,
-            powder_id,
-            supplier_id,
-            powders!powder_id (powder_name),
-            suppliers!supplier_id (supplier_name)
-        """) \
-        .in_("id", usage_ids) \
-        .gte("used_at", start_dt.isoformat()) \
-        .lte("used_at", end_dt.isoformat()) \
-        .execute()
 
-    usage_rows = usage_result.data or []
-    print(f"[FIFO DEBUG] Fetched {len(usage_rows)} usage rows in date range")
+@timed("fetch")
+def _fetch_pairs(company_id: str, start_dt, end_dt, fifo_filter=None):
+    try:
+        pairs = _fetch_joined(company_id, start_dt, end_dt, fifo_filter)
+    except APIError as e:
+        logger.warning("Joined FIFO fetch failed (%s), using two-step fetch", e.code)
+        pairs = _fetch_two_step(company_id, start_dt, end_dt, fifo_filter)
 
-    # Map usage_id → full row
-    usage_map = {u["id"]: u for u in usage_rows}
+    logger.debug("Fetched %d usage_fifo rows in date range", len(pairs))
+    return pairs
 
-    output = []
 
-    for fifo in fifo_rows:
-        usage = usage_map.get(fifo["usage_id"])
-        if not usage:
-            continue
+def load_fifo_frame(company_id: str, start_dt=None, end_dt=None, fifo_filter=None) -> FifoFrame:
+    """
+    Uncached fetch straight from the database. start_dt / end_dt bound
+    usage.used_at (None = open end); fifo_filter adds filters on usage_fifo.
+    """
+    pairs = _fetch_pairs(company_id, start_dt, end_dt, fifo_filter)
 
-        qty = float(fifo.get("qty_used", 0))
-        rate = float(fifo.get("rate_per_kg", 0))
-        cost = qty * rate
+    with span("aggregate"):
+        return FifoFrame.from_records(_iter_records(pairs))
 
-        powder = usage.get("powders", {}).get("powder_name", "Unknown Powder")
-        supplier = usage.get("suppliers", {}).get("supplier_name", "Unknown Supplier")
 
+def _iter_records(pairs):
+    """Yields (qty, rate, used_at, powder, supplier) for every valid row."""
+    for fifo, usage in pairs:
         used_at_str = usage.get("used_at")
         if not used_at_str:
             continue
@@ -69,17 +127,71 @@ def get_fifo_data(company_id: str, start_dt: datetime, end_dt: datetime):
         try:
             dt = datetime.fromisoformat(used_at_str.replace("Z", "+00:00"))
         except Exception as e:
-            print(f"[FIFO WARN] Invalid used_at: {used_at_str} - {e}")
+            logger.warning("Invalid used_at: %s - %s", used_at_str, e)
             continue
 
-        output.append({
-            "qty": qty,
-            "cost": cost,
-            "powder": powder,
-            "supplier": supplier,
-            "month": dt.strftime("%Y-%m"),
-            "date": dt
-        })
-
-    print(f"[FIFO DEBUG] Returning {len(output)} valid FIFO rows")
-    return output
\ No newline at end of file
+        yield (
+            float(fifo.get("qty_used", 0)),
+            float(fifo.get("rate_per_kg", 0)),
+            dt,
+            (usage.get("powders") or {}).get("powder_name", "Unknown Powder"),
+            (usage.get("suppliers") or {}).get("supplier_name", "Unknown Supplier")
+        )
+
+
+def get_fifo_frame(company_id: str, start_dt: datetime, end_dt: datetime, probed_after: float | None = None) -> FifoFrame:
+    """
+    Date-bounded FIFO rows as a columnar FifoFrame (services/fifo_frame.py).
+    Answered from the per-company cache (services/fifo_cache.py) while the
+    company's FIFO high-water mark has not moved (see fifo_cache.get_frame
+    for probed_after).
+    """
+    if fifo_cache.enabled():
+        frame = fifo_cache.get_frame(company_id, start_dt, end_dt, load_fifo_frame, probed_after)
+    else:
+        frame = load_fifo_frame(company_id, start_dt, end_dt)
+
+    logger.debug("Returning %d valid FIFO rows", len(frame))
+    return frame
+
+
+def get_fifo_data(company_id: str, start_dt: datetime, end_dt: datetime):
+    """
+    Date-bounded FIFO fetch – only rows whose usage falls in
+    [start_dt, end_dt] leave the database.
+    Returns list of dicts: qty, cost, powder, supplier, month, date
+    """
+    return get_fifo_frame(company_id, start_dt, end_dt).to_dicts()
+
+
+@timed("fetch")
+def fifo_fingerprint(company_id: str, start_dt: datetime, end_dt: datetime):
+    """
+    (row count, latest created_at) of the FIFO rows whose usage falls in
+    [start_dt, end_dt] – changes whenever a report over that window would.
+    """
+    column = fifo_cache.WATERMARK_COLUMN
+
+    query = supabase.table("usage_fifo") \
+        .select(f"{column}, usage!inner (used_at)", count="exact") \
+        .eq("company_id", company_id)
+
+    result = _window(query, "usage.used_at", start_dt, end_dt) \
+        .order(column, desc=True) \
+        .limit(1) \
+        .execute()
+
+    return (result.count or 0, result.data[0][column] if result.data else None)
+
+
+def get_fifo_frames(company_id: str, windows: dict, probed_after: float | None = None) -> dict:
+    """
+    Several date windows at once: {name: (start_dt, end_dt)} -> {name: FifoFrame}.
+    The windows are fetched concurrently, so the cost is one round trip
+    instead of one per window.
+    """
+    frames = gather(*(
+        partial(get_fifo_frame, company_id, start_dt, end_dt, probed_after)
+        for start_dt, end_dt in windows.values()
+    ))
+    return dict(zip(windows, frames))
@@ -0,0 +1,160 @@
+from datetime import datetime, timezone
+import sys
+import numpy as np
+
+
+def to_epoch(dt: datetime) -> int:
+    """Naive datetimes are treated as UTC (same as PostgREST filters)."""
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+
+class FifoFrame:
+    """
+    Columnar FIFO rows.
+
+    qty / rate / cost are float64 arrays, ts holds used_at as epoch seconds
+    (int64) and powder / supplier are int32 codes into the `powders` and
+    `suppliers` name lists. Slices share the name lists with their parent.
+    """
+
+    __slots__ = ("qty", "rate", "cost", "ts", "powder", "supplier", "powders", "suppliers")
+
+    def __init__(self, qty, rate, ts, powder, supplier, powders, suppliers):
+        self.qty = qty
+        self.rate = rate
+        self.cost = qty * rate
+        self.ts = ts
+        self.powder = powder
+        self.supplier = supplier
+        self.powders = powders
+        self.suppliers = suppliers
+
+    @classmethod
+    def from_records(cls, records):
+        """records: iterable of (qty, rate, used_at: datetime, powder, supplier)"""
+        qty, rate, ts, powder, supplier = [], [], [], [], []
+        powder_codes, supplier_codes = {}, {}
+
+        for q, r, dt, p, s in records:
+            qty.append(q)
+            rate.append(r)
+            ts.append(to_epoch(dt))
+            powder.append(powder_codes.setdefault(p, len(powder_codes)))
+            supplier.append(supplier_codes.setdefault(s, len(supplier_codes)))
+
+        return cls(
+            np.asarray(qty, dtype=np.float64),
+            np.asarray(rate, dtype=np.float64),
+            np.asarray(ts, dtype=np.int64),
+            np.asarray(powder, dtype=np.int32),
+            np.asarray(supplier, dtype=np.int32),
+            list(powder_codes),
+            list(supplier_codes)
+        )
+
+    @classmethod
+    def concat(cls, frames):
+        """Stack frames, re-encoding powder / supplier codes into one dictionary."""
+        frames = [f for f in frames if len(f)]
+
+        if not frames:
+            return cls.from_records([])
+        if len(frames) == 1:
+            return frames[0]
+
+        powder_codes, supplier_codes = {}, {}
+        powder, supplier = [], []
+
+        for f in frames:
+            pmap = np.asarray([powder_codes.setdefault(n, len(powder_codes)) for n in f.powders], dtype=np.int32)
+            smap = np.asarray([supplier_codes.setdefault(n, len(supplier_codes)) for n in f.suppliers], dtype=np.int32)
+            powder.append(pmap[f.powder])
+            supplier.append(smap[f.supplier])
+
+        return cls(
+            np.concatenate([f.qty for f in frames]),
+            np.concatenate([f.rate for f in frames]),
+            np.concatenate([f.ts for f in frames]),
+            np.concatenate(powder),
+            np.concatenate(supplier),
+            list(powder_codes),
+            list(supplier_codes)
+        )
+
+    def __len__(self):
+        return len(self.qty)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = sum(getattr(self, a).nbytes for a in ("qty", "rate", "cost", "ts", "powder", "supplier"))
+        names = sum(sys.getsizeof(n) for n in self.powders) + sum(sys.getsizeof(n) for n in self.suppliers)
+        return arrays + names
+
+    def to_dicts(self):
+        """Row dicts in the get_fifo_data shape: qty, cost, powder, supplier, month, date"""
+        output = []
+
+        for q, c, t, p, s in zip(self.qty.tolist(), self.cost.tolist(), self.ts.tolist(),
+                                 self.powder.tolist(), self.supplier.tolist()):
+            dt = datetime.fromtimestamp(t, tz=timezone.utc)
+            output.append({
+                "qty": q,
+                "cost": c,
+                "powder": self.powders[p],
+                "supplier": self.suppliers[s],
+                "month": dt.strftime("%Y-%m"),
+                "date": dt
+            })
+
+        return output
+
+    def take(self, mask):
+        return FifoFrame(
+            self.qty[mask], self.rate[mask], self.ts[mask],
+            self.powder[mask], self.supplier[mask],
+            self.powders, self.suppliers
+        )
+
+    def between(self, start_dt: datetime, end_dt: datetime):
+        """Rows with start_dt <= used_at <= end_dt."""
+        mask = (self.ts >= to_epoch(start_dt)) & (self.ts <= to_epoch(end_dt))
+        return self.take(mask)
+
+    # ---------------------------------------------------------
+    # Aggregations
+    # ---------------------------------------------------------
+    def metrics(self):
+        qty = float(self.qty.sum())
+        cost = float(self.cost.sum())
+        cpk = cost / qty if qty else 0
+        return qty, cost, cpk
+
+    def _group(self, codes, names, weights):
+        totals = np.bincount(codes, weights=weights, minlength=len(names))
+        present = np.bincount(codes, minlength=len(names)) > 0
+        return {names[i]: float(totals[i]) for i in np.flatnonzero(present)}
+
+    def by_supplier(self, column: str = "cost"):
+        """supplier name -> sum of column ("cost" or "qty")"""
+        return self._group(self.supplier, self.suppliers, getattr(self, column))
+
+    def by_powder(self, column: str = "cost"):
+        """powder name -> sum of column ("cost" or "qty")"""
+        return self._group(self.powder, self.powders, getattr(self, column))
+
+    def by_month(self):
+        """'YYYY-MM' -> (qty, cost, cpk), months in ascending order"""
+        if not len(self):
+            return {}
+
+        months = self.ts.astype("datetime64[s]").astype("datetime64[M]")
+        keys, inverse = np.unique(months, return_inverse=True)
+        qty = np.bincount(inverse, weights=self.qty)
+        cost = np.bincount(inverse, weights=self.cost)
+
+        return {
+            str(k): (float(q), float(c), float(c / q) if q else 0)
+            for k, q, c in zip(keys, qty, cost)
+        }
@@ -0,0 +1,338 @@
+import argparse
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from postgrest.exceptions import APIError
+from config import supabase, service_supabase, gather
+from services.fifo_data import get_fifo_frames, fifo_fingerprint
+from utils.metrics import span, timed
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------------------------------------
+# Monthly FIFO rollups
+#
+# A rollup is a plain dict:
+#   {"month": "YYYY-MM", "rows": n, "qty": kg, "cost": ₹,
+#    "suppliers": {name: {"qty", "cost"}}, "powders": {name: {"qty", "cost"}}}
+#
+# Closed months (before the current UTC month) are stored in
+# fifo_monthly_rollups on first use, together with the month's source
+# fingerprint: (row count, max usage_fifo.created_at) of the FIFO rows
+# whose usage falls in the month, taken for all requested months in one
+# grouped query (fifo_month_fingerprints). A stored month is only used
+# while that fingerprint still matches – usage edited, cancelled or
+# back-dated into a closed month changes it and the month is recomputed
+# and re-stored.
+# The open month is always computed live.
+#
+# The table is backend-only (no anon / authenticated access), so the
+# store needs SUPABASE_SERVICE_KEY; without it every month is computed
+# live.
+# ---------------------------------------------------------
+ROLLUP_TABLE = "fifo_monthly_rollups"
+
+
+def month_key(dt: datetime) -> str:
+    return dt.strftime("%Y-%m")
+
+
+def month_bounds(key: str):
+    start = datetime.strptime(key, "%Y-%m")
+    end = (start + timedelta(days=32)).replace(day=1) - timedelta(seconds=1)
+    return start, end
+
+
+def month_range(first: str, last: str):
+    """All month keys from first to last, inclusive."""
+    keys = []
+    start, _ = month_bounds(first)
+    while month_key(start) <= last:
+        keys.append(month_key(start))
+        start = (start + timedelta(days=32)).replace(day=1)
+    return keys
+
+
+def is_closed(key: str) -> bool:
+    return key < month_key(datetime.utcnow())
+
+
+def empty_rollup(key: str) -> dict:
+    return {"month": key, "rows": 0, "qty": 0.0, "cost": 0.0, "suppliers": {}, "powders": {}}
+
+
+def rollup_frame(key: str, frame) -> dict:
+    qty, cost, _ = frame.metrics()
+
+    def split(group):
+        q, c = group("qty"), group("cost")
+        return {name: {"qty": q[name], "cost": c[name]} for name in q}
+
+    return {
+        "month": key,
+        "rows": len(frame),
+        "qty": qty,
+        "cost": cost,
+        "suppliers": split(frame.by_supplier),
+        "powders": split(frame.by_powder),
+    }
+
+
+def combine(rollups) -> dict:
+    """Sum several month rollups into one (month = None)."""
+    total = empty_rollup(None)
+
+    for r in rollups:
+        total["rows"] += r["rows"]
+        total["qty"] += r["qty"]
+        total["cost"] += r["cost"]
+        for field in ("suppliers", "powders"):
+            for name, v in r[field].items():
+                acc = total[field].setdefault(name, {"qty": 0.0, "cost": 0.0})
+                acc["qty"] += v["qty"]
+                acc["cost"] += v["cost"]
+
+    return total
+
+
+def metrics(rollup: dict):
+    qty, cost = rollup["qty"], rollup["cost"]
+    return qty, cost, cost / qty if qty else 0
+
+
+def supplier_cost(rollup: dict) -> dict:
+    return {name: v["cost"] for name, v in rollup["suppliers"].items()}
+
+
+# ---------------------------------------------------------
+# Store
+# ---------------------------------------------------------
+def _store_enabled() -> bool:
+    return service_supabase is not None
+
+
+def _fingerprint(company_id: str, key: str):
+    """Source fingerprint of one month, None if it cannot be taken."""
+    try:
+        return fifo_fingerprint(company_id, *month_bounds(key))
+    except APIError as e:
+        logger.warning("No fingerprint for %s %s (%s)", company_id, key, e.code)
+        return None
+
+
+@timed("fetch")
+def _grouped_fingerprints(company_id: str, keys: list) -> dict:
+    """All months' fingerprints in one round trip (fifo_month_fingerprints RPC)."""
+    rows = supabase.rpc("fifo_month_fingerprints", {
+        "p_company_id": company_id,
+        "p_from": month_bounds(min(keys))[0].isoformat(),
+        "p_to": month_bounds(max(keys))[1].isoformat()
+    }).execute().data or []
+
+    by_month = {r["month"]: (r["source_count"], r["source_latest"]) for r in rows}
+    return {k: by_month.get(k, (0, None)) for k in keys}
+
+
+def fingerprints(company_id: str, keys) -> dict:
+    """
+    month key -> source fingerprint (None if it cannot be taken). One
+    grouped query; one count per month, concurrently, without the RPC.
+    """
+    keys = list(keys)
+    if not keys:
+        return {}
+
+    try:
+        return _grouped_fingerprints(company_id, keys)
+    except APIError as e:
+        if e.code != "PGRST202":
+            logger.warning("No fingerprints for %s (%s)", company_id, e.code)
+            return dict.fromkeys(keys)
+        logger.warning("fifo_month_fingerprints RPC not found, one query per month")
+
+    return dict(zip(keys, gather(*(partial(_fingerprint, company_id, k) for k in keys))))
+
+
+def _same_source(row: dict, fingerprint) -> bool:
+    if fingerprint is None:
+        return False
+
+    count, latest = fingerprint
+    if row.get("source_count") != count:
+        return False
+
+    stored = row.get("source_latest")
+    if stored is None or latest is None:
+        return stored is None and latest is None
+
+    # Same instant, whatever offset / precision PostgREST printed it with
+    # (timestamp columns come back without an offset: UTC)
+    def parse(value):
+        dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+    return parse(stored) == parse(latest)
+
+
+@timed("fetch")
+def _read(company_id: str, keys):
+    if not keys or not _store_enabled():
+        return {}
+
+    try:
+        rows = service_supabase.table(ROLLUP_TABLE) \
+            .select("month, rows, qty, cost, suppliers, powders, source_count, source_latest") \
+            .eq("company_id", company_id) \
+            .in_("month", keys) \
+            .execute().data or []
+    except APIError as e:
+        logger.warning("Rollup read failed (%s), computing live", e.code)
+        return {}
+
+    return {
+        r["month"]: {**r, "qty": float(r["qty"]), "cost": float(r["cost"])}
+        for r in rows
+    }
+
+
+@timed("store")
+def _write(company_id: str, rollups, sources: dict):
+    """Store rollups with their source fingerprints (months without one are skipped)."""
+    rows = [
+        {
+            "company_id": company_id,
+            **r,
+            "source_count": sources[r["month"]][0],
+            "source_latest": sources[r["month"]][1],
+            "computed_at": datetime.utcnow().isoformat()
+        }
+        for r in rollups
+        if sources.get(r["month"]) is not None
+    ]
+
+    if not rows or not _store_enabled():
+        return
+
+    try:
+        service_supabase.table(ROLLUP_TABLE).upsert(rows).execute()
+    except APIError as e:
+        logger.warning("Rollup write failed (%s), rollups not stored", e.code)
+
+
+def _runs(keys):
+    """Group sorted month keys into contiguous (first, last) runs."""
+    runs = []
+    for key in sorted(keys):
+        if runs and month_key(month_bounds(runs[-1][1])[1] + timedelta(seconds=1)) == key:
+            runs[-1][1] = key
+        else:
+            runs.append([key, key])
+    return runs
+
+
+def compute_rollups(company_id: str, keys, probed_after: float | None = None) -> dict:
+    """
+    Live rollups from FIFO rows; contiguous months share one fetch and runs
+    load in parallel. probed_after (time.monotonic()) for rollups that get
+    stored: the FIFO cache must not answer from before their fingerprints
+    were taken.
+    """
+    windows = {
+        (first, last): (month_bounds(first)[0], month_bounds(last)[1])
+        for first, last in _runs(keys)
+    }
+    frames = get_fifo_frames(company_id, windows, probed_after)
+
+    output = {}
+    with span("aggregate"):
+        for (first, last), frame in frames.items():
+            for key in month_range(first, last):
+                output[key] = rollup_frame(key, frame.between(*month_bounds(key)))
+
+    return output
+
+
+def _stored(company_id: str, keys):
+    """
+    (stored rollups whose source is unchanged, fingerprint per month).
+    Fingerprints are taken before anything is recomputed, so rows added
+    meanwhile only make the stored month look stale next time.
+    """
+    if not keys or not _store_enabled():
+        return {}, {}
+
+    stored, sources = gather(
+        lambda: _read(company_id, keys),
+        lambda: fingerprints(company_id, keys)
+    )
+
+    valid = {}
+    for key, row in stored.items():
+        if _same_source(row, sources.get(key)):
+            valid[key] = row
+        else:
+            logger.info("Rollup %s %s is stale, recomputing", company_id, key)
+
+    return valid, sources
+
+
+def _public(row: dict) -> dict:
+    return {k: v for k, v in row.items() if k not in ("source_count", "source_latest")}
+
+
+def get_month_rollups(company_id: str, keys) -> dict:
+    """month key -> rollup, closed months from the store (recomputed and stored when stale or missing)."""
+    keys = list(dict.fromkeys(keys))
+
+    taken = time.monotonic()
+    stored, sources = _stored(company_id, [k for k in keys if is_closed(k)])
+    output = {k: _public(r) for k, r in stored.items()}
+    missing = [k for k in keys if k not in output]
+
+    if missing:
+        # only closed months get stored, open ones may come from the cache as-is
+        stale = any(is_closed(k) for k in missing)
+        computed = compute_rollups(company_id, missing, taken if stale else None)
+        _write(company_id, [r for k, r in computed.items() if is_closed(k)], sources)
+        output.update(computed)
+
+    return output
+
+
+# ---------------------------------------------------------
+# Backfill:  python -m services.rollups backfill <company_id> --from 2023-04
+# ---------------------------------------------------------
+def backfill(company_id: str, first: str, last: str | None = None, force: bool = False):
+    last = last or month_key(datetime.utcnow().replace(day=1) - timedelta(days=1))
+    keys = [k for k in month_range(first, last) if is_closed(k)]
+
+    if not _store_enabled():
+        raise SystemExit("SUPABASE_SERVICE_KEY is required to store rollups")
+
+    taken = time.monotonic()
+    if force:
+        sources = fingerprints(company_id, keys)
+    else:
+        stored, sources = _stored(company_id, keys)
+        keys = [k for k in keys if k not in stored]
+
+    computed = compute_rollups(company_id, keys, taken) if keys else {}
+    _write(company_id, list(computed.values()), sources)
+    return sorted(computed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Materialize monthly FIFO rollups")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    cmd = sub.add_parser("backfill")
+    cmd.add_argument("company_id")
+    cmd.add_argument("--from", dest="first", required=True, help="first month, YYYY-MM")
+    cmd.add_argument("--to", dest="last", help="last month, YYYY-MM (default: last closed month)")
+    cmd.add_argument("--force", action="store_true", help="recompute months already stored")
+
+    args = parser.parse_args()
+    done = backfill(args.company_id, args.first, args.last, args.force)
+    print(f"[ROLLUP] Stored {len(done)} month(s) for {args.company_id}")
@@ -1,15 +1,30 @@
+import os
 from fastapi import APIRouter, Depends, HTTPException, Request
 from typing import Dict
 from config import supabase
 from session import get_company_id
+from utils import pdf_cache, signature_cache
+from utils.ttl_cache import TTLCache
 
 router = APIRouter(prefix="/settings", tags=["Settings"])
 
 
 # -------------------------------------------------
 # HELPER: get logged-in user
+# Cached briefly so permission checks don't cost a round trip on every
+# settings call; user writes below drop the entry.
 # -------------------------------------------------
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "30"))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "1024"))
+
+_users = TTLCache(USER_CACHE_MAX_ENTRIES, USER_CACHE_TTL)
+
+
 def get_user(user_id: str):
+    user = _users.get(user_id)
+    if user is not None:
+        return dict(user)
+
     user = (
         supabase
         .table("users")
@@ -23,6 +38,7 @@ def get_user(user_id: str):
     if not user:
         raise HTTPException(404, "User not found")
 
+    _users.set(user_id, dict(user))
     return user
 
 
@@ -58,6 +74,7 @@ def update_my_profile(
         raise HTTPException(400, "Nothing to update")
 
     supabase.table("users").update(update_data).eq("id", user_id).execute()
+    _users.pop(user_id)
 
     return {"status": "ok", "message": "Profile updated"}
 
@@ -101,6 +118,13 @@ def update_company_settings(
 
     supabase.table("companies").update(update_data).eq("id", company_id).execute()
 
+    # Company details are printed on every report / PO PDF
+    pdf_cache.invalidate(company_id)
+
+    # A re-upload may keep the same URL
+    if update_data.get("signature_url"):
+        signature_cache.invalidate(update_data["signature_url"])
+
     return {"status": "ok", "message": "Company updated"}
 
 
@@ -162,5 +186,6 @@ def update_user(
         raise HTTPException(400, "Nothing to update")
 
     supabase.table("users").update(update_data).eq("id", target_user_id).execute()
+    _users.pop(target_user_id)
 
     return {"status": "ok", "message": "User updated"}
@@ -0,0 +1,38 @@
+# tests/conftest.py
+import os
+import sys
+
+import pytest
+
+# Backend modules import each other top-level (from config import ...)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The real client is built at import time; tests never send requests to it
+os.environ.setdefault("SUPABASE_URL", "http://supabase.test.invalid")
+os.environ.setdefault("SUPABASE_KEY", "test")
+os.environ.setdefault("PDF_RENDER_PROCESSES", "0")
+
+from bench.fake_supabase import FakeSupabase, installed  # noqa: E402
+
+
+@pytest.fixture
+def db():
+    """A fresh in-memory database patched in for every backend module."""
+    from services import fifo_cache
+
+    fake = FakeSupabase()
+    fifo_cache.invalidate()
+    with installed(fake):
+        yield fake
+    fifo_cache.invalidate()
+
+
+@pytest.fixture
+def pdf_cache_dir(tmp_path, monkeypatch):
+    """An empty PDF cache in tmp_path, with its in-memory index reset."""
+    from utils import pdf_cache
+
+    monkeypatch.setattr(pdf_cache, "CACHE_DIR", str(tmp_path / "pdf-cache"))
+    monkeypatch.setattr(pdf_cache, "_index", None)
+    monkeypatch.setattr(pdf_cache, "_total", 0)
+    return tmp_path / "pdf-cache"
@@ -0,0 +1,126 @@
+# tests/test_activity_log.py
+import queue
+
+import httpx
+import pytest
+from postgrest.exceptions import APIError
+
+from bench import tenants
+from po import purchase_order
+from services import activity_log
+
+
+@pytest.fixture
+def writer(db, monkeypatch):
+    """activity_log with an empty queue; its writer thread starts on the first event."""
+    monkeypatch.setattr(activity_log, "_queue", queue.Queue(maxsize=activity_log.MAX_QUEUE))
+    monkeypatch.setattr(activity_log, "_worker", None)
+    yield activity_log
+    activity_log.shutdown()
+
+
+@pytest.fixture
+def log(writer, monkeypatch):
+    """No writer thread: rows stay queued until flush()."""
+    monkeypatch.setattr(writer, "_ensure_worker", lambda: None)
+    monkeypatch.setattr(writer.time, "sleep", lambda seconds: None)
+    return writer
+
+
+class Flaky:
+    """The activity_log insert fails with each of `errors`, then reaches db."""
+
+    def __init__(self, db, errors):
+        self.db = db
+        self.errors = list(errors)
+        self.attempts = 0
+
+    def table(self, name):
+        self.name = name
+        return self
+
+    def insert(self, rows):
+        self.rows = rows
+        return self
+
+    def execute(self):
+        self.attempts += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        self.db.insert(self.name, self.rows)
+
+
+def _queue_events(log, n):
+    for i in range(n):
+        assert log.log_event("co", "CREATE", "PURCHASE_ORDER", f"po-{i}")
+
+
+def test_flush_writes_queued_events_in_one_insert(log, db, monkeypatch):
+    flaky = Flaky(db, [])
+    monkeypatch.setattr(log, "supabase", flaky)
+    _queue_events(log, 5)
+
+    log.flush()
+
+    assert flaky.attempts == 1
+    assert [r["ref_id"] for r in db.rows("activity_log")] == [f"po-{i}" for i in range(5)]
+
+
+@pytest.mark.parametrize("error", [
+    APIError({"code": "PGRST001", "message": "connection lost"}),
+    APIError({"code": "53300", "message": "too many connections"}),
+    httpx.ConnectError("refused"),
+])
+def test_transient_failures_are_retried(log, db, monkeypatch, error):
+    flaky = Flaky(db, [error] * (activity_log.RETRIES - 1))
+    monkeypatch.setattr(log, "supabase", flaky)
+    _queue_events(log, 3)
+
+    log.flush()
+
+    assert flaky.attempts == activity_log.RETRIES
+    assert len(db.rows("activity_log")) == 3
+
+
+def test_rows_are_dropped_after_the_last_retry(log, db, monkeypatch):
+    flaky = Flaky(db, [httpx.ConnectError("refused")] * activity_log.RETRIES)
+    monkeypatch.setattr(log, "supabase", flaky)
+    _queue_events(log, 3)
+
+    log.flush()
+
+    assert flaky.attempts == activity_log.RETRIES
+    assert db.rows("activity_log") == []
+
+
+def test_rejected_rows_are_not_retried(log, db, monkeypatch):
+    flaky = Flaky(db, [APIError({"code": "23503", "message": "violates foreign key constraint"})])
+    monkeypatch.setattr(log, "supabase", flaky)
+    _queue_events(log, 3)
+
+    log.flush()
+
+    assert flaky.attempts == 1
+    assert db.rows("activity_log") == []
+
+
+def test_full_queue_drops_the_event(log, monkeypatch):
+    monkeypatch.setattr(log, "_queue", queue.Queue(maxsize=1))
+    monkeypatch.setattr(log, "PUT_TIMEOUT", 0.01)
+
+    assert log.log_event("co", "CREATE", "PURCHASE_ORDER", "po-1")
+    assert not log.log_event("co", "CREATE", "PURCHASE_ORDER", "po-2")
+
+
+def test_po_events_are_written_by_the_writer_thread(writer, db):
+    tenant = tenants.populate(db, "1k")
+    po = next(p for p in db.rows("purchase_orders") if p["status"] == "OPEN")
+
+    purchase_order.cancel_po(tenant["company_id"], po["id"], tenant["user_id"])
+    assert writer._worker.is_alive()
+    writer.shutdown()
+
+    (event,) = [r for r in db.rows("activity_log") if r["ref_id"] == po["id"]]
+    assert event["event_type"] == "CANCEL"
+    assert event["ref_type"] == "PURCHASE_ORDER"
+    assert event["user_id"] == tenant["user_id"]
@@ -0,0 +1,71 @@
+# tests/test_batching.py
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from bench.fake_supabase import timestamp
+from services import batching, fifo_data
+from services.batching import IncompleteFetchError, select_in, select_pages
+
+COMPANY = "co-1"
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def _usage(db, n: int):
+    db.load("usage", [
+        {"id": f"u-{i:05d}", "company_id": COMPANY, "used_at": timestamp(START + timedelta(minutes=i))}
+        for i in range(n)
+    ])
+
+
+def _build():
+    return batching.supabase.table("usage") \
+        .select("id", count="exact") \
+        .eq("company_id", COMPANY) \
+        .order("id")
+
+
+def test_select_pages_fetches_past_max_rows(db):
+    _usage(db, 2500)
+
+    rows = select_pages(_build)
+
+    assert [r["id"] for r in rows] == [f"u-{i:05d}" for i in range(2500)]
+
+
+def test_select_pages_detects_truncated_pages(db):
+    _usage(db, 2500)
+
+    # pages larger than max-rows come back cut short
+    with pytest.raises(IncompleteFetchError):
+        select_pages(_build, page_size=2000)
+
+
+def test_select_in_merges_chunks(db):
+    _usage(db, 50)
+    ids = [f"u-{i:05d}" for i in range(0, 50, 2)] + ["missing"]
+
+    rows = select_in("usage", "id", "id", ids, chunk_size=7)
+
+    assert sorted(r["id"] for r in rows) == ids[:-1]
+
+
+def test_select_in_detects_truncated_chunks(db):
+    _usage(db, 50)
+    db.max_rows = 5
+
+    with pytest.raises(IncompleteFetchError):
+        select_in("usage", "id", "id", [f"u-{i:05d}" for i in range(10)], chunk_size=10)
+
+
+def test_two_step_fetch_pages_usage_rows(db):
+    _usage(db, 2500)
+    db.load("usage_fifo", [
+        {"id": f"f-{i:05d}", "company_id": COMPANY, "usage_id": f"u-{i:05d}",
+         "qty_used": 1.0, "rate_per_kg": 2.0, "created_at": timestamp(START)}
+        for i in range(2500)
+    ])
+
+    pairs = fifo_data._fetch_two_step(COMPANY, START, START + timedelta(days=30))
+
+    assert len(pairs) == 2500
@@ -0,0 +1,92 @@
+# tests/test_fifo_cache.py
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from bench import tenants
+from bench.fake_supabase import timestamp
+from services import fifo_cache, fifo_data
+
+
+@pytest.fixture
+def tenant(db, monkeypatch):
+    # probe the mark on every lookup
+    monkeypatch.setattr(fifo_cache, "PROBE_TTL", 0.0)
+    return tenants.populate(db, "1k")
+
+
+@pytest.fixture
+def loads():
+    """load_fifo_frame that records the windows it was asked for."""
+    calls = []
+
+    def load(company_id, start_dt=None, end_dt=None, fifo_filter=None):
+        calls.append((start_dt, end_dt))
+        return fifo_data.load_fifo_frame(company_id, start_dt, end_dt, fifo_filter)
+
+    load.calls = calls
+    return load
+
+
+_NOW = datetime.now(timezone.utc)
+WINDOW = (_NOW - timedelta(days=400), _NOW + timedelta(days=1))
+
+
+def _frame(company_id, load):
+    return fifo_cache.get_frame(company_id, *WINDOW, load)
+
+
+def _totals(frame):
+    return len(frame), round(float(frame.qty.sum()), 6)
+
+
+def _add_usage(db, tenant, qty: float):
+    now = datetime.now(timezone.utc)
+    usage_id = f"new-use-{qty}"
+    db.insert("usage", [{
+        "id": usage_id, "company_id": tenant["company_id"],
+        "powder_id": tenant["powder_ids"][0], "supplier_id": tenant["supplier_ids"][0],
+        "used_at": timestamp(now),
+    }])
+    db.insert("usage_fifo", [{
+        "company_id": tenant["company_id"], "usage_id": usage_id,
+        "qty_used": qty, "rate_per_kg": 100.0,
+        "created_at": timestamp(now + timedelta(seconds=5)),
+    }])
+
+
+def test_new_rows_are_appended_as_a_delta(db, tenant, loads):
+    company_id = tenant["company_id"]
+    before = _frame(company_id, loads)
+
+    _add_usage(db, tenant, qty=7.5)
+    after = _frame(company_id, loads)
+
+    assert len(after) == len(before) + 1
+    assert _totals(after) == _totals(fifo_data.load_fifo_frame(company_id, *WINDOW))
+    # one window load, then one unbounded delta load – no window refetch
+    assert loads.calls == [WINDOW, (None, None)]
+
+
+def test_unchanged_mark_serves_from_cache(db, tenant, loads):
+    company_id = tenant["company_id"]
+
+    first = _frame(company_id, loads)
+    second = _frame(company_id, loads)
+
+    assert second is first
+    assert len(loads.calls) == 1
+
+
+def test_deleted_rows_drop_the_cache(db, tenant, loads):
+    company_id = tenant["company_id"]
+    before = _frame(company_id, loads)
+
+    latest = max(db.rows("usage_fifo"), key=lambda r: r["created_at"])
+    db.table("usage_fifo").delete().eq("id", latest["id"]).execute()
+    after = _frame(company_id, loads)
+
+    assert len(after) == len(before) - 1
+    assert _totals(after) == _totals(fifo_data.load_fifo_frame(company_id, *WINDOW))
+    # the delta did not add up, so the window was loaded again
+    assert loads.calls[-1] == WINDOW
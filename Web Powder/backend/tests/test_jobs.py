@@ -0,0 +1,105 @@
+# tests/test_jobs.py
+import threading
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from reports import jobs
+
+
+@pytest.fixture(autouse=True)
+def queue(monkeypatch):
+    monkeypatch.setattr(jobs, "_jobs", {})
+    monkeypatch.setattr(jobs, "MAX_PENDING", 3)
+    monkeypatch.setattr(jobs, "MAX_PENDING_PER_COMPANY", 2)
+
+
+@pytest.fixture
+def gate():
+    """Jobs built with gate.build() run until the test ends (or gate.set())."""
+    event = threading.Event()
+    event.build = lambda: event.wait(5) and b"%PDF"
+    yield event
+    event.set()
+
+
+def _wait(company_id, job_id) -> dict:
+    for _ in range(500):
+        status = jobs.status(company_id, job_id)
+        if status["status"] in ("done", "failed"):
+            return status
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def _submit(company_id, build):
+    return jobs.submit(company_id, "monthly", "report.pdf", build)["job_id"]
+
+
+def test_queue_is_capped_per_company_and_overall(gate):
+    _submit("a", gate.build)
+    _submit("a", gate.build)
+
+    with pytest.raises(HTTPException) as e:
+        _submit("a", gate.build)
+    assert e.value.status_code == 429
+
+    # another company still gets in, up to the global limit
+    _submit("b", gate.build)
+    with pytest.raises(HTTPException) as e:
+        _submit("c", gate.build)
+    assert e.value.status_code == 429
+
+
+def test_finished_jobs_free_their_slot(gate):
+    first = _submit("a", gate.build)
+    _submit("a", gate.build)
+
+    gate.set()
+    assert _wait("a", first)["status"] == "done"
+    _submit("a", lambda: b"%PDF")
+
+
+def test_jobs_of_other_companies_are_not_found():
+    job_id = _submit("a", lambda: b"%PDF")
+
+    with pytest.raises(HTTPException) as e:
+        jobs.get("b", job_id)
+    assert e.value.status_code == 404
+
+
+def test_finished_jobs_expire(monkeypatch):
+    job_id = _submit("a", lambda: b"%PDF")
+    assert _wait("a", job_id)["download_url"] == f"/reports/jobs/{job_id}/download"
+
+    monkeypatch.setattr(jobs, "JOB_TTL", 0)
+    time.sleep(0.01)
+
+    with pytest.raises(HTTPException):
+        jobs.get("a", job_id)
+
+
+def test_oldest_finished_jobs_go_over_max_done(monkeypatch):
+    monkeypatch.setattr(jobs, "MAX_DONE", 1)
+    first = _submit("a", lambda: b"%PDF")
+    _wait("a", first)
+    second = _submit("a", lambda: b"%PDF")
+    _wait("a", second)
+
+    assert list(jobs._jobs) == [second]
+
+
+@pytest.mark.parametrize("error, shown", [
+    (RuntimeError("relation \"usage\" does not exist at /srv/app"), "Report generation failed"),
+    (ValueError("No data for 2024-02"), "No data for 2024-02"),
+    (HTTPException(400, "month must be 1-12"), "month must be 1-12"),
+])
+def test_failed_jobs_only_show_deliberate_messages(error, shown):
+    def build():
+        raise error
+
+    status = _wait("a", _submit("a", build))
+
+    assert status["status"] == "failed"
+    assert status["error"] == shown
@@ -0,0 +1,19 @@
+# tests/test_metrics.py
+import pytest
+
+from utils import metrics
+
+
+@pytest.mark.parametrize("token, header, expected", [
+    ("", None, False),
+    ("", "Bearer ", False),
+    ("s3cret", None, False),
+    ("s3cret", "Bearer wrong", False),
+    ("s3cret", "Basic s3cret", False),
+    ("s3cret", "Bearer s3cret", True),
+    ("s3cret", "bearer s3cret", True),
+])
+def test_metrics_need_the_bearer_token(monkeypatch, token, header, expected):
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", token)
+
+    assert metrics.authorized(header) is expected
@@ -0,0 +1,114 @@
+# tests/test_pdf_cache.py
+import os
+
+import pytest
+
+from utils import pdf_cache
+
+
+@pytest.fixture(autouse=True)
+def cache(pdf_cache_dir, monkeypatch):
+    monkeypatch.setattr(pdf_cache, "MAX_BYTES", 250)
+    return pdf_cache_dir
+
+
+def _files():
+    return sorted(os.listdir(pdf_cache.CACHE_DIR))
+
+
+def _age(subject, fingerprint, mtime):
+    path = pdf_cache._path("po", "co", subject, fingerprint)
+    os.utime(path, (mtime, mtime))
+
+
+def test_new_fingerprint_replaces_the_old_file():
+    pdf_cache.put("po", "co", "po-1", "v1", b"a" * 100)
+    pdf_cache.put("po", "co", "po-1", "v2", b"b" * 50)
+
+    assert len(_files()) == 1
+    assert pdf_cache.get("po", "co", "po-1", "v1") is None
+    assert pdf_cache.get("po", "co", "po-1", "v2") == b"b" * 50
+    assert pdf_cache._total == 50
+
+
+def test_least_recently_used_is_evicted_first():
+    pdf_cache.put("po", "co", "po-1", "v", b"1" * 100)
+    pdf_cache.put("po", "co", "po-2", "v", b"2" * 100)
+    _age("po-1", "v", 1_000)
+    _age("po-2", "v", 2_000)
+
+    assert pdf_cache.get("po", "co", "po-1", "v")     # now the most recent
+    pdf_cache.put("po", "co", "po-3", "v", b"3" * 100)
+
+    assert pdf_cache.contains("po", "co", "po-1", "v")
+    assert not pdf_cache.contains("po", "co", "po-2", "v")
+    assert pdf_cache.contains("po", "co", "po-3", "v")
+    assert pdf_cache._total == 200
+
+
+def test_deferred_eviction_runs_on_trim():
+    for i in range(4):
+        pdf_cache.put("po", "co", f"po-{i}", "v", b"x" * 100, evict=False)
+    assert len(_files()) == 4
+
+    pdf_cache.trim()
+
+    assert len(_files()) == 2
+    assert pdf_cache._total == 200
+
+
+def test_index_is_seeded_from_files_already_on_disk(monkeypatch):
+    pdf_cache.put("po", "co", "po-1", "v", b"1" * 100)
+    pdf_cache.put("po", "co", "po-2", "v", b"2" * 100)
+
+    # a restarted process
+    monkeypatch.setattr(pdf_cache, "_index", None)
+    monkeypatch.setattr(pdf_cache, "_total", 0)
+    pdf_cache.put("po", "co", "po-3", "v", b"3" * 100)
+
+    assert len(_files()) == 2
+    assert pdf_cache._total == 200
+
+
+def test_invalidate_drops_only_the_company_and_doc_type():
+    pdf_cache.put("po", "co", "po-1", "v", b"1" * 60)
+    pdf_cache.put("monthly", "co", "2024-01", "v", b"2" * 60)
+    pdf_cache.put("po", "other", "po-1", "v", b"3" * 60)
+
+    pdf_cache.invalidate("co", "po")
+    assert not pdf_cache.contains("po", "co", "po-1", "v")
+    assert pdf_cache.contains("monthly", "co", "2024-01", "v")
+
+    pdf_cache.invalidate("co")
+    assert not pdf_cache.contains("monthly", "co", "2024-01", "v")
+    assert pdf_cache.contains("po", "other", "po-1", "v")
+    assert pdf_cache._total == 60
+
+
+def test_part_files_are_never_indexed_or_removed():
+    os.makedirs(pdf_cache.CACHE_DIR, exist_ok=True)
+    part = pdf_cache._path("po", "co", "po-1", "v") + ".123.abc.part"
+    with open(part, "wb") as f:
+        f.write(b"in flight")
+
+    pdf_cache.invalidate("co")
+    pdf_cache.put("po", "co", "po-2", "v", b"x" * 10)
+
+    assert os.path.exists(part)
+    assert pdf_cache._total == 10
+
+
+def test_unfingerprinted_pdfs_are_not_stored():
+    calls = []
+
+    def render():
+        calls.append(1)
+        return b"%PDF"
+
+    assert pdf_cache.cached("po", "co", "po-1", None, render) == b"%PDF"
+    assert pdf_cache.cached("po", "co", "po-1", None, render) == b"%PDF"
+    assert pdf_cache.cached("po", "co", "po-1", "v", render) == b"%PDF"
+    assert pdf_cache.cached("po", "co", "po-1", "v", render) == b"%PDF"
+
+    assert len(calls) == 3
+    assert len(_files()) == 1
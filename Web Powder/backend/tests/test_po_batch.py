@@ -0,0 +1,55 @@
+# tests/test_po_batch.py
+import io
+import zipfile
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from bench import tenants
+from po.routes import router
+
+
+@pytest.fixture
+def tenant(db, pdf_cache_dir):
+    return tenants.populate(db, "1k")
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(router)
+    return TestClient(app)
+
+
+def _export(client, tenant, payload):
+    return client.post("/po/pdf/batch", json=payload, headers={"X-Company-Id": tenant["company_id"]})
+
+
+@pytest.mark.parametrize("payload", [
+    {"date_from": "2024-13-01"},
+    {"date_from": "2024-01-01", "date_to": 'x"\r\nSet-Cookie: a=b'},
+    {"date_to": 20240101},
+    {"po_ids": "po-1"},
+    {"po_ids": ["po-1", ""]},
+    {"po_ids": ["po-1", 7]},
+    {},
+])
+def test_bad_batch_payload_is_a_400(client, tenant, payload):
+    assert _export(client, tenant, payload).status_code == 400
+
+
+def test_date_range_export(client, tenant, db):
+    pos = sorted(db.rows("purchase_orders"), key=lambda p: p["po_date"])
+    first, last = pos[0]["po_date"], pos[4]["po_date"]
+    expected = sum(1 for p in pos if first <= p["po_date"] <= last)
+
+    response = _export(client, tenant, {"date_from": first, "date_to": last})
+
+    assert response.status_code == 200
+    assert response.headers["content-disposition"] == \
+        f'attachment; filename="Purchase_Orders_{first}_{last}.zip"'
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        names = archive.namelist()
+        assert len(names) == expected
+        assert all(archive.read(n).startswith(b"%PDF") for n in names)
@@ -0,0 +1,60 @@
+# tests/test_po_history.py
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from bench.fake_supabase import timestamp
+from po import po_history
+from po.routes import router
+from services.batching import PAGE_SIZE
+
+COMPANY = "co-1"
+HEADERS = {"X-Company-Id": COMPANY}
+
+
+@pytest.fixture
+def events(db):
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    db.load("activity_log", [
+        {
+            "id": f"ev-{po}-{i}", "company_id": COMPANY, "ref_type": "PURCHASE_ORDER",
+            "ref_id": po, "event_type": f"E{i}", "meta": None,
+            "created_at": timestamp(start + timedelta(minutes=i)),
+        }
+        for po in ("po-1", "po-2")
+        for i in range(4)
+    ])
+
+
+@pytest.mark.parametrize("rpcs", [None, ()])
+def test_latest_events_per_po(db, events, rpcs):
+    if rpcs is not None:
+        db.rpcs = set(rpcs)     # PGRST202: paged fallback
+
+    histories = po_history.get_po_histories(COMPANY, ["po-1", "po-2", "po-3"], limit_per_po=2)
+
+    assert {k: [e["event_type"] for e in v] for k, v in histories.items()} == {
+        "po-1": ["E2", "E3"], "po-2": ["E2", "E3"], "po-3": []
+    }
+
+
+def test_limit_above_page_size_uses_the_paged_path(db, events, monkeypatch):
+    monkeypatch.setattr(po_history, "PAGE_SIZE", 2)
+    monkeypatch.setattr(po_history, "_latest_events", pytest.fail)
+
+    histories = po_history.get_po_histories(COMPANY, ["po-1"], limit_per_po=3)
+
+    assert [e["event_type"] for e in histories["po-1"]] == ["E1", "E2", "E3"]
+
+
+def test_history_route_caps_limit_per_po(db, events):
+    app = FastAPI()
+    app.include_router(router)
+    client = TestClient(app)
+
+    response = client.get("/po/history", params={"po_ids": "po-1", "limit_per_po": PAGE_SIZE + 1},
+                          headers=HEADERS)
+
+    assert response.status_code == 422
@@ -0,0 +1,99 @@
+# tests/test_po_list.py
+import base64
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from bench.fake_supabase import timestamp
+from po.purchase_order import encode_cursor
+from po.routes import router
+
+COMPANY = "co-1"
+HEADERS = {"X-Company-Id": COMPANY}
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(router)
+    return TestClient(app)
+
+
+@pytest.fixture
+def pos(db):
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    rows = [
+        {
+            "id": str(uuid.UUID(int=i + 1)),
+            "company_id": COMPANY,
+            "po_number": f"PO-{i:03d}",
+            "po_date": (start + timedelta(days=i)).date().isoformat(),
+            "supplier_id": f"sup-{i % 3}",
+            "supplier_name": f"Supplier {i % 3}",
+            "total_amount": 100.0 * i,
+            "status": "OPEN" if i % 2 else "COMPLETED",
+            # pairs share a created_at: the id has to break the tie
+            "created_at": timestamp(start + timedelta(hours=i // 2)),
+        }
+        for i in range(11)
+    ]
+    db.load("purchase_orders", rows)
+    db.load("purchase_orders", [{**rows[0], "id": str(uuid.uuid4()), "company_id": "co-2"}])
+    return sorted(rows, key=lambda r: (r["created_at"], r["id"]), reverse=True)
+
+
+def _pages(client, **params):
+    pages, cursor = [], None
+    while True:
+        query = {**params, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/po/list", params=query, headers=HEADERS)
+        assert response.status_code == 200
+        pages.append((response.json(), response.headers.get("X-Total-Count")))
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return pages
+
+
+def test_cursor_pages_cover_every_po_once(client, pos):
+    pages = _pages(client, limit=3)
+
+    assert [len(rows) for rows, _ in pages] == [3, 3, 3, 2]
+    assert [r["id"] for rows, _ in pages for r in rows] == [r["id"] for r in pos]
+    assert [total for _, total in pages] == ["11", None, None, None]
+
+
+def test_cursor_pages_keep_the_filters(client, pos):
+    pages = _pages(client, limit=2, status="OPEN", supplier_id="sup-1")
+    expected = [r["id"] for r in pos if r["status"] == "OPEN" and r["supplier_id"] == "sup-1"]
+
+    assert [r["id"] for rows, _ in pages for r in rows] == expected
+    assert pages[0][1] == str(len(expected))
+
+
+def _cursor(*values) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(values)).encode()).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor!",
+    _cursor("2024-01-01T00:00:00+00:00"),
+    _cursor("yesterday", str(uuid.UUID(int=1))),
+    _cursor("2024-01-01T00:00:00+00:00", "po-1"),
+    _cursor('2024-01-01",id.gt."0', str(uuid.UUID(int=1))),
+    _cursor(20240101, str(uuid.UUID(int=1))),
+])
+def test_bad_cursor_is_a_400(client, pos, cursor):
+    response = client.get("/po/list", params={"cursor": cursor}, headers=HEADERS)
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+def test_encoded_cursor_round_trips(client, pos):
+    response = client.get("/po/list", params={"cursor": encode_cursor(pos[3])}, headers=HEADERS)
+
+    assert [r["id"] for r in response.json()] == [r["id"] for r in pos[4:]]
@@ -0,0 +1,98 @@
+# tests/test_render_pool.py
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from utils import render_pool
+
+
+class Pool:
+    """Stands in for the ProcessPoolExecutor: runs submits or refuses them."""
+
+    def __init__(self, submit=None):
+        self._submit = submit
+        self.shut = False
+
+    def submit(self, fn, context):
+        return self._submit(fn, context)
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut = True
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    """render_pool enabled, with its executor replaced by a Pool."""
+    monkeypatch.setattr(render_pool, "RENDER_PROCESSES", 2)
+    monkeypatch.setattr(render_pool, "RENDER_WINDOW", 2)
+
+    def install(p):
+        monkeypatch.setattr(render_pool, "_pool", p)
+        return p
+
+    yield install
+    monkeypatch.setattr(render_pool, "_pool", None)
+
+
+def _double(context):
+    return context["n"] * 2
+
+
+def _done(value=None, error=None, cancelled=False) -> Future:
+    future = Future()
+    if cancelled:
+        future.cancel()
+    elif error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(value)
+    return future
+
+
+def test_results_come_from_the_pool(pool):
+    pool(Pool(lambda fn, context: _done(fn(context) + 1)))
+
+    assert render_pool.render(_double, {"n": 2}) == 5
+
+
+@pytest.mark.parametrize("future", [
+    _done(error=BrokenProcessPool("worker died")),
+    _done(cancelled=True),
+])
+def test_broken_or_torn_down_pool_renders_inline(pool, future):
+    p = pool(Pool(lambda fn, context: future))
+
+    assert render_pool.render(_double, {"n": 2}) == 4
+    assert p.shut
+    assert render_pool._pool is None
+
+
+@pytest.mark.parametrize("error", [BrokenProcessPool("broken"), RuntimeError("cannot schedule new futures after shutdown")])
+def test_pool_refusing_work_renders_inline(pool, error):
+    def refuse(fn, context):
+        raise error
+
+    p = pool(Pool(refuse))
+
+    assert render_pool.render(_double, {"n": 3}) == 6
+    assert p.shut
+    assert render_pool._pool is None
+
+
+def test_render_many_keeps_order_and_falls_back_per_item(pool, monkeypatch):
+    def submit(fn, context):
+        if context["n"] == 2:
+            return _done(error=BrokenProcessPool("worker died"))
+        return _done(fn(context))
+
+    # the broken pool is replaced by a fresh one for later items
+    broken, fresh = Pool(submit), Pool(submit)
+    pool(broken)
+    monkeypatch.setattr(render_pool, "_executor", lambda: render_pool._pool or pool(fresh))
+
+    results = list(render_pool.render_many(_double, [{"n": n} for n in range(5)]))
+
+    assert results == [0, 2, 4, 6, 8]
+    assert broken.shut
+    assert render_pool._pool is fresh
@@ -0,0 +1,86 @@
+# tests/test_rollups.py
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from bench import tenants
+from bench.fake_supabase import timestamp
+from services import rollups
+from services.rollups import compute_rollups as live_rollups
+
+
+@pytest.fixture
+def tenant(db):
+    return tenants.populate(db, "1k")
+
+
+@pytest.fixture
+def computed(monkeypatch):
+    """compute_rollups that records which months it was asked for."""
+    calls = []
+    compute = rollups.compute_rollups
+
+    def record(company_id, keys, probed_after=None):
+        calls.append(sorted(keys))
+        return compute(company_id, keys, probed_after)
+
+    monkeypatch.setattr(rollups, "compute_rollups", record)
+    return calls
+
+
+def _closed_months(n: int = 3):
+    last = datetime.now(timezone.utc).replace(day=1) - timedelta(days=1)
+    first = (last.replace(day=1) - timedelta(days=31 * (n - 1))).replace(day=1)
+    return rollups.month_range(rollups.month_key(first), rollups.month_key(last))
+
+
+def _stored(db, company_id):
+    return {r["month"]: r for r in db.rows(rollups.ROLLUP_TABLE) if r["company_id"] == company_id}
+
+
+def test_closed_months_are_stored_then_reused(db, tenant, computed):
+    company_id, keys = tenant["company_id"], _closed_months()
+
+    first = rollups.get_month_rollups(company_id, keys)
+    second = rollups.get_month_rollups(company_id, keys)
+
+    assert first == second == live_rollups(company_id, keys)
+    assert sorted(_stored(db, company_id)) == keys
+    assert computed == [keys]
+
+
+def test_open_month_is_never_stored(db, tenant, computed):
+    company_id = tenant["company_id"]
+    current = rollups.month_key(datetime.now(timezone.utc))
+
+    rollups.get_month_rollups(company_id, [current])
+    rollups.get_month_rollups(company_id, [current])
+
+    assert _stored(db, company_id) == {}
+    assert computed == [[current], [current]]
+
+
+@pytest.mark.parametrize("rpcs", [None, ()])
+def test_back_dated_usage_recomputes_its_month(db, tenant, computed, rpcs):
+    if rpcs is not None:
+        db.rpcs = set(rpcs)     # fingerprints one query per month
+    company_id, keys = tenant["company_id"], _closed_months()
+    before = rollups.get_month_rollups(company_id, keys)
+
+    changed = keys[1]
+    used_at = rollups.month_bounds(changed)[0] + timedelta(days=3)
+    db.insert("usage", [{
+        "id": "late-usage", "company_id": company_id,
+        "powder_id": tenant["powder_ids"][0], "supplier_id": tenant["supplier_ids"][0],
+        "used_at": timestamp(used_at),
+    }])
+    db.insert("usage_fifo", [{
+        "company_id": company_id, "usage_id": "late-usage", "qty_used": 12.5, "rate_per_kg": 200.0,
+    }])
+    after = rollups.get_month_rollups(company_id, keys)
+
+    assert computed == [keys, [changed]]
+    assert after[changed]["rows"] == before[changed]["rows"] + 1
+    assert after[changed]["qty"] == pytest.approx(before[changed]["qty"] + 12.5)
+    assert {k: after[k] for k in keys if k != changed} == {k: before[k] for k in keys if k != changed}
+    assert _stored(db, company_id)[changed]["rows"] == after[changed]["rows"]
@@ -0,0 +1,60 @@
+# tests/test_settings_users.py
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from bench import tenants
+from bench.fake_supabase import stats
+from settings import routes
+from utils.ttl_cache import TTLCache
+
+
+@pytest.fixture
+def tenant(db, monkeypatch):
+    monkeypatch.setattr(routes, "_users", TTLCache(routes.USER_CACHE_MAX_ENTRIES, 60))
+    tenant = tenants.populate(db, "1k")
+    db.load("users", [{
+        "id": "staff-1", "company_id": tenant["company_id"], "role": "staff",
+        "full_name": "Staff One", "username": "staff",
+    }])
+    return tenant
+
+
+@pytest.fixture
+def client(tenant):
+    app = FastAPI()
+    app.include_router(routes.router)
+    return TestClient(app, headers={"X-Company-Id": tenant["company_id"]})
+
+
+def test_user_is_read_once_while_cached(tenant):
+    with stats() as s:
+        first = routes.get_user("staff-1")
+        second = routes.get_user("staff-1")
+
+    assert first == second
+    assert s.requests == 1
+
+
+def test_callers_cannot_change_the_cached_user(tenant):
+    routes.get_user("staff-1")["role"] = "owner"
+
+    assert routes.get_user("staff-1")["role"] == "staff"
+
+
+def test_owner_update_drops_the_cached_user(client, tenant):
+    assert routes.get_user("staff-1")["role"] == "staff"
+
+    r = client.put("/settings/users/staff-1", params={"user_id": tenant["user_id"]}, json={"role": "owner"})
+    assert r.status_code == 200
+
+    assert routes.get_user("staff-1")["role"] == "owner"
+
+
+def test_profile_update_drops_the_cached_user(client):
+    assert routes.get_user("staff-1")["full_name"] == "Staff One"
+
+    r = client.put("/settings/profile", json={"user_id": "staff-1", "full_name": "Staff Renamed"})
+    assert r.status_code == 200
+
+    assert routes.get_user("staff-1")["full_name"] == "Staff Renamed"
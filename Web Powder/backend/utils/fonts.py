@@ -1,6 +1,9 @@
 # utils/fonts.py  (create this file if needed)
 import os
+from functools import lru_cache
 
+
+@lru_cache(maxsize=None)
 def get_font_path(filename: str) -> str:
     # Try multiple strategies so it works in dev + Render + different imports
     base_candidates = [
@@ -0,0 +1,213 @@
+# utils/metrics.py
+import contextvars
+import hmac
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+
+# ---------------------------------------------------------
+# In-process latency metrics, exposed in Prometheus text format.
+#
+# RequestMetricsMiddleware times every request by route template (and the
+# time spent sending the response body). span("stage") times a stage of
+# the work – fetch, aggregate, chart, render ... – and is attributed to
+# the route of the request it runs under, or "background" outside one.
+# Counts are per process; with several workers each one reports its own.
+#
+# GET /metrics is only served when METRICS_TOKEN is set, to requests
+# carrying "Authorization: Bearer <token>" (Prometheus' bearer_token).
+# ---------------------------------------------------------
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels: tuple):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._series = {}   # label values -> [bucket counts..., count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        i = bisect_left(BUCKETS, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(BUCKETS) + 2)
+            if i < len(BUCKETS):
+                series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+
+        with self._lock:
+            series = {k: list(v) for k, v in self._series.items()}
+
+        for label_values, values in sorted(series.items()):
+            labels = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.labels, label_values))
+            cumulative = 0
+            for bound, n in zip(BUCKETS, values):
+                cumulative += n
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {values[-2]}')
+            lines.append(f"{self.name}_count{{{labels}}} {values[-2]}")
+            lines.append(f"{self.name}_sum{{{labels}}} {values[-1]:.6f}")
+
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: tuple):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self._series[label_values] = self._series.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+
+        with self._lock:
+            series = dict(self._series)
+
+        for label_values, value in sorted(series.items()):
+            labels = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.labels, label_values))
+            lines.append(f"{self.name}{{{labels}}} {value}")
+
+        return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Request latency by route", ("method", "route", "status")
+)
+REQUESTS = Counter(
+    "http_requests_total", "Requests by route and status", ("method", "route", "status")
+)
+STAGE_SECONDS = Histogram(
+    "stage_duration_seconds", "Latency of work stages by route", ("route", "stage")
+)
+STAGE_ERRORS = Counter(
+    "stage_errors_total", "Stages that raised, by route", ("route", "stage")
+)
+
+_REGISTRY = (REQUEST_SECONDS, REQUESTS, STAGE_SECONDS, STAGE_ERRORS)
+
+# Per-request state: {"route": str | None, "spans": [(stage, seconds, failed)], "done": bool}
+_request = contextvars.ContextVar("metrics_request", default=None)
+
+
+def _record(route: str, stage: str, seconds: float, failed: bool):
+    STAGE_SECONDS.observe(seconds, route, stage)
+    if failed:
+        STAGE_ERRORS.inc(route, stage)
+
+
+@contextmanager
+def span(stage: str):
+    """Time a block as `stage` of the current request (or of "background" work)."""
+    start = time.perf_counter()
+    failed = False
+
+    try:
+        yield
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        state = _request.get()
+
+        if state is None:
+            _record("background", stage, seconds, failed)
+        elif state["done"]:
+            # e.g. a report job that outlived the request that queued it
+            _record(state["route"], stage, seconds, failed)
+        else:
+            # route is only known once routing has happened – record at the end
+            state["spans"].append((stage, seconds, failed))
+
+
+def timed(stage: str):
+    """Decorator form of span()."""
+    def wrap(fn):
+        @wraps(fn)
+        def inner(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+class RequestMetricsMiddleware:
+    """Pure ASGI middleware (doesn't buffer streamed responses)."""
+
+    def __init__(self, app, skip_paths=("/metrics",)):
+        self.app = app
+        self.skip_paths = set(skip_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+
+        state = {"route": None, "spans": [], "done": False}
+        token = _request.set(state)
+
+        start = time.perf_counter()
+        status = 500
+        send_started = None
+
+        async def timed_send(message):
+            nonlocal status, send_started
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                send_started = time.perf_counter()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            end = time.perf_counter()
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            method = scope["method"]
+
+            REQUEST_SECONDS.observe(end - start, method, route, status)
+            REQUESTS.inc(method, route, status)
+
+            if send_started is not None:
+                _record(route, "send", end - send_started, False)
+
+            state["route"] = route
+            state["done"] = True
+            for stage, seconds, failed in state["spans"]:
+                _record(route, stage, seconds, failed)
+
+            _request.reset(token)
+
+
+def authorized(authorization: str | None) -> bool:
+    scheme, _, token = (authorization or "").partition(" ")
+    return bool(METRICS_TOKEN) and scheme.lower() == "bearer" and bool(token) \
+        and hmac.compare_digest(token.strip(), METRICS_TOKEN)
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in _REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,284 @@
+# utils/pdf_cache.py
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import threading
+import uuid
+import zipfile
+from io import BytesIO, RawIOBase
+from fastapi.responses import StreamingResponse
+from utils import profiling
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------------------------------------
+# Content-addressed on-disk cache for generated PDFs.
+#
+# Key = (doc type, company, subject, data fingerprint). The subject is the
+# period ("2024-03", "FY2023") or PO id; the fingerprint is anything that
+# changes when the underlying data does (row count + max timestamp, PO
+# updated_at ...). A new fingerprint for the same subject replaces the old
+# file. Files are evicted oldest-use-first once MAX_BYTES is exceeded.
+#
+# The directory is walked once to seed an in-memory index (prefix -> file,
+# size) and a running byte total; after that a put() only touches the
+# index, and the directory is walked again only when the total goes over
+# MAX_BYTES.
+# ---------------------------------------------------------
+CACHE_DIR = os.getenv("PDF_CACHE_DIR", os.path.join(tempfile.gettempdir(), "powder-pdf-cache"))
+MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+STREAM_CHUNK = 64 * 1024
+
+_lock = threading.Lock()
+
+_index = None   # prefix -> (file name, size); None until seeded
+_total = 0
+
+
+def enabled() -> bool:
+    # A profiled request should measure the real work, not a cache hit
+    return MAX_BYTES > 0 and not profiling.active()
+
+
+def _safe(value) -> str:
+    return re.sub(r"[^A-Za-z0-9-]", "", str(value))[:64]
+
+
+def _digest(value) -> str:
+    return hashlib.sha256(repr(value).encode()).hexdigest()[:20]
+
+
+def _prefix(doc_type: str, company_id: str, subject) -> str:
+    return f"{_safe(doc_type)}_{_safe(company_id)}_{_digest(subject)}_"
+
+
+def _path(doc_type: str, company_id: str, subject, fingerprint) -> str:
+    return os.path.join(CACHE_DIR, _prefix(doc_type, company_id, subject) + _digest(fingerprint) + ".pdf")
+
+
+def contains(doc_type: str, company_id: str, subject, fingerprint) -> bool:
+    """Whether the PDF is cached right now (get() may still miss later)."""
+    return os.path.isfile(_path(doc_type, company_id, subject, fingerprint))
+
+
+def get(doc_type: str, company_id: str, subject, fingerprint) -> bytes | None:
+    """
+    Bytes of the cached PDF, or None. Read here rather than handing out
+    the path: a concurrent put / eviction / invalidate may remove the file
+    at any moment, and an open file survives that.
+    """
+    try:
+        with open(_path(doc_type, company_id, subject, fingerprint), "rb") as f:
+            os.utime(f.fileno())    # mark as recently used
+            return f.read()
+    except OSError:
+        return None
+
+
+def put(doc_type: str, company_id: str, subject, fingerprint, pdf: bytes, evict: bool = True) -> str:
+    """
+    Store freshly rendered PDF bytes and return the cached path.
+    evict=False skips the size check – for callers storing many PDFs in a
+    row, which call trim() once when done.
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+
+    prefix = _prefix(doc_type, company_id, subject)
+    path = _path(doc_type, company_id, subject, fingerprint)
+    name = os.path.basename(path)
+
+    # unique across the worker processes sharing CACHE_DIR, not only threads
+    part = f"{path}.{os.getpid()}.{uuid.uuid4().hex}.part"
+    with open(part, "wb") as f:
+        f.write(pdf)
+    os.replace(part, path)
+
+    global _total
+    with _lock:
+        _seed()
+        old = _index.get(prefix)
+        if old is not None:
+            _total -= old[1]
+            if old[0] != name:
+                _remove(os.path.join(CACHE_DIR, old[0]))
+        _index[prefix] = (name, len(pdf))
+        _total += len(pdf)
+
+        if evict and _total > MAX_BYTES:
+            _evict()
+
+    return path
+
+
+def trim():
+    """Evict down to MAX_BYTES if puts with evict=False went over it."""
+    with _lock:
+        if _index is not None and _total > MAX_BYTES:
+            _evict()
+
+
+def cached(doc_type: str, company_id: str, subject, fingerprint, render) -> bytes:
+    """
+    PDF bytes for the key: from the cache on a hit, else from render()
+    (stored for next time). A None fingerprint means the data cannot be
+    fingerprinted – always render, never store.
+    """
+    if not enabled() or fingerprint is None:
+        return render()
+
+    pdf = get(doc_type, company_id, subject, fingerprint)
+    if pdf is not None:
+        return pdf
+
+    pdf = render()
+
+    try:
+        put(doc_type, company_id, subject, fingerprint, pdf)
+    except OSError as e:
+        logger.warning("Could not store %s PDF: %s", doc_type, e)
+
+    return pdf
+
+
+def pdf_response(pdf: bytes, filename: str):
+    """PDF bytes as a streamed download."""
+    buffer = BytesIO(pdf)
+
+    return StreamingResponse(
+        iter(lambda: buffer.read(STREAM_CHUNK), b""),
+        media_type="application/pdf",
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "Content-Length": str(len(pdf)),
+        }
+    )
+
+
+class _ChunkSink(RawIOBase):
+    """Write-only, non-seekable buffer that the ZIP writer drains into."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def _zip_stream(entries):
+    sink = _ChunkSink()
+
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in entries:
+            archive.writestr(name, data)
+            yield sink.drain()
+
+    yield sink.drain()
+
+
+def zip_response(entries, filename: str):
+    """
+    ZIP of (name, bytes) entries, streamed while the entries are produced.
+    Entries are pulled one at a time, so memory is bounded by what the
+    producer holds (po_pdf.generate_po_pdfs: the render window).
+    """
+    return StreamingResponse(
+        _zip_stream(entries),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+def invalidate(company_id: str, doc_type: str | None = None):
+    """Drop every cached PDF of a company (e.g. after company details change)."""
+    with _lock:
+        kept = []
+        for entry in _scan():
+            parts = entry[2].split("_")
+            if parts[1] == _safe(company_id) and (doc_type is None or parts[0] == _safe(doc_type)):
+                _remove(os.path.join(CACHE_DIR, entry[2]))
+            else:
+                kept.append(entry)
+        _rebuild(kept)
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _scan():
+    """(mtime, size, name, prefix) of every finished PDF in the cache directory."""
+    if not os.path.isdir(CACHE_DIR):
+        return []
+
+    entries = []
+    for name in os.listdir(CACHE_DIR):
+        # only finished files – never an in-flight *.part of a put()
+        if not name.endswith(".pdf"):
+            continue
+        parts = name.split("_")
+        if len(parts) != 4:
+            continue
+        try:
+            st = os.stat(os.path.join(CACHE_DIR, name))
+        except OSError:
+            continue
+        entries.append((st.st_mtime, st.st_size, name, name[:-len(parts[3])]))
+
+    return entries
+
+
+def _rebuild(entries):
+    """Reset the index from a directory scan. Caller holds _lock."""
+    global _index, _total
+    _index = {}
+    _total = 0
+
+    # newest file wins if a prefix has leftovers on disk
+    for _, size, name, prefix in sorted(entries):
+        old = _index.get(prefix)
+        if old is not None:
+            _remove(os.path.join(CACHE_DIR, old[0]))
+            _total -= old[1]
+        _index[prefix] = (name, size)
+        _total += size
+
+
+def _seed():
+    """Build the index on first use. Caller holds _lock."""
+    if _index is None:
+        _rebuild(_scan())
+
+
+def _evict():
+    """
+    Remove least recently used files until under MAX_BYTES. Caller holds
+    _lock. Walks the directory for get()'s access times, and resyncs the
+    index with whatever other processes sharing CACHE_DIR have done.
+    """
+    global _total
+    entries = _scan()
+    _rebuild(entries)
+
+    for _, size, name, prefix in sorted(entries):
+        if _total <= MAX_BYTES:
+            break
+        if _index.get(prefix, (None,))[0] != name:
+            continue
+        _remove(os.path.join(CACHE_DIR, name))
+        del _index[prefix]
+        _total -= size
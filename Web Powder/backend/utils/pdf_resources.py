@@ -0,0 +1,190 @@
+# utils/pdf_resources.py
+import threading
+from functools import lru_cache
+from types import MappingProxyType
+
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.pdfmetrics import registerFontFamily
+from reportlab.pdfbase.ttfonts import TTFont
+
+from utils.fonts import get_font_path
+
+# ---------------------------------------------------------
+# Shared ReportLab resources for every PDF generator.
+#
+# Fonts are parsed and registered once per process; each layout's
+# stylesheet is built once and handed out as a read-only mapping
+# (styles["Name"]). Treat the ParagraphStyle objects as immutable –
+# they are shared by every request.
+# ---------------------------------------------------------
+_fonts_lock = threading.Lock()
+_fonts_registered = False
+
+
+def register_fonts():
+    global _fonts_registered
+
+    if _fonts_registered:
+        return
+
+    with _fonts_lock:
+        if _fonts_registered:
+            return
+
+        pdfmetrics.registerFont(
+            TTFont("DejaVuSans", get_font_path("DejaVuSans.ttf"))
+        )
+        pdfmetrics.registerFont(
+            TTFont("DejaVuSans-Bold", get_font_path("DejaVuSans-Bold.ttf"))
+        )
+        registerFontFamily(
+            family="DejaVuSans",
+            normal="DejaVuSans",
+            bold="DejaVuSans-Bold"
+        )
+
+        _fonts_registered = True
+
+
+def _base_styles():
+    """Fresh sample stylesheet with DejaVuSans forced everywhere."""
+    styles = getSampleStyleSheet()
+
+    for s in styles.byName.values():
+        s.fontName = "DejaVuSans"
+
+    return styles
+
+
+@lru_cache(maxsize=None)
+def monthly_styles():
+    """Monthly review layout (reports/monthly.py)"""
+    styles = _base_styles()
+
+    styles.add(ParagraphStyle(
+        name="CoverTitle",
+        fontName="DejaVuSans-Bold",
+        fontSize=22,
+        alignment=1,
+        spaceAfter=12,
+        textColor=colors.darkblue
+    ))
+
+    styles.add(ParagraphStyle(
+        name="CoverSub",
+        fontName="DejaVuSans",
+        fontSize=13,
+        alignment=1,
+        spaceAfter=22
+    ))
+
+    styles.add(ParagraphStyle(
+        name="SectionHeader",
+        fontName="DejaVuSans-Bold",
+        fontSize=15,
+        spaceBefore=18,
+        spaceAfter=12,
+        textColor=colors.darkblue
+    ))
+
+    styles.add(ParagraphStyle(
+        name="Insight",
+        fontName="DejaVuSans",
+        fontSize=11,
+        leading=15,
+        spaceAfter=8
+    ))
+
+    styles.add(ParagraphStyle(
+        name="NoDataMessage",
+        fontName="DejaVuSans",
+        fontSize=12,
+        leading=16,
+        alignment=1,
+        spaceAfter=12
+    ))
+
+    return MappingProxyType(styles.byName)
+
+
+@lru_cache(maxsize=None)
+def annual_styles():
+    """Annual audit layout (reports/annual.py)"""
+    styles = _base_styles()
+
+    styles.add(ParagraphStyle(
+        name="ReportTitle",
+        fontName="DejaVuSans-Bold",
+        fontSize=18,
+        alignment=1,
+        spaceAfter=10
+    ))
+
+    styles.add(ParagraphStyle(
+        name="SectionHeader",
+        fontName="DejaVuSans-Bold",
+        fontSize=13,
+        spaceBefore=14,
+        spaceAfter=6
+    ))
+
+    styles.add(ParagraphStyle(
+        name="ReportBody",
+        fontName="DejaVuSans",
+        fontSize=10.5,
+        leading=14,
+        spaceAfter=5
+    ))
+
+    styles.add(ParagraphStyle(
+        name="NoDataMessage",
+        fontName="DejaVuSans",
+        fontSize=12,
+        leading=16,
+        alignment=1,
+        spaceAfter=12
+    ))
+
+    return MappingProxyType(styles.byName)
+
+
+@lru_cache(maxsize=None)
+def po_styles():
+    """Purchase order layout (po/po_pdf.py)"""
+    styles = _base_styles()
+
+    styles.add(ParagraphStyle(
+        name='POHeader',
+        fontName='DejaVuSans-Bold',
+        fontSize=16,
+        alignment=TA_CENTER,
+        spaceAfter=6
+    ))
+
+    styles.add(ParagraphStyle(
+        name='POSubHeader',
+        fontName='DejaVuSans-Bold',
+        fontSize=12,
+        alignment=TA_CENTER,
+        spaceAfter=18,
+        textColor=colors.darkblue
+    ))
+
+    styles.add(ParagraphStyle(
+        name='LabelBold',
+        fontName='DejaVuSans-Bold',
+        fontSize=10,
+        spaceAfter=4
+    ))
+
+    styles.add(ParagraphStyle(
+        name='NormalSmall',
+        fontName='DejaVuSans',
+        fontSize=9,
+        leading=12
+    ))
+
+    return MappingProxyType(styles.byName)
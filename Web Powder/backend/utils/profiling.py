@@ -0,0 +1,192 @@
+# utils/profiling.py
+import contextvars
+import cProfile
+import hmac
+import io
+import logging
+import os
+import pstats
+import re
+import tempfile
+import threading
+import time
+import uuid
+from functools import wraps
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------
+# Opt-in cProfile of a single request.
+#
+# Only active when PROFILE_TOKEN is set. A request carrying that token in
+# the "X-Profile-Token: <token>" header (never the query string, which
+# ends up in access / proxy logs and browser history) runs its
+# @profiled endpoint under cProfile, bypassing the PDF cache so the real
+# work is measured. The .pstats file is kept in PROFILE_DIR (newest
+# PROFILE_MAX_FILES) and its id returned in the X-Profile-Id header;
+# GET /profiles/{id} downloads it (same token). Load it with
+# `python -m pstats` or snakeviz. Work on other threads (gather() queries,
+# render workers) shows up as time spent waiting on them.
+#
+# Without the token nothing is installed: @profiled is one contextvar
+# lookup per request.
+# ---------------------------------------------------------
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "powder-profiles"))
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "50"))
+
+TOKEN_HEADER = b"x-profile-token"
+ID_HEADER = "X-Profile-Id"
+
+# Per-request state while profiling was asked for: {"id": str | None}
+_request = contextvars.ContextVar("profile_request", default=None)
+_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    return bool(PROFILE_TOKEN)
+
+
+def authorized(token: str | None) -> bool:
+    return enabled() and bool(token) and hmac.compare_digest(token, PROFILE_TOKEN)
+
+
+def active() -> bool:
+    """True inside a request that asked to be profiled."""
+    return _request.get() is not None
+
+
+def _token_from(scope) -> str | None:
+    for name, value in scope.get("headers", ()):
+        if name == TOKEN_HEADER:
+            return value.decode("latin-1")
+
+    return None
+
+
+def _path(profile_id: str) -> str:
+    return os.path.join(PROFILE_DIR, f"{profile_id}.pstats")
+
+
+def _prune():
+    try:
+        files = [os.path.join(PROFILE_DIR, n) for n in os.listdir(PROFILE_DIR) if n.endswith(".pstats")]
+    except OSError:
+        return
+
+    files.sort(key=os.path.getmtime)
+    for path in files[:-PROFILE_MAX_FILES or None]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _save(profiler: cProfile.Profile, label: str) -> str | None:
+    profile_id = "{}-{}-{}".format(
+        time.strftime("%Y%m%d%H%M%S"),
+        re.sub(r"[^A-Za-z0-9]+", "_", label).strip("_")[:40],
+        uuid.uuid4().hex[:8]
+    )
+
+    try:
+        with _lock:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            profiler.dump_stats(_path(profile_id))
+            _prune()
+    except OSError as e:
+        logger.warning("Could not store profile %s: %s", profile_id, e)
+        return None
+
+    return profile_id
+
+
+def profiled(fn):
+    """Run a (sync) endpoint under cProfile when its request asked for it."""
+    @wraps(fn)
+    def inner(*args, **kwargs):
+        state = _request.get()
+        if state is None:
+            return fn(*args, **kwargs)
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profiler.disable()
+            state["id"] = _save(profiler, fn.__name__)
+            if state["id"]:
+                logger.info("Profiled %s -> %s", fn.__name__, state["id"])
+    return inner
+
+
+def profile_path(profile_id: str) -> str | None:
+    """Path of a stored profile, None if unknown (or not a valid id)."""
+    if not re.fullmatch(r"[A-Za-z0-9_-]+", profile_id or ""):
+        return None
+    path = _path(profile_id)
+    return path if os.path.isfile(path) else None
+
+
+def list_profiles() -> list[dict]:
+    try:
+        names = [n for n in os.listdir(PROFILE_DIR) if n.endswith(".pstats")]
+    except OSError:
+        return []
+
+    out = []
+    for name in names:
+        try:
+            st = os.stat(os.path.join(PROFILE_DIR, name))
+        except OSError:
+            continue
+        out.append({"id": name[:-len(".pstats")], "bytes": st.st_size, "created_at": st.st_mtime})
+
+    return sorted(out, key=lambda p: p["created_at"], reverse=True)
+
+
+def summary(path: str, limit: int = 40) -> str:
+    """Top functions by cumulative time, as text."""
+    out = io.StringIO()
+    pstats.Stats(path, stream=out).sort_stats("cumulative").print_stats(limit)
+    return out.getvalue()
+
+
+class ProfileMiddleware:
+    """Marks requests carrying the profile token and reports X-Profile-Id."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = _token_from(scope)
+        if token is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not authorized(token):
+            logger.warning("Profile requested with an invalid token: %s", scope["path"])
+            await self.app(scope, receive, send)
+            return
+
+        state = {"id": None}
+        ctx_token = _request.set(state)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start" and state["id"]:
+                message = {
+                    **message,
+                    "headers": [*message.get("headers", []),
+                                (ID_HEADER.lower().encode(), state["id"].encode())]
+                }
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            _request.reset(ctx_token)
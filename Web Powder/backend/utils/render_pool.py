@@ -0,0 +1,154 @@
+# utils/render_pool.py
+import logging
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from utils.pdf_resources import register_fonts, monthly_styles, annual_styles, po_styles
+from utils.metrics import span
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------------------------------------
+# Worker processes for the CPU-bound ReportLab stage.
+#
+# Generators fetch and aggregate their data in the web process and hand a
+# plain dict (picklable: str / int / float / bytes / lists / dicts) to a
+# module-level render function, which builds the story and returns PDF
+# bytes. That render runs in one of PDF_RENDER_PROCESSES spawned workers
+# (default: up to 4, one per CPU), each preloaded with fonts and
+# stylesheets; PDF_RENDER_PROCESSES=0 renders inline in the calling thread.
+# ---------------------------------------------------------
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    try:
+        return max(int(value), 0)
+    except ValueError:
+        logger.warning("Ignoring %s=%r (not an integer), using %d", name, value, default)
+        return default
+
+
+RENDER_PROCESSES = _env_int("PDF_RENDER_PROCESSES", min(4, os.cpu_count() or 1))
+
+# Renders render_many() keeps in flight (each holds its pickled context
+# and, once finished, its PDF bytes)
+RENDER_WINDOW = max(_env_int("PDF_RENDER_WINDOW", 2 * max(RENDER_PROCESSES, 1)), 1)
+
+_pool = None
+_lock = threading.Lock()
+
+
+def _warm():
+    """Worker initializer: parse fonts and build every stylesheet up front."""
+    register_fonts()
+    monthly_styles()
+    annual_styles()
+    po_styles()
+
+
+def _executor():
+    global _pool
+
+    with _lock:
+        if _pool is None:
+            # spawn, not fork: the web process has live threads and sockets
+            _pool = ProcessPoolExecutor(
+                max_workers=RENDER_PROCESSES,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_warm
+            )
+        return _pool
+
+
+def render(fn, context: dict) -> bytes:
+    """fn(context) -> PDF bytes, in a worker process when the pool is enabled."""
+    with span("render"):
+        return _render(fn, context)
+
+
+def _render(fn, context: dict) -> bytes:
+    if RENDER_PROCESSES <= 0:
+        return fn(context)
+
+    # A worker that died (OOM, killed) or a pool torn down under the
+    # request (cancelled future) means a fresh pool next time, and an
+    # inline render now rather than a failed request
+    return _result(fn, context, *_submit(fn, context))
+
+
+def render_many(fn, contexts):
+    """
+    Iterator of fn(context) results, in order, rendered as it is consumed.
+    With the pool enabled at most RENDER_WINDOW contexts are in flight
+    across the workers at a time; inline they render one by one. A broken
+    pool falls back to rendering inline, per item, like render().
+    """
+    if RENDER_PROCESSES <= 0:
+        yield from map(fn, contexts)
+        return
+
+    window = deque()
+
+    try:
+        for context in contexts:
+            window.append((context, *_submit(fn, context)))
+            if len(window) >= RENDER_WINDOW:
+                yield _result(fn, *window.popleft())
+
+        while window:
+            yield _result(fn, *window.popleft())
+    finally:
+        # consumer stopped early (client went away): drop what is queued
+        for _, future, _ in window:
+            if future is not None:
+                future.cancel()
+
+
+def _submit(fn, context):
+    """(future, pool), or (None, None) when the pool cannot take work."""
+    pool = _executor()
+    try:
+        return pool.submit(fn, context), pool
+    except (BrokenProcessPool, RuntimeError):
+        _reset(pool)
+        return None, None
+
+
+def _result(fn, context, future, pool):
+    if future is None:
+        return fn(context)
+
+    try:
+        return future.result()
+    except (BrokenProcessPool, CancelledError):
+        # Worker died mid-batch (or its pool was torn down for that): this
+        # item renders inline, later ones go to a fresh pool
+        logger.warning("Render worker pool broken, rendering inline")
+        _reset(pool)
+        return fn(context)
+
+
+def _reset(pool):
+    global _pool
+
+    with _lock:
+        if _pool is pool:
+            _pool = None
+
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown():
+    global _pool
+
+    with _lock:
+        pool, _pool = _pool, None
+
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,121 @@
+# utils/signature_cache.py
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from io import BytesIO
+
+import requests
+from PIL import Image as PILImage
+
+from utils.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------
+# Company signature images for PO PDFs, cached by URL.
+#
+# The stored value is the image already decoded and scaled down to the
+# size it is drawn at (SIGNATURE_SIZE_PX), re-encoded as PNG – small, and
+# plain bytes so it can cross into a render worker. Within SIGNATURE_TTL
+# no request is made at all; after that the entry is revalidated with a
+# conditional GET (ETag / Last-Modified). Unreachable storage (network
+# error, 5xx) keeps serving the stale image. URLs answering 4xx or with an
+# undecodable image are cached as None for the TTL too, so one broken
+# bucket doesn't stall every PDF.
+# ---------------------------------------------------------
+SIGNATURE_TTL = float(os.getenv("SIGNATURE_CACHE_TTL", "600"))
+MAX_ENTRIES = int(os.getenv("SIGNATURE_CACHE_MAX_ENTRIES", "256"))
+FETCH_TIMEOUT = float(os.getenv("SIGNATURE_FETCH_TIMEOUT", "5"))
+
+# 40 x 15 mm at 300 dpi
+SIGNATURE_SIZE_PX = (472, 177)
+
+_entries = OrderedDict()   # url -> {"image", "etag", "last_modified", "checked_at"}
+_lock = threading.Lock()
+
+
+def _scale(content: bytes):
+    try:
+        with PILImage.open(BytesIO(content)) as img:
+            img = img.convert("RGBA").resize(SIGNATURE_SIZE_PX, PILImage.LANCZOS)
+            out = BytesIO()
+            img.save(out, format="PNG", optimize=True)
+            return out.getvalue()
+    except Exception as e:
+        logger.warning("Could not decode signature image: %s", e)
+        return None
+
+
+def _stale(url: str, entry: dict | None, now: float):
+    """Keep serving what we had (None if nothing) until the next TTL."""
+    image = entry["image"] if entry is not None else None
+    _store(url, {**(entry or {"etag": None, "last_modified": None}),
+                 "image": image, "checked_at": now})
+    return image
+
+
+def _store(url: str, entry: dict):
+    with _lock:
+        _entries[url] = entry
+        _entries.move_to_end(url)
+        while len(_entries) > MAX_ENTRIES:
+            _entries.popitem(last=False)
+
+
+@timed("signature")
+def get_signature(url: str | None):
+    """Pre-scaled PNG bytes of the signature at url, or None."""
+    if not url:
+        return None
+
+    with _lock:
+        entry = _entries.get(url)
+        if entry is not None:
+            _entries.move_to_end(url)
+
+    now = time.monotonic()
+
+    if entry is not None and now - entry["checked_at"] < SIGNATURE_TTL:
+        return entry["image"]
+
+    headers = {}
+    if entry is not None and entry["image"] is not None:
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    try:
+        r = requests.get(url, headers=headers, timeout=FETCH_TIMEOUT)
+    except Exception as e:
+        logger.warning("Could not load signature: %s", e)
+        return _stale(url, entry, now)
+
+    if r.status_code >= 500:
+        logger.warning("Could not load signature: HTTP %s", r.status_code)
+        return _stale(url, entry, now)
+
+    if r.status_code == 304 and entry is not None:
+        _store(url, {**entry, "checked_at": now})
+        return entry["image"]
+
+    image = _scale(r.content) if r.status_code == 200 else None
+
+    _store(url, {
+        "image": image,
+        "etag": r.headers.get("ETag"),
+        "last_modified": r.headers.get("Last-Modified"),
+        "checked_at": now,
+    })
+
+    return image
+
+
+def invalidate(url: str | None = None):
+    with _lock:
+        if url is None:
+            _entries.clear()
+        else:
+            _entries.pop(url, None)
@@ -12,13 +12,19 @@ type Props<T> = {
   data: T[]
   pageSize?: number
   height?: string
+  // Off when `data` is only part of the rows (server-paged lists): the
+  // column filters and sort would only see what has been loaded
+  filterable?: boolean
+  sortable?: boolean
 }
 
 export default function DataTable<T extends Record<string, any>>({
   columns,
   data,
   pageSize = 5,
-  height = "h-64"
+  height = "h-64",
+  filterable = true,
+  sortable = true
 }: Props<T>) {
   const [page, setPage] = useState(1)
   const [sortKey, setSortKey] = useState<keyof T | null>(null)
@@ -90,6 +96,8 @@ export default function DataTable<T extends Record<string, any>>({
   const pageData = processedData.slice(start, start + pageSize)
 
   const onSort = (key: keyof T) => {
+    if (!sortable) return
+
     if (sortKey === key) {
       setSortDir(sortDir === "asc" ? "desc" : "asc")
     } else {
@@ -127,7 +135,7 @@ export default function DataTable<T extends Record<string, any>>({
                 <th
                   key={String(col.key)}
                   onClick={() => onSort(col.key)}
-                  className="px-3 py-2 text-left font-medium border-b cursor-pointer"
+                  className={`px-3 py-2 text-left font-medium border-b ${sortable ? "cursor-pointer" : ""}`}
                 >
                   {col.label}
                   {sortKey === col.key && (
@@ -139,24 +147,26 @@ export default function DataTable<T extends Record<string, any>>({
               ))}
             </tr>
 
-            <tr>
-              {columns.map(col => (
-                <th key={String(col.key)} className="px-2 py-1 border-b">
-                  <input
-                    className="w-full border rounded px-2 py-1 text-xs"
-                    placeholder="Filter"
-                    value={filters[col.key as string] || ""}
-                    onChange={e => {
-                      setPage(1)
-                      setFilters({
-                        ...filters,
-                        [col.key]: e.target.value
-                      })
-                    }}
-                  />
-                </th>
-              ))}
-            </tr>
+            {filterable && (
+              <tr>
+                {columns.map(col => (
+                  <th key={String(col.key)} className="px-2 py-1 border-b">
+                    <input
+                      className="w-full border rounded px-2 py-1 text-xs"
+                      placeholder="Filter"
+                      value={filters[col.key as string] || ""}
+                      onChange={e => {
+                        setPage(1)
+                        setFilters({
+                          ...filters,
+                          [col.key]: e.target.value
+                        })
+                      }}
+                    />
+                  </th>
+                ))}
+              </tr>
+            )}
           </thead>
 
           <tbody>
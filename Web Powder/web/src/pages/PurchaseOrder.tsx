@@ -1,4 +1,4 @@
-import { useEffect, useState } from "react"
+import { useEffect, useRef, useState } from "react"
 import { useSession } from "../context/useSession"
 import DataTable from "../components/DataTable"
 import SearchSelect from "../components/SearchSelect"
@@ -24,8 +24,17 @@ type PO = {
   status: string
 }
 
+type POFilters = {
+  status: string
+  supplierId: string
+  dateFrom: string
+  dateTo: string
+}
+
 const API = "https://powder-managment-1.onrender.com"
 
+const NO_FILTERS: POFilters = { status: "", supplierId: "", dateFrom: "", dateTo: "" }
+
 export default function PurchaseOrder() {
   const { session } = useSession()
 
@@ -37,6 +46,10 @@ export default function PurchaseOrder() {
   ])
   const [saving, setSaving] = useState(false)
   const [pos, setPos] = useState<PO[]>([])
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
+  const [filters, setFilters] = useState<POFilters>(NO_FILTERS)
+  // Bumped per first-page load so a late "Load more" of old filters is dropped
+  const listVersion = useRef(0)
 
   // Loading & error states for actions
   const [actionLoading, setActionLoading] = useState<string | null>(null) // "create", "cancel", "deliver", "pdf"
@@ -47,9 +60,14 @@ export default function PurchaseOrder() {
     if (!session?.companyId) return
     fetchSuppliers()
     fetchPowders()
-    loadPOs()
   }, [session?.companyId])
 
+  // Filters run on the server; a change starts again from the first page
+  useEffect(() => {
+    if (!session?.companyId) return
+    loadPOs()
+  }, [session?.companyId, filters])
+
   const fetchSuppliers = async () => {
     const { data } = await supabase
       .from("suppliers")
@@ -66,9 +84,19 @@ export default function PurchaseOrder() {
     setPowders(data?.map(p => ({ id: p.id, label: p.powder_name })) ?? [])
   }
 
-  const loadPOs = async () => {
+  // Newest page first; "Load more" follows X-Next-Cursor
+  const loadPOs = async (cursor?: string) => {
+    const version = cursor ? listVersion.current : ++listVersion.current
+
     try {
-      const res = await fetch(`${API}/po/list`, {
+      const params = new URLSearchParams()
+      if (filters.status) params.set("status", filters.status)
+      if (filters.supplierId) params.set("supplier_id", filters.supplierId)
+      if (filters.dateFrom) params.set("date_from", filters.dateFrom)
+      if (filters.dateTo) params.set("date_to", filters.dateTo)
+      if (cursor) params.set("cursor", cursor)
+
+      const res = await fetch(`${API}/po/list?${params}`, {
         headers: { "X-Company-Id": session?.companyId || "" }
       })
 
@@ -78,7 +106,10 @@ export default function PurchaseOrder() {
       }
 
       const data = await res.json()
-      setPos(Array.isArray(data) ? data : [])
+      const page = Array.isArray(data) ? data : []
+      if (version !== listVersion.current) return
+      setPos(prev => (cursor ? [...prev, ...page] : page))
+      setNextCursor(res.headers.get("X-Next-Cursor"))
     } catch (err: any) {
       console.error("Load POs error:", err)
       setActionError("Failed to load purchase orders. Please try again.")
@@ -405,6 +436,53 @@ export default function PurchaseOrder() {
       <div className="bg-white p-5 sm:p-6 rounded-xl shadow-md border border-gray-100 overflow-hidden">
         <h3 className="text-lg font-semibold mb-4 text-gray-800">Purchase Orders</h3>
 
+        <div className="grid grid-cols-1 sm:grid-cols-2 lg:grid-cols-5 gap-3 mb-4 text-sm">
+          <select
+            value={filters.status}
+            onChange={e => setFilters({ ...filters, status: e.target.value })}
+            className="border p-2 rounded w-full"
+          >
+            <option value="">All statuses</option>
+            <option value="OPEN">Open</option>
+            <option value="COMPLETED">Delivered</option>
+            <option value="CANCELLED">Cancelled</option>
+          </select>
+
+          <select
+            value={filters.supplierId}
+            onChange={e => setFilters({ ...filters, supplierId: e.target.value })}
+            className="border p-2 rounded w-full"
+          >
+            <option value="">All suppliers</option>
+            {suppliers.map(s => (
+              <option key={s.id} value={s.id}>{s.label}</option>
+            ))}
+          </select>
+
+          <input
+            type="date"
+            value={filters.dateFrom}
+            onChange={e => setFilters({ ...filters, dateFrom: e.target.value })}
+            className="border p-2 rounded w-full"
+            title="PO date from"
+          />
+
+          <input
+            type="date"
+            value={filters.dateTo}
+            onChange={e => setFilters({ ...filters, dateTo: e.target.value })}
+            className="border p-2 rounded w-full"
+            title="PO date to"
+          />
+
+          <button
+            onClick={() => setFilters(NO_FILTERS)}
+            className="text-blue-600 hover:text-blue-800 font-medium text-left sm:text-center"
+          >
+            Clear filters
+          </button>
+        </div>
+
         <div className="overflow-x-auto">
           <DataTable
             columns={[
@@ -461,8 +539,19 @@ export default function PurchaseOrder() {
             data={pos}
             pageSize={6}
             height="h-80 sm:h-96"
+            filterable={false}
+            sortable={false}
           />
         </div>
+
+        {nextCursor && (
+          <button
+            onClick={() => loadPOs(nextCursor)}
+            className="mt-4 text-blue-600 hover:text-blue-800 font-medium"
+          >
+            Load more
+          </button>
+        )}
       </div>
     </div>
   )
@@ -0,0 +1,15 @@
+-- Materialized per-month FIFO aggregates for closed months.
+-- Written and read by the backend (services/rollups.py); the open month is
+-- always computed live from usage_fifo.
+
+create table if not exists public.fifo_monthly_rollups (
+    company_id  text        not null,
+    month       text        not null,              -- 'YYYY-MM'
+    rows        integer     not null default 0,
+    qty         numeric     not null default 0,
+    cost        numeric     not null default 0,
+    suppliers   jsonb       not null default '{}', -- name -> {qty, cost}
+    powders     jsonb       not null default '{}', -- name -> {qty, cost}
+    computed_at timestamptz not null default now(),
+    primary key (company_id, month)
+);
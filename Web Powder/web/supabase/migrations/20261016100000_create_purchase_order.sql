@@ -0,0 +1,33 @@
+-- Atomic PO creation: header + all items in one call / one transaction.
+-- Called by the backend (po/purchase_order.create_po) as
+--   rpc('create_purchase_order', {p_po: {...header}, p_items: [{...}, ...]})
+-- and returns the inserted purchase_orders row as json.
+
+create or replace function public.create_purchase_order(p_po jsonb, p_items jsonb)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_po public.purchase_orders;
+begin
+    insert into public.purchase_orders (
+        company_id, supplier_id, supplier_name, po_number,
+        po_date, total_amount, status, created_by
+    )
+    select company_id, supplier_id, supplier_name, po_number,
+           po_date, total_amount, coalesce(status, 'OPEN'), created_by
+    from jsonb_populate_record(null::public.purchase_orders, p_po)
+    returning * into v_po;
+
+    insert into public.purchase_order_items (
+        po_id, powder_id, quantity_kg, rate_per_kg, amount
+    )
+    select v_po.id, i.powder_id, i.quantity_kg, i.rate_per_kg, i.amount
+    from jsonb_populate_recordset(
+        null::public.purchase_order_items,
+        coalesce(p_items, '[]'::jsonb)
+    ) as i;
+
+    return to_jsonb(v_po);
+end;
+$$;
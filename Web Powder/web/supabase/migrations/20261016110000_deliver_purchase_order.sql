@@ -0,0 +1,48 @@
+-- Atomic PO delivery: OPEN -> COMPLETED transition + one stock batch per item,
+-- in one call / one transaction. Called by the backend
+-- (po/purchase_order.deliver_po) as
+--   rpc('deliver_purchase_order', {p_po_id, p_company_id, p_user_id}).
+--
+-- The conditional UPDATE takes the row lock first, so of two concurrent
+-- deliveries only one still sees status = 'OPEN'; the other raises and
+-- posts nothing.
+
+create or replace function public.deliver_purchase_order(
+    p_po_id      public.purchase_orders.id%type,
+    p_company_id public.purchase_orders.company_id%type,
+    p_user_id    public.purchase_orders.updated_by%type
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_po      public.purchase_orders;
+    v_batches integer;
+begin
+    update public.purchase_orders
+       set status       = 'COMPLETED',
+           delivered_at = now(),
+           updated_by   = p_user_id
+     where id = p_po_id
+       and company_id = p_company_id
+       and status = 'OPEN'
+    returning * into v_po;
+
+    if not found then
+        raise exception 'Only OPEN POs can be delivered';
+    end if;
+
+    insert into public.stock_batches (
+        company_id, powder_id, supplier_id,
+        qty_received, qty_remaining, rate_per_kg, created_by
+    )
+    select p_company_id, i.powder_id, v_po.supplier_id,
+           i.quantity_kg, i.quantity_kg, i.rate_per_kg, p_user_id
+    from public.purchase_order_items i
+    where i.po_id = p_po_id;
+
+    get diagnostics v_batches = row_count;
+
+    return jsonb_build_object('status', 'delivered', 'batches', v_batches);
+end;
+$$;
@@ -0,0 +1,5 @@
+-- Backs the keyset-paginated PO list (po/purchase_order.list_pos):
+-- company_id = ? order by created_at desc, id desc, resuming after a cursor.
+
+create index if not exists purchase_orders_company_created_idx
+    on public.purchase_orders (company_id, created_at desc, id desc);
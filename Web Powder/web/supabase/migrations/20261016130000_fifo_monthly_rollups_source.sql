@@ -0,0 +1,22 @@
+-- Source fingerprint per stored rollup month and backend-only access.
+--
+-- source_count / source_latest = (row count, max usage_fifo.created_at) of
+-- the FIFO rows whose usage falls in the month when the rollup was
+-- computed. The backend (services/rollups.py) recomputes a stored month
+-- as soon as that no longer matches (usage edited / cancelled / back-dated).
+-- Rows stored before this migration have no fingerprint and are recomputed
+-- on first use.
+--
+-- The table is only read and written by the backend with the service-role
+-- key (SUPABASE_SERVICE_KEY): RLS on, no policies, and no grants for the
+-- anon / authenticated roles, so API keys handed to browsers can neither
+-- read nor overwrite another company's report numbers.
+
+alter table public.fifo_monthly_rollups
+    add column if not exists source_count  integer,
+    add column if not exists source_latest timestamptz;
+
+alter table public.fifo_monthly_rollups enable row level security;
+
+revoke all on table public.fifo_monthly_rollups from anon, authenticated;
+grant select, insert, update, delete on table public.fifo_monthly_rollups to service_role;
@@ -0,0 +1,37 @@
+-- Latest N activity_log events per PO, for many POs in one call.
+-- Called by the backend (po/po_history.get_po_histories with
+-- limit_per_po) as
+--   rpc('latest_po_events', {p_company_id, p_po_ids: [...], p_limit})
+-- so "latest event" badges don't download every event of every PO.
+--
+-- p_po_ids is a json array of ids; each is cast to activity_log.ref_id's
+-- own type via jsonb_populate_record, so the per-PO lookup can use an
+-- index on ref_id whatever that column's type is.
+
+create or replace function public.latest_po_events(
+    p_company_id public.activity_log.company_id%type,
+    p_po_ids     jsonb,
+    p_limit      integer
+)
+returns table (ref_id text, event_type text, created_at timestamptz, meta jsonb)
+language sql
+stable
+as $$
+    select e.ref_id::text, e.event_type::text, e.created_at, e.meta::jsonb
+    from (
+        select distinct (jsonb_populate_record(
+            null::public.activity_log,
+            jsonb_build_object('ref_id', id.value)
+        )).ref_id as po_id
+        from jsonb_array_elements_text(coalesce(p_po_ids, '[]'::jsonb)) as id(value)
+    ) as ids
+    cross join lateral (
+        select a.ref_id, a.event_type, a.created_at, a.meta
+        from public.activity_log a
+        where a.company_id = p_company_id
+          and a.ref_type = 'PURCHASE_ORDER'
+          and a.ref_id = ids.po_id
+        order by a.created_at desc
+        limit greatest(p_limit, 1)
+    ) as e;
+$$;
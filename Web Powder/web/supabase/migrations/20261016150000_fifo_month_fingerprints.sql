@@ -0,0 +1,32 @@
+-- Source fingerprint of every month in a range, in one call.
+-- Called by the backend (services/rollups.fingerprints) as
+--   rpc('fifo_month_fingerprints', {p_company_id, p_from, p_to})
+-- before serving stored rollups, instead of one count query per month.
+--
+-- One row per month ('YYYY-MM' of usage.used_at) that has FIFO rows in
+-- [p_from, p_to]: (row count, max usage_fifo.created_at) – the same pair
+-- services/fifo_data.fifo_fingerprint takes for a single window. Months
+-- without rows are not returned (fingerprint (0, null)).
+--
+-- p_from / p_to take usage.used_at's own type, so the range and the month
+-- grouping are read in the same time zone as the backend's range filters.
+
+create or replace function public.fifo_month_fingerprints(
+    p_company_id public.usage_fifo.company_id%type,
+    p_from       public.usage.used_at%type,
+    p_to         public.usage.used_at%type
+)
+returns table (month text, source_count integer, source_latest timestamptz)
+language sql
+stable
+as $$
+    select to_char(u.used_at, 'YYYY-MM') as month,
+           count(*)::integer              as source_count,
+           max(f.created_at)::timestamptz as source_latest
+    from public.usage_fifo f
+    join public.usage u on u.id = f.usage_id
+    where f.company_id = p_company_id
+      and u.used_at >= p_from
+      and u.used_at <= p_to
+    group by 1;
+$$;